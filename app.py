@@ -3,9 +3,12 @@
 Забезпечує взаємодію з Moodle через Gradio інтерфейс.
 """
 import gradio as gr
-import asyncio
 import os
 import sys
+import logging
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 
 # Завантажуємо змінні оточення на старті додатку
@@ -13,9 +16,33 @@ load_dotenv()
 
 # Імпортуємо необхідні модулі
 from common.auth import MoodleAuth
+from common.event_loop import run_sync
 from teacher.dashboard import TeacherDashboard
 from student.dashboard import StudentDashboard
 
+logger = logging.getLogger(__name__)
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler, що передає запис у чергу без попереднього форматування.
+    
+    Стандартний QueueHandler форматує повідомлення і traceback ще в потоці, що логує
+    (тобто в циклі подій); черга тут у межах процесу, тож це можна залишити потоку QueueListener.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def setup_logging(level: str) -> QueueListener:
+    """Налаштування логування: обробники лише ставлять записи в чергу, а форматуванням
+    (включно з traceback) і виводом у stderr займається окремий потік."""
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = QueueListener(log_queue, stream_handler)
+    logging.basicConfig(level=level, handlers=[_DeferredQueueHandler(log_queue)])
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
 # Клас для зберігання глобального стану додатку
 class AppState:
     def __init__(self):
@@ -39,7 +66,7 @@ def switch_to_teacher_mode():
     
     if not auth.token:
         error_message = "Помилка: API токен Moodle не знайдено. Перевірте файл .env (API_MOODLE_TOKEN)."
-        print(error_message)
+        logger.error(error_message)
         return (
             gr.update(visible=True),   # mode_selection
             gr.update(visible=False),  # student_mode
@@ -47,43 +74,38 @@ def switch_to_teacher_mode():
             gr.update(value=error_message, visible=True)  # status_message
         )
     
-    print("Спроба автентифікації за токеном...")
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        success, message = loop.run_until_complete(auth.authenticate_with_token())
-        
-        if success:
-            print(f"Автентифікація успішна. User ID: {auth.user_id}, Is Teacher: {auth.is_teacher}")
-            if not auth.is_teacher:
-                warning_message = "Попередження: Акаунт, пов'язаний з токеном, не має прав викладача в жодному курсі."
-                print(warning_message)
-                return (
-                    gr.update(visible=False),  # mode_selection
-                    gr.update(visible=False),  # student_mode
-                    gr.update(visible=True),   # teacher_dashboard
-                    gr.update(value=warning_message, visible=True)  # status_message
-                )
-            else:
-                # Успіх і є викладачем
-                return (
-                    gr.update(visible=False),  # mode_selection
-                    gr.update(visible=False),  # student_mode
-                    gr.update(visible=True),   # teacher_dashboard
-                    gr.update(value="Автентифікація за токеном успішна.", visible=False)  # status_message
-                )
+    logger.debug("Спроба автентифікації за токеном...")
+    success, message = run_sync(auth.authenticate_with_token())
+    
+    if success:
+        logger.info("Автентифікація успішна. User ID: %s, Is Teacher: %s", auth.user_id, auth.is_teacher)
+        if not auth.is_teacher:
+            warning_message = "Попередження: Акаунт, пов'язаний з токеном, не має прав викладача в жодному курсі."
+            logger.warning(warning_message)
+            return (
+                gr.update(visible=False),  # mode_selection
+                gr.update(visible=False),  # student_mode
+                gr.update(visible=True),   # teacher_dashboard
+                gr.update(value=warning_message, visible=True)  # status_message
+            )
         else:
-            # Помилка автентифікації
-            error_message = f"Помилка автентифікації за токеном: {message}"
-            print(error_message)
+            # Успіх і є викладачем
             return (
-                gr.update(visible=True),   # mode_selection
+                gr.update(visible=False),  # mode_selection
                 gr.update(visible=False),  # student_mode
-                gr.update(visible=False),  # teacher_dashboard
-                gr.update(value=error_message, visible=True)  # status_message
+                gr.update(visible=True),   # teacher_dashboard
+                gr.update(value="Автентифікація за токеном успішна.", visible=False)  # status_message
             )
-    finally:
-        loop.close()
+    else:
+        # Помилка автентифікації
+        error_message = f"Помилка автентифікації за токеном: {message}"
+        logger.error(error_message)
+        return (
+            gr.update(visible=True),   # mode_selection
+            gr.update(visible=False),  # student_mode
+            gr.update(visible=False),  # teacher_dashboard
+            gr.update(value=error_message, visible=True)  # status_message
+        )
 
 # Функція для переходу в режим студента
 def switch_to_student_mode():
@@ -95,7 +117,7 @@ def switch_to_student_mode():
     
     if not auth.token:
         error_message = "Помилка: API токен Moodle не знайдено. Перевірте файл .env (API_MOODLE_TOKEN)."
-        print(error_message)
+        logger.error(error_message)
         return (
             gr.update(visible=True),   # mode_selection
             gr.update(visible=False),  # student_mode
@@ -103,32 +125,28 @@ def switch_to_student_mode():
             gr.update(value=error_message, visible=True)  # status_message
         )
     
-    print("Спроба автентифікації за токеном (режим студента)...")
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        success, message = loop.run_until_complete(auth.authenticate_with_token())
-        
-        if success:
-            print(f"Автентифікація успішна. User ID: {auth.user_id}")
-            return (
-                gr.update(visible=False),  # mode_selection
-                gr.update(visible=True),   # student_mode
-                gr.update(visible=False),  # teacher_dashboard
-                gr.update(visible=False)   # status_message
-            )
-        else:
-            # Помилка автентифікації
-            error_message = f"Помилка автентифікації за токеном: {message}"
-            print(error_message)
-            return (
-                gr.update(visible=True),   # mode_selection
-                gr.update(visible=False),  # student_mode
-                gr.update(visible=False),  # teacher_dashboard
-                gr.update(value=error_message, visible=True)  # status_message
-            )
-    finally:
-        loop.close()
+    logger.debug("Спроба автентифікації за токеном (режим студента)...")
+    success, message = run_sync(auth.authenticate_with_token())
+    
+    if success:
+        logger.info("Автентифікація успішна. User ID: %s", auth.user_id)
+        app_state.student_dashboard.refresh_auth_cache()
+        return (
+            gr.update(visible=False),  # mode_selection
+            gr.update(visible=True),   # student_mode
+            gr.update(visible=False),  # teacher_dashboard
+            gr.update(visible=False)   # status_message
+        )
+    else:
+        # Помилка автентифікації
+        error_message = f"Помилка автентифікації за токеном: {message}"
+        logger.error(error_message)
+        return (
+            gr.update(visible=True),   # mode_selection
+            gr.update(visible=False),  # student_mode
+            gr.update(visible=False),  # teacher_dashboard
+            gr.update(value=error_message, visible=True)  # status_message
+        )
 
 # Функція для повернення до вибору режиму
 def back_to_selection():
@@ -205,6 +223,9 @@ def create_interface():
 
 # Запуск додатку
 if __name__ == "__main__":
+    # Діагностика (debug) за замовчуванням вимкнена; рівень задається змінною LOGLEVEL
+    setup_logging(os.getenv("LOGLEVEL", "INFO").upper())
+    
     # Перевірка наявності токена перед запуском
     moodle_token = os.getenv("API_MOODLE_TOKEN")
     if not moodle_token:
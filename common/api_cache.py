@@ -0,0 +1,84 @@
+"""
+Постійний кеш відповідей Moodle API.
+Зберігає успішні відповіді в SQLite (окремий файл для кожного користувача), тому після
+перезапуску додатку панель показує дані з диска, поки свіжі завантажуються з Moodle.
+Відповіді містять персональні дані студентів, тому файл доступний лише власнику,
+а значення зберігаються як JSON (на відміну від pickle, читання файлу не виконує коду).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+from common.llm_provider import dumps_json
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "moodle_api")
+# Записи старші за це (секунди) видаляються при відкритті кешу
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+class ApiCache:
+    """Кеш відповідей API на SQLite: ключ-кортеж -> (час збереження, результат)."""
+
+    def __init__(self, path: str, max_age: float = DEFAULT_MAX_AGE):
+        self.path = path
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        # Файл створюється з правами 0600 до підключення SQLite (файли -wal/-shm успадковують ці права);
+        # права файлів, створених раніше з umask за замовчуванням, звужуються
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        os.chmod(path, 0o600)
+
+        # Звернення йдуть з потоків пулу asyncio.to_thread, тому з'єднання захищене блокуванням
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # scope - другий елемент ключа (область на кшталт ("course", id)) для інвалідації всіх записів курсу
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "k TEXT PRIMARY KEY, "
+            "scope TEXT NOT NULL, "
+            "ts REAL NOT NULL, "
+            "v BLOB NOT NULL)"
+        )
+        # Застарілі записи вже не повертаються панеллю, тому не зберігаються між запусками
+        self._conn.execute("DELETE FROM kv WHERE ts < ?", (time.time() - max_age,))
+
+    @staticmethod
+    def _scope(key: tuple) -> str:
+        return repr(key[1:2])
+
+    def get(self, key: tuple) -> Optional[Tuple[float, Any]]:
+        """Отримання запису (час збереження за time.time(), результат) або None."""
+        with self._lock:
+            row = self._conn.execute("SELECT ts, v FROM kv WHERE k = ?", (repr(key),)).fetchone()
+        if row is None:
+            return None
+        try:
+            value = json.loads(row[1])
+        except ValueError:
+            return None
+        # JSON не має кортежів: результат (успіх, дані) відновлюється у формі, яку записала панель
+        return row[0], tuple(value) if isinstance(value, list) else value
+
+    def set(self, key: tuple, value: Any) -> None:
+        """Збереження запису з поточним часом."""
+        blob = dumps_json(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (k, scope, ts, v) VALUES (?, ?, ?, ?)",
+                (repr(key), self._scope(key), time.time(), blob)
+            )
+
+    def invalidate(self, scope_id: Any) -> None:
+        """Видалення всіх записів, у ключі яких другим елементом є scope_id (напр. ("course", id))."""
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE scope = ?", (self._scope((None, scope_id)),))
+
+    def close(self) -> None:
+        """Закриття з'єднання з базою кешу."""
+        with self._lock:
+            self._conn.close()
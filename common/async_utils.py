@@ -0,0 +1,25 @@
+"""
+Допоміжні функції asyncio для паралельних запитів до Moodle.
+"""
+import asyncio
+from typing import Awaitable, Iterable, List, TypeVar, Union
+
+T = TypeVar("T")
+
+# Типове обмеження одночасних запитів до Moodle: більше паралельних викликів
+# сервер починає відхиляти (429) або обробляти з тайм-аутами
+DEFAULT_CONCURRENCY_LIMIT = 8
+
+async def gather_bounded(aws: Iterable[Awaitable[T]], limit: int = DEFAULT_CONCURRENCY_LIMIT) -> List[Union[T, BaseException]]:
+    """Паралельне виконання awaitable-об'єктів, не більше limit одночасно.
+
+    Результати повертаються в порядку aws; для awaitable, що завершився винятком,
+    повертається сам виняток (як asyncio.gather з return_exceptions=True).
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable[T]) -> T:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=True)
@@ -1,13 +1,46 @@
 import os
 import json
+import asyncio
+import logging
 import httpx
-from typing import Dict, Any, Tuple, Optional
+import random
+import weakref
+from typing import Dict, Any, Tuple, Optional, Iterable
 from dotenv import load_dotenv # <-- Додано імпорт
 
 # Завантажуємо змінні оточення з .env файлу (якщо він є)
 # Це краще робити на початку скрипта або модуля
 load_dotenv()
 
+# HTTP/2 доступний лише за наявності пакета h2 (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Повтори запитів до Moodle при тимчасових збоях (спроби, початкова затримка в секундах)
+API_RETRY_ATTEMPTS = 3
+API_RETRY_BASE_DELAY = 0.5
+# Відповіді, після яких запит можна повторити: сервер перевантажений або недоступний
+TRANSIENT_STATUS_CODES = frozenset({429, 502, 503, 504})
+# Відповіді, за яких Moodle точно не виконав запит (безпечно повторювати і функції, що змінюють дані)
+NOT_PROCESSED_STATUS_CODES = frozenset({429})
+# Помилки, за яких запит не дійшов до сервера
+TRANSIENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Для функцій читання повторюються також обірвані відповіді: повторне читання нічого не змінює
+READ_TRANSIENT_ERRORS = TRANSIENT_ERRORS + (httpx.ReadTimeout, httpx.RemoteProtocolError)
+
+logger = logging.getLogger(__name__)
+
+def is_read_only_function(function: str) -> bool:
+    """Чи лише читає дані функція Moodle API (core_course_get_contents, mod_assign_get_grades, ...)."""
+    return "_get_" in function
+
+def moodle_array(name: str, values: Iterable[Any]) -> Dict[str, Any]:
+    """Параметри-масив Moodle API: moodle_array("courseids", [5, 7]) -> {"courseids[0]": 5, "courseids[1]": 7}."""
+    return {f"{name}[{i}]": value for i, value in enumerate(values)}
+
 class MoodleAuth:
     # Видаляємо service_name, він більше не потрібен
     # Додаємо опціональний параметр token в __init__
@@ -23,21 +56,24 @@ class MoodleAuth:
         self.base_url = base_url
         self.token = token # Спочатку встановлюємо з аргументу (якщо передано)
         self.authenticated = False  # Додаємо флаг стану автентифікації
+        # Спільні HTTP клієнти з keep-alive пулом, по одному на цикл подій (з'єднання прив'язані до циклу).
+        # Слабкі ключі: клієнт тимчасового циклу звільняється разом із циклом
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
 
         # Якщо токен не передано через аргумент, пробуємо завантажити з .env
         if self.token is None:
             self.token = os.getenv("API_MOODLE_TOKEN")
             if self.token:
-                print("Токен успішно завантажено зі змінної оточення API_MOODLE_TOKEN.")
+                logger.info("Токен успішно завантажено зі змінної оточення API_MOODLE_TOKEN.")
             else:
-                print("Попередження: Токен не передано і змінна оточення API_MOODLE_TOKEN не знайдена.")
+                logger.warning("Попередження: Токен не передано і змінна оточення API_MOODLE_TOKEN не знайдена.")
 
         # Ініціалізуємо решту полів
         self.username = None # Логін не використовується при автентифікації токеном
         self.user_id = None
         self.is_teacher = os.getenv("FORCE_TEACHER_ROLE", "").lower() == "true"
         if self.is_teacher:
-            print("УВАГА: Роль викладача встановлена примусово через змінну оточення FORCE_TEACHER_ROLE")
+            logger.warning("УВАГА: Роль викладача встановлена примусово через змінну оточення FORCE_TEACHER_ROLE")
 
 
     # Метод login більше не є основним способом автентифікації
@@ -61,21 +97,21 @@ class MoodleAuth:
         if not self.token:
             return False, "Токен не надано (через аргумент або змінну оточення API_MOODLE_TOKEN)"
 
-        print("Перевірка валідності наданого токена...")
+        logger.debug("Перевірка валідності наданого токена...")
         is_valid, msg = await self.is_token_valid()
 
         if not is_valid:
             self.token = None
             self.authenticated = False
-            print(f"Помилка: Наданий токен недійсний або термін дії закінчився. {msg}")
+            logger.error("Помилка: Наданий токен недійсний або термін дії закінчився. %s", msg)
             return False, f"Наданий токен недійсний: {msg}"
 
-        print("Токен дійсний. Отримання інформації про користувача...")
+        logger.debug("Токен дійсний. Отримання інформації про користувача...")
         if not self.user_id:
             info_ok, info_msg = await self._get_user_info()
             if not info_ok:
                 self.authenticated = False
-                print(f"Критична помилка: Не вдалося отримати User ID з валідним токеном: {info_msg}")
+                logger.error("Критична помилка: Не вдалося отримати User ID з валідним токеном: %s", info_msg)
                 return False, f"Не вдалося отримати User ID з валідним токеном: {info_msg}"
         else:
             info_ok = True
@@ -83,15 +119,15 @@ class MoodleAuth:
         success_site_info, site_info_data = await self._call_api("core_webservice_get_site_info")
         if success_site_info and isinstance(site_info_data, dict):
             self.username = site_info_data.get("username")
-            print(f"Ім'я користувача (з токена): {self.username}")
+            logger.debug("Ім'я користувача (з токена): %s", self.username)
         else:
             self.username = "TokenUser"
 
         role_ok = await self._get_user_role()
         if role_ok:
-            print(f"Роль користувача визначена. is_teacher: {self.is_teacher}")
+            logger.debug("Роль користувача визначена. is_teacher: %s", self.is_teacher)
         else:
-            print("Попередження: Не вдалося визначити роль користувача.")
+            logger.warning("Попередження: Не вдалося визначити роль користувача.")
 
         self.authenticated = True
         return True, "Автентифікація за допомогою токена успішна"
@@ -105,22 +141,76 @@ class MoodleAuth:
             # Спробуємо автентифікуватися
             auth_success, auth_msg = await self.authenticate_with_token()
             if not auth_success:
-                print(f"Не запускаємо update_user_info: {auth_msg}")
+                logger.debug("Не запускаємо update_user_info: %s", auth_msg)
                 return False, f"Автентифікація не пройдена: {auth_msg}"
 
         success, msg = await self._get_user_info()
         if not success:
-            print(f"Помилка оновлення інформації користувача: {msg}")
+            logger.error("Помилка оновлення інформації користувача: %s", msg)
             return False, f"Помилка оновлення інформації: {msg}"
 
         role_ok = await self._get_user_role()
         if not role_ok:
-            print("Помилка оновлення ролі користувача")
+            logger.error("Помилка оновлення ролі користувача")
             return False, "Не вдалося оновити роль користувача"
 
-        print("Інформація користувача успішно оновлена")
+        logger.info("Інформація користувача успішно оновлена")
         return True, "Інформація користувача оновлена успішно"
 
+    def _get_client(self) -> httpx.AsyncClient:
+        """Спільний HTTP клієнт для поточного циклу подій.
+        
+        З'єднання пулу прив'язані до циклу подій, а той самий об'єкт використовується і в циклі Gradio,
+        і в циклі run_sync (app.py), тому кожен цикл має власний клієнт, який не перестворюється
+        при перемиканні між циклами.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._clients[loop] = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=30.0,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=20, keepalive_expiry=60)
+            )
+        return client
+
+    async def aclose(self) -> None:
+        """Закриття спільних HTTP клієнтів: клієнт поточного циклу закривається одразу,
+        клієнти інших запущених циклів - у їхніх циклах."""
+        current = asyncio.get_running_loop()
+        clients, self._clients = list(self._clients.items()), weakref.WeakKeyDictionary()
+        for loop, client in clients:
+            if client.is_closed:
+                continue
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def _post_with_retry(self, request_params: Dict[str, Any], read_only: bool = False) -> httpx.Response:
+        """POST до REST API Moodle з повторами та експоненційною затримкою при тимчасових збоях.
+
+        Функції читання (read_only=True) повторюються при відповідях 429/502/503/504 та обірваних
+        з'єднаннях. Для функцій, що змінюють дані (наприклад, створення оголошення), повторюються
+        лише запити, які не дійшли до сервера або відхилені з 429, тож вони не виконаються двічі.
+        """
+        retry_statuses = TRANSIENT_STATUS_CODES if read_only else NOT_PROCESSED_STATUS_CODES
+        retry_errors = READ_TRANSIENT_ERRORS if read_only else TRANSIENT_ERRORS
+        delay = API_RETRY_BASE_DELAY
+        for attempt in range(1, API_RETRY_ATTEMPTS + 1):
+            try:
+                response = await self._get_client().post("/webservice/rest/server.php", data=request_params)
+                if response.status_code not in retry_statuses or attempt == API_RETRY_ATTEMPTS:
+                    return response
+                logger.warning("Moodle API відповів %s, повтор %s/%s...", response.status_code, attempt, API_RETRY_ATTEMPTS - 1)
+            except retry_errors as e:
+                if attempt == API_RETRY_ATTEMPTS:
+                    raise
+                logger.warning("Тимчасова помилка з'єднання з Moodle (%r), повтор %s/%s...", e, attempt, API_RETRY_ATTEMPTS - 1)
+            await asyncio.sleep(delay + random.uniform(0, delay / 5))
+            delay *= 2
+
     async def _call_api(self, function: str, params: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
         """Виконання API запитів до Moodle."""
         # Перевірка токена тепер на початку authenticate_with_token
@@ -130,7 +220,6 @@ class MoodleAuth:
 
         # --- Решта коду методу _call_api без змін ---
         try:
-            url = f"{self.base_url}/webservice/rest/server.php"
             request_params = {
                 "wstoken": self.token,
                 "wsfunction": function,
@@ -151,55 +240,52 @@ class MoodleAuth:
                          processed_params[key] = value
                 request_params.update(processed_params)
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, params=request_params)
-                response.raise_for_status()
-                try:
-                    data = response.json()
-                except json.JSONDecodeError as json_err:
-                     print(f"Не вдалося декодувати JSON з API відповіді для функції {function}: {json_err}")
-                     print(f"Тіло відповіді: {response.text[:500]}")
-                     return False, f"Помилка: API {function} повернуло невалідний JSON"
-
-                if isinstance(data, dict):
-                    if "exception" in data:
-                        error_msg = data.get('message', 'Невідома помилка Moodle API')
-                        error_code = data.get('errorcode', 'unknown')
-                        debug_info = data.get('debuginfo', '')
-                        print(f"Помилка Moodle API ({function}). Код: {error_code}, Повідомлення: {error_msg}, Debug: {debug_info}")
-                        # Якщо помилка - невалідний токен, скинемо його
-                        if error_code == 'invalidtoken':
-                             self.token = None
-                             print("Токен визнано невалідним сервером.")
-                        return False, f"Помилка Moodle API ({error_code}): {error_msg}"
-                    elif "error" in data and "errorcode" in data and len(data.keys()) <= 3:
-                        error_msg = data.get('error')
-                        error_code = data.get('errorcode')
-                        print(f"Помилка Moodle API ({function}). Код: {error_code}, Повідомлення: {error_msg}")
-                        return False, f"Помилка Moodle API ({error_code}): {error_msg}"
-                return True, data
+            response = await self._post_with_retry(request_params, read_only=is_read_only_function(function))
+            response.raise_for_status()
+            try:
+                data = response.json()
+            except json.JSONDecodeError as json_err:
+                 logger.error("Не вдалося декодувати JSON з API відповіді для функції %s: %s", function, json_err)
+                 logger.debug("Тіло відповіді: %s", response.text[:500])
+                 return False, f"Помилка: API {function} повернуло невалідний JSON"
+
+            if isinstance(data, dict):
+                if "exception" in data:
+                    error_msg = data.get('message', 'Невідома помилка Moodle API')
+                    error_code = data.get('errorcode', 'unknown')
+                    debug_info = data.get('debuginfo', '')
+                    logger.error("Помилка Moodle API (%s). Код: %s, Повідомлення: %s, Debug: %s", function, error_code, error_msg, debug_info)
+                    # Якщо помилка - невалідний токен, скинемо його
+                    if error_code == 'invalidtoken':
+                         self.token = None
+                         logger.warning("Токен визнано невалідним сервером.")
+                    return False, f"Помилка Moodle API ({error_code}): {error_msg}"
+                elif "error" in data and "errorcode" in data and len(data.keys()) <= 3:
+                    error_msg = data.get('error')
+                    error_code = data.get('errorcode')
+                    logger.error("Помилка Moodle API (%s). Код: %s, Повідомлення: %s", function, error_code, error_msg)
+                    return False, f"Помилка Moodle API ({error_code}): {error_msg}"
+            return True, data
 
         except httpx.HTTPStatusError as e:
              # Якщо помилка 403 або подібна, можливо токен невалідний
              if e.response.status_code in [403, 401]:
                  self.token = None # Припускаємо, що токен невалідний
-                 print(f"Помилка HTTP {e.response.status_code} при виклику API {function}. Можливо, токен недійсний.")
+                 logger.error("Помилка HTTP %s при виклику API %s. Можливо, токен недійсний.", e.response.status_code, function)
                  return False, f"Помилка HTTP {e.response.status_code} (можливо, недійсний токен)"
              else:
-                print(f"HTTP помилка при виклику API {function}: {e.response.status_code}")
-                print(f"Тіло відповіді: {e.response.text[:500]}")
+                logger.error("HTTP помилка при виклику API %s: %s", function, e.response.status_code)
+                logger.debug("Тіло відповіді: %s", e.response.text[:500])
                 return False, f"Помилка HTTP {e.response.status_code} при виклику API {function}"
         # ... (решта обробки помилок з _call_api) ...
         except httpx.TimeoutException:
-            print(f"Помилка: Час очікування відповіді від API {function} вичерпано.")
+            logger.error("Помилка: Час очікування відповіді від API %s вичерпано.", function)
             return False, f"Помилка: API {function} не відповіло вчасно (timeout)."
         except httpx.RequestError as e:
-            print(f"Помилка мережі при виклику API {function}: {str(e)}")
+            logger.error("Помилка мережі при виклику API %s: %s", function, str(e))
             return False, f"Помилка мережі при виклику Moodle API {function}: {str(e)}"
         except Exception as e:
-            import traceback
-            print(f"Непередбачена помилка при виклику API {function}: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Непередбачена помилка при виклику API %s: %s", function, str(e))
             return False, f"Непередбачена помилка при виклику Moodle API {function}: {str(e)}"
 
 
@@ -219,43 +305,43 @@ class MoodleAuth:
              # data тут буде повідомленням про помилку
              return False, f"Не вдалося викликати core_webservice_get_site_info: {data}"
         else:
-             print(f"Відповідь від core_webservice_get_site_info не містить 'userid': {data}")
+             logger.debug("Відповідь від core_webservice_get_site_info не містить 'userid': %s", data)
              return False, "Не вдалося отримати 'userid' з відповіді API"
 
     # Всередині класу MoodleAuth в auth.py
     async def _get_user_role(self) -> bool:
         """Визначення ролі користувача через перевірку прав у курсах."""
         if not self.user_id:
-            print("User ID невідомий, неможливо перевірити права.")
+            logger.debug("User ID невідомий, неможливо перевірити права.")
             return False
 
         # Спочатку перевіряємо примусове призначення ролі
         force_teacher = os.getenv("FORCE_TEACHER_ROLE", "").lower() == "true"
         if force_teacher:
             self.is_teacher = True
-            print("УВАГА: Роль викладача встановлена примусово через FORCE_TEACHER_ROLE")
+            logger.warning("УВАГА: Роль викладача встановлена примусово через FORCE_TEACHER_ROLE")
             return True
 
-        print(f"Отримання курсів для користувача ID: {self.user_id}")
+        logger.debug("Отримання курсів для користувача ID: %s", self.user_id)
         success, courses_data = await self._call_api("core_enrol_get_users_courses", {
             "userid": self.user_id
         })
 
         if not success or not isinstance(courses_data, list):
-            print(f"Не вдалося отримати список курсів: {courses_data}")
+            logger.warning("Не вдалося отримати список курсів: %s", courses_data)
             return False
 
         # Перевірка через параметри курсів
         for course in courses_data:
             if 'roleid' in course and course['roleid'] in [3, 4]:  # 3 і 4 часто відповідають викладачам
                 self.is_teacher = True
-                print(f"Знайдено роль викладача в курсі ID {course.get('id')}")
+                logger.debug("Знайдено роль викладача в курсі ID %s", course.get('id'))
                 return True
         
         # Якщо інформації про роль у курсі немає, спробуємо інший підхід
         try:
             for course_id in [course.get('id') for course in courses_data if course.get('id')]:
-                print(f"  Отримання ролей для курсу ID {course_id}...")
+                logger.debug("  Отримання ролей для курсу ID %s...", course_id)
                 success_roles, roles_data = await self._call_api("core_enrol_get_enrolled_users", {
                     "courseid": course_id
                 })
@@ -266,13 +352,13 @@ class MoodleAuth:
                             for role in user.get('roles', []):
                                 if role.get('shortname') in ['editingteacher', 'teacher', 'coursecreator', 'manager']:
                                     self.is_teacher = True
-                                    print(f"Знайдено роль викладача ({role.get('shortname')}) в курсі ID {course_id}")
+                                    logger.debug("Знайдено роль викладача (%s) в курсі ID %s", role.get('shortname'), course_id)
                                     return True
         except Exception as e:
-            print(f"Помилка при перевірці ролей у курсі: {e}")
+            logger.error("Помилка при перевірці ролей у курсі: %s", e)
             
         self.is_teacher = False
-        print("Права викладача не знайдено в жодному з курсів.")
+        logger.debug("Права викладача не знайдено в жодному з курсів.")
         return True
 
     # Метод is_token_valid тепер використовує _get_user_info
@@ -334,7 +420,7 @@ async def main():
         # Приклад: Отримати повну інформацію про себе
         success, user_details = await moodle._call_api(
             "core_user_get_users_by_field",
-            params={"field": "id", "values[0]": moodle.user_id}
+            params={"field": "id", **moodle_array("values", [moodle.user_id])}
         )
         if success and user_details:
             print("Деталі користувача:")
@@ -347,8 +433,6 @@ async def main():
             # user_details тут містить повідомлення про помилку
             print(f"Помилка отримання деталей користувача: {user_details}")
 
-import asyncio
-
 if __name__ == "__main__":
      # Переконайтесь, що ваш основний скрипт (app.py) викликає подібну логіку
      # для ініціалізації та автентифікації MoodleAuth перед використанням.
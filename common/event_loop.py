@@ -0,0 +1,51 @@
+"""
+Спільний цикл подій для синхронних обробників.
+Синхронний код (ініціалізація дашбордів, перемикання режимів у app.py) виконує корутини
+в одному довготривалому циклі замість створення нового циклу на кожен виклик.
+"""
+import asyncio
+import sys
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+# uvloop (libuv) пришвидшує цикл подій; на Windows він недоступний, тоді використовується asyncio
+try:
+    import uvloop
+    _new_event_loop = uvloop.new_event_loop
+except ImportError:
+    _new_event_loop = asyncio.new_event_loop
+
+T = TypeVar("T")
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Цикл подій у фоновому потоці (створюється при першому виклику)."""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = _new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="sync-bridge-loop", daemon=True).start()
+    return _LOOP
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Виконання корутини зі синхронного коду з очікуванням результату.
+
+    Безпечно для одночасних викликів з кількох потоків обробників Gradio.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    """Виконання корутини в новому циклі подій (uvloop, якщо встановлено) - аналог asyncio.run для CLI-скриптів."""
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=_new_event_loop) as runner:
+            return runner.run(coro)
+    loop = _new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        asyncio.set_event_loop(None)
+        loop.close()
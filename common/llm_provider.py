@@ -2,16 +2,82 @@
 Модуль для взаємодії з різними LLM провайдерами.
 Забезпечує єдиний інтерфейс для роботи з різними моделями.
 """
-from typing import Dict, Any, List, Optional, Union, Tuple
+from typing import Dict, Any, List, Optional, Union, Tuple, AsyncIterator
 import httpx
 import json
 import os
 import asyncio
-import subprocess
+import logging
+import time
 from abc import ABC, abstractmethod
+from datetime import datetime
+
+# orjson пришвидшує серіалізацію запитів; без нього використовується stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 доступний лише за наявності пакета h2 (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Python клієнт MCP потрібен лише для generate_response_via_mcp
+try:
+    from mcp_python import MCPClient, MCPClientConfig
+except ImportError:
+    MCPClient = MCPClientConfig = None
 
 MAX_PROMPT_LENGTH = 10000
 MAX_CONTEXT_SIZE = 100000
+DEFAULT_CLAUDE_API_URL = "https://api.anthropic.com/v1/messages"
+
+# Учасники курсу для MCP контексту: лише поля, що потрапляють у промпт, і роль для фільтрації
+MCP_STUDENT_FIELDS_PARAMS = {
+    "options[0][name]": "userfields",
+    "options[0][value]": "id,fullname,email,roles"
+}
+MCP_CONTEXT_MAX_STUDENTS = 20  # Студентів, перелічених у контексті поіменно
+# Скільки секунд останній MCP контекст курсу додається до запитів без use_mcp (уточнення на кшталт
+# "а хто з них не здав?" не містять слів про курс, але спираються на ті самі дані)
+MCP_CONTEXT_REUSE_TTL = 5 * 60
+
+# Базовий системний промпт Claude: незмінний між ходами, тому йде першим кешованим блоком
+CLAUDE_SYSTEM_PROMPT = """Ви корисний асистент для навчальної платформи Moodle.
+Ти отримуєш інформацію про навчальні дисципліни та активність студентів через MCP сервер.
+Для отримання даних використовуй наступні інструменти:
+1. core_course_get_courses - отримання інформації про курси
+2. core_course_get_contents - отримання вмісту курсу
+3. core_enrol_get_enrolled_users - отримання списку студентів
+4. mod_assign_get_assignments - отримання завдань
+5. mod_assign_get_submissions - отримання зданих робіт
+6. gradereport_user_get_grade_items - отримання оцінок
+7. core_user_get_users_by_field - отримання інформації про користувачів
+
+Не використовуй жодних інших джерел для відповіді.
+Відповідайте українською мовою, якщо явно не зазначено інше.
+
+ВАЖЛИВО: МИ ВЖЕ ОТРИМАЛИ ДЛЯ ТЕБЕ НЕОБХІДНІ ДАНІ З MOODLE. ТОБІ НЕ ПОТРІБНО ВИКЛИКАТИ API НАПРЯМУ.
+НЕ ПИШИ ВИГАДАНИЙ КОД ДЛЯ ВИКЛИКУ API. ВИКОРИСТОВУЙ ЛИШЕ ДАНІ, ЯКІ МИ НАДАЛИ ТОБІ В КОНТЕКСТІ."""
+
+def dumps_json(obj: Any, sort_keys: bool = False) -> bytes:
+    """Серіалізація в компактний UTF-8 JSON (orjson, якщо встановлено, інакше stdlib json)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0, default=str)
+    return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+def serialize_context(context: Dict[str, Any]) -> bytes:
+    """Детермінована серіалізація контексту (сортовані ключі, компактні роздільники).
+    
+    Однаковий контекст завжди дає однакові байти незалежно від порядку вставки ключів,
+    що потрібно для стабільного префікса запиту і prompt cache.
+    """
+    return dumps_json(context, sort_keys=True)
 
 class LLMProvider(ABC):
     """Базовий клас для всіх LLM провайдерів."""
@@ -36,44 +102,58 @@ class ClaudeProvider(LLMProvider):
         super().__init__("claude")
         self.model = model
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        self.api_url = "https://api.anthropic.com/v1/messages"
+        # Адресу можна перевизначити, наприклад для проксі-шлюзу з тим самим Messages API
+        self.api_url = os.getenv("ANTHROPIC_API_URL", DEFAULT_CLAUDE_API_URL)
         self.cache = {}  # Простий кеш відповідей
-        self.mcp_server_process = None  # Процес MCP сервера
+        self.mcp_server_process = None  # Процес MCP сервера (asyncio.subprocess.Process)
         self.mcp_server_url = None  # URL MCP сервера
+        self._http_client = None  # Спільний HTTP клієнт з пулом з'єднань
+        # Останній MCP контекст: (id курсу, токен) -> (time.monotonic() отримання, текст для системного промпту)
+        self._mcp_context_cache: Dict[Tuple[Any, str], Tuple[float, str]] = {}
         
         if not self.api_key:
-            print("УВАГА: Змінна оточення ANTHROPIC_API_KEY не знайдена")
+            logger.warning("УВАГА: Змінна оточення ANTHROPIC_API_KEY не знайдена")
     
     async def is_available(self) -> bool:
         """Перевірка доступності API ключа Claude."""
         return self.api_key is not None
 
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Спільний HTTP клієнт з keep-alive пулом з'єднань (створюється ліниво)."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=16, keepalive_expiry=60)
+            )
+        return self._http_client
+
     async def _call_mcp_api(self, function: str, params: Dict[str, Any], mcp_server_url: str, mcp_token: str) -> Dict[str, Any]:
         """Виклик API Moodle через MCP сервер."""
         try:
-            print(f"Виклик Moodle API через MCP: {function} з параметрами {params}")
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{mcp_server_url}/webservice/rest/server.php",
-                    params={
-                        "wstoken": mcp_token,
-                        "wsfunction": function,
-                        "moodlewsrestformat": "json",
-                        **params
-                    }
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                # Перевірка на помилки у відповіді Moodle
-                if isinstance(data, dict) and "exception" in data:
-                    print(f"Помилка Moodle API: {data.get('message', 'Невідома помилка')}")
-                    return {"error": data.get('message', 'Невідома помилка Moodle API')}
-                
-                print(f"Успішна відповідь від MCP API {function}")
-                return data
+            logger.debug("Виклик Moodle API через MCP: %s з параметрами %s", function, params)
+            client = self._get_http_client()
+            response = await client.post(
+                f"{mcp_server_url}/webservice/rest/server.php",
+                timeout=30.0,
+                params={
+                    "wstoken": mcp_token,
+                    "wsfunction": function,
+                    "moodlewsrestformat": "json",
+                    **params
+                }
+            )
+            response.raise_for_status()
+            data = response.json()
+            
+            # Перевірка на помилки у відповіді Moodle
+            if isinstance(data, dict) and "exception" in data:
+                logger.error("Помилка Moodle API: %s", data.get('message', 'Невідома помилка'))
+                return {"error": data.get('message', 'Невідома помилка Moodle API')}
+            
+            logger.info("Успішна відповідь від MCP API %s", function)
+            return data
         except Exception as e:
-            print(f"Помилка виклику MCP API {function}: {e}")
+            logger.error("Помилка виклику MCP API %s: %s", function, e)
             return {"error": str(e)}
             
     async def _prepare_mcp_context(self, context: Dict[str, Any], mcp_server_url: str, mcp_token: str) -> str:
@@ -88,13 +168,13 @@ class ClaudeProvider(LLMProvider):
                 if course_id:
                     # Отримання студентів курсу
                     students_data = await self._call_mcp_api("core_enrol_get_enrolled_users", 
-                                                            {"courseid": course_id}, 
+                                                            {"courseid": course_id, **MCP_STUDENT_FIELDS_PARAMS}, 
                                                             mcp_server_url, mcp_token)
                     if not isinstance(students_data, dict) or "error" not in students_data:
                         # Фільтруємо тільки студентів
                         students = [user for user in students_data if any(role.get('shortname') == 'student' for role in user.get('roles', []))]
                         mcp_data["students"] = students
-                        print(f"Отримано {len(students)} студентів через MCP для курсу {course_id}")
+                        logger.debug("Отримано %s студентів через MCP для курсу %s", len(students), course_id)
                     
                     # Отримання завдань курсу
                     assignments_data = await self._call_mcp_api("mod_assign_get_assignments", 
@@ -105,9 +185,9 @@ class ClaudeProvider(LLMProvider):
                             for course in assignments_data["courses"]:
                                 if str(course.get('id')) == str(course_id):
                                     mcp_data["assignments"] = course.get("assignments", [])
-                                    print(f"Отримано {len(mcp_data.get('assignments', []))} завдань через MCP")
+                                    logger.debug("Отримано %s завдань через MCP", len(mcp_data.get('assignments', [])))
         except Exception as e:
-            print(f"Помилка при підготовці MCP контексту: {e}")
+            logger.error("Помилка при підготовці MCP контексту: %s", e)
         
         # Повертаємо форматований контекст для додавання до системного промпту
         if mcp_data:
@@ -116,10 +196,10 @@ class ClaudeProvider(LLMProvider):
             # Додаємо дані про студентів
             if "students" in mcp_data and mcp_data["students"]:
                 mcp_context += "## Студенти курсу:\n"
-                for i, student in enumerate(mcp_data["students"][:20]):  # Обмежуємо до 20 студентів
+                for i, student in enumerate(mcp_data["students"][:MCP_CONTEXT_MAX_STUDENTS]):
                     mcp_context += f"{i+1}. {student.get('fullname', 'Невідомо')} (ID: {student.get('id', 'N/A')}, Email: {student.get('email', 'N/A')})\n"
-                if len(mcp_data["students"]) > 20:
-                    mcp_context += f"...та ще {len(mcp_data['students']) - 20} студентів.\n"
+                if len(mcp_data["students"]) > MCP_CONTEXT_MAX_STUDENTS:
+                    mcp_context += f"...та ще {len(mcp_data['students']) - MCP_CONTEXT_MAX_STUDENTS} студентів.\n"
                 mcp_context += f"\nВсього студентів: {len(mcp_data['students'])}\n\n"
             
             # Додаємо дані про завдання
@@ -128,7 +208,6 @@ class ClaudeProvider(LLMProvider):
                 for i, assignment in enumerate(mcp_data["assignments"]):
                     due_date = "Не встановлено"
                     if assignment.get("duedate") and assignment["duedate"] > 0:
-                        from datetime import datetime
                         due_date = datetime.fromtimestamp(assignment["duedate"]).strftime('%d.%m.%Y %H:%M')
                     
                     mcp_context += f"{i+1}. {assignment.get('name', 'Без назви')} (ID: {assignment.get('id', 'N/A')}, Термін: {due_date})\n"
@@ -169,40 +248,41 @@ class ClaudeProvider(LLMProvider):
         except Exception as e:
             return f"Помилка запуску MCP сервера: {e}", ""
     
-    def stop_mcp_server(self) -> str:
-        """Зупинка MCP сервера."""
-        if self.mcp_server_process and self.mcp_server_process.poll() is None:
-            print("Зупинка MCP сервера...")
+    async def stop_mcp_server(self) -> str:
+        """Зупинка MCP сервера (процес asyncio.subprocess, цикл подій не блокується)."""
+        if self.mcp_server_process and self.mcp_server_process.returncode is None:
+            logger.debug("Зупинка MCP сервера...")
             self.mcp_server_process.terminate()
             try:
-                stdout, stderr = self.mcp_server_process.communicate(timeout=5)
-                print("MCP сервер зупинено.")
+                _, stderr = await asyncio.wait_for(self.mcp_server_process.communicate(), timeout=5)
+                logger.info("MCP сервер зупинено.")
                 if stderr:
-                    print(f"Помилки MCP сервера при зупинці: {stderr}")
-                self.mcp_server_process = None
+                    logger.error("Помилки MCP сервера при зупинці: %s", stderr.decode('utf-8', errors='replace'))
                 return "MCP сервер зупинено"
-            except subprocess.TimeoutExpired:
-                print("MCP сервер не відповів на terminate, примусова зупинка (kill)...")
+            except asyncio.TimeoutError:
+                logger.warning("MCP сервер не відповів на terminate, примусова зупинка (kill)...")
                 self.mcp_server_process.kill()
-                stdout, stderr = self.mcp_server_process.communicate()
-                print("MCP сервер примусово зупинено.")
-                self.mcp_server_process = None
+                await self.mcp_server_process.wait()
+                logger.info("MCP сервер примусово зупинено.")
                 return "MCP сервер примусово зупинено"
+            finally:
+                self.mcp_server_process = None
         else:
-            print("Спроба зупинити MCP сервер, але він не запущений.")
+            logger.debug("Спроба зупинити MCP сервер, але він не запущений.")
             return "MCP сервер не запущено"
     
     async def generate_response_via_mcp(self, prompt: str, context: Dict[str, Any], mcp_server_url: str, mcp_token: str) -> str:
         """Генерація відповіді через MCP сервер."""
         try:
-            print(f"Генерація відповіді через MCP сервер: {mcp_server_url}")
+            logger.debug("Генерація відповіді через MCP сервер: %s", mcp_server_url)
             
             # Оскільки ми маємо проблеми з прямою HTTP взаємодією з MCP, 
             # використаємо інший підхід - виклик функцій MCP через Python API
             
-            # Імпортуємо MCP клієнт
+            if MCPClient is None:
+                return "Помилка: Модуль mcp_python не встановлено. Будь ласка, встановіть його за допомогою 'pip install mcp-python'"
+            
             try:
-                from mcp_python import MCPClient, MCPClientConfig
                 config = MCPClientConfig(base_url=mcp_server_url)
                 client = MCPClient(config=config)
                 
@@ -236,8 +316,6 @@ class ClaudeProvider(LLMProvider):
                 # Відправляємо повідомлення до LLM через MCP
                 response = await client.chat(prompt, system=system_prompt)
                 return response
-            except ImportError:
-                return "Помилка: Модуль mcp_python не встановлено. Будь ласка, встановіть його за допомогою 'pip install mcp-python'"
             except Exception as e:
                 return f"Помилка взаємодії з MCP через Python API: {str(e)}"
                 
@@ -260,60 +338,155 @@ class ClaudeProvider(LLMProvider):
                 if success and server_url:
                     mcp_server_url = server_url
                 else:
-                    print(f"Не вдалося запустити MCP сервер: {message}. Переходимо до прямого режиму.")
+                    logger.warning("Не вдалося запустити MCP сервер: %s. Переходимо до прямого режиму.", message)
                     use_full_mcp_server = False
             
             # Якщо все налаштовано для використання повного MCP сервера
             if use_full_mcp_server and mcp_server_url:
                 return await self.generate_response_via_mcp(prompt, context, mcp_server_url, mcp_token)
         
+        request = await self._build_claude_request(prompt, context, use_mcp, mcp_server_url, mcp_token)
+        if isinstance(request, str):
+            return request
+        headers, data = request
+        
+        try:
+            logger.debug("Відправка запиту до Claude API, модель: %s", self.model)
+            client = self._get_http_client()
+            response = await client.post(
+                self.api_url,
+                timeout=60.0,
+                headers=headers,
+                content=dumps_json(data)
+            )
+            response.raise_for_status()
+            result = response.json()
+            
+            # Отримання текстової відповіді
+            content = result.get("content", [])
+            text_chunks = []
+            
+            for item in content:
+                if item.get("type") == "text":
+                    text_chunks.append(item.get("text", ""))
+            
+            return "".join(text_chunks) if text_chunks else "Помилка: Не вдалося отримати текстову відповідь від Claude API."
+            
+        except httpx.HTTPStatusError as e:
+            error_msg = self._format_http_error(e)
+            logger.error(error_msg)
+            return f"Помилка генерації відповіді: {error_msg}"
+        except Exception as e:
+            error_msg = f"Помилка взаємодії з Claude API: {str(e)}"
+            logger.error(error_msg)
+            return f"Помилка генерації відповіді: {error_msg}"
+
+    async def generate_response_stream(self, prompt: str, context: Optional[Dict[str, Any]] = None, use_mcp: bool = False, mcp_server_url: Optional[str] = None, mcp_token: Optional[str] = None, use_full_mcp_server: bool = False) -> AsyncIterator[str]:
+        """Потокова генерація відповіді: текстові фрагменти повертаються в міру надходження від Claude."""
+        if not context:
+            context = {}
+        
+        # Повний MCP сервер не підтримує потокову передачу, тому віддаємо відповідь одним фрагментом
+        if use_full_mcp_server and use_mcp and mcp_server_url and mcp_token:
+            yield await self.generate_response(prompt, context, use_mcp, mcp_server_url, mcp_token, use_full_mcp_server)
+            return
+        
+        request = await self._build_claude_request(prompt, context, use_mcp, mcp_server_url, mcp_token)
+        if isinstance(request, str):
+            yield request
+            return
+        headers, data = request
+        
+        try:
+            logger.debug("Відправка потокового запиту до Claude API, модель: %s", self.model)
+            client = self._get_http_client()
+            async with client.stream(
+                "POST",
+                self.api_url,
+                timeout=60.0,
+                headers=headers,
+                content=dumps_json({**data, "stream": True})
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                
+                # Відповідь приходить як Server-Sent Events; текст містять події content_block_delta
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    if event.get("type") == "content_block_delta":
+                        delta = event.get("delta", {})
+                        if delta.get("type") == "text_delta":
+                            yield delta.get("text", "")
+                    elif event.get("type") == "error":
+                        error_msg = event.get("error", {}).get("message", "Невідома помилка")
+                        logger.error("Помилка потоку Claude API: %s", error_msg)
+                        yield f"\n\nПомилка генерації відповіді: {error_msg}"
+        except httpx.HTTPStatusError as e:
+            error_msg = self._format_http_error(e)
+            logger.error(error_msg)
+            yield f"Помилка генерації відповіді: {error_msg}"
+        except Exception as e:
+            error_msg = f"Помилка взаємодії з Claude API: {str(e)}"
+            logger.error(error_msg)
+            yield f"Помилка генерації відповіді: {error_msg}"
+
+    @staticmethod
+    def _format_http_error(e: httpx.HTTPStatusError) -> str:
+        """Текст помилки HTTP від Claude API з деталями з тіла відповіді (якщо є)."""
+        error_msg = f"Помилка HTTP при виклику Claude API: {e.response.status_code}"
+        try:
+            error_data = e.response.json()
+            if "error" in error_data:
+                error_msg += f"\nДеталі: {error_data['error'].get('message', '')}"
+        except:
+            pass
+        return error_msg
+
+    async def _build_claude_request(self, prompt: str, context: Dict[str, Any], use_mcp: bool, mcp_server_url: Optional[str], mcp_token: Optional[str]) -> Union[str, Tuple[Dict[str, str], Dict[str, Any]]]:
+        """Підготовка заголовків і тіла запиту до Claude API (або тексту помилки, якщо запит неможливий)."""
         # Звичайний режим прямого доступу до Moodle API
-        print(f"Генерація відповіді для користувача {context.get('user_id')} в режимі {context.get('mode')}")
+        logger.debug("Генерація відповіді для користувача %s в режимі %s", context.get("user_id"), context.get("mode"))
         if not self.api_key:
             return "Помилка: API ключ для Claude не налаштовано. Додайте ANTHROPIC_API_KEY у файл .env."
         
         if len(prompt) > MAX_PROMPT_LENGTH:
             return "Помилка: Занадто довгий запит"
         
-        if context and len(json.dumps(context)) > MAX_CONTEXT_SIZE:
+        if context and len(serialize_context(context)) > MAX_CONTEXT_SIZE:
             return "Помилка: Занадто великий контекст"
         
-        # Підготовка системного промпту
-        system_prompt = """Ви корисний асистент для навчальної платформи Moodle. 
-        Ти отримуєш інформацію про навчальні дисципліни та активність студентів через MCP сервер.
-        Для отримання даних використовуй наступні інструменти:
-        1. core_course_get_courses - отримання інформації про курси
-        2. core_course_get_contents - отримання вмісту курсу
-        3. core_enrol_get_enrolled_users - отримання списку студентів
-        4. mod_assign_get_assignments - отримання завдань
-        5. mod_assign_get_submissions - отримання зданих робіт
-        6. gradereport_user_get_grade_items - отримання оцінок
-        7. core_user_get_users_by_field - отримання інформації про користувачів
-        
-        Не використовуй жодних інших джерел для відповіді.
-        Відповідайте українською мовою, якщо явно не зазначено інше.
-        
-        ВАЖЛИВО: МИ ВЖЕ ОТРИМАЛИ ДЛЯ ТЕБЕ НЕОБХІДНІ ДАНІ З MOODLE. ТОБІ НЕ ПОТРІБНО ВИКЛИКАТИ API НАПРЯМУ.
-        НЕ ПИШИ ВИГАДАНИЙ КОД ДЛЯ ВИКЛИКУ API. ВИКОРИСТОВУЙ ЛИШЕ ДАНІ, ЯКІ МИ НАДАЛИ ТОБІ В КОНТЕКСТІ.
-        """
-        
-        # Отримуємо дані з MCP, якщо це потрібно
-        mcp_context = ""
-        if use_mcp and mcp_server_url and mcp_token and not use_full_mcp_server:
+        # Стабільна частина системного промпту (базовий промпт + персона) йде першою
+        # і позначається cache_control, щоб Claude кешував префікс між ходами діалогу.
+        system_blocks = [{"type": "text", "text": CLAUDE_SYSTEM_PROMPT}]
+        if context.get("system_blocks"):
+            system_blocks.extend(dict(block) for block in context["system_blocks"])
+        elif "system_prompt" in context:
+            system_blocks.append({"type": "text", "text": context["system_prompt"]})
+        system_blocks[-1]["cache_control"] = {"type": "ephemeral"}
+
+        # Динамічна частина (дані з MCP, інформація про курс) іде після кешованого префікса
+        dynamic_system = []
+
+        # Отримуємо дані з MCP, якщо це потрібно; інакше повторно використовуємо нещодавно отримані дані курсу
+        mcp_key = (context.get("selected_course") or context.get("course", {}).get("id"), mcp_token)
+        if use_mcp and mcp_server_url and mcp_token:
             try:
                 mcp_context = await self._prepare_mcp_context(context, mcp_server_url, mcp_token)
                 if mcp_context:
-                    system_prompt += "\n\n" + mcp_context
+                    dynamic_system.append(mcp_context)
+                    self._mcp_context_cache[mcp_key] = (time.monotonic(), mcp_context)
             except Exception as e:
-                print(f"Помилка при отриманні даних через MCP: {e}")
-        
+                logger.error("Помилка при отриманні даних через MCP: %s", e)
+        elif mcp_key[0] and (cached := self._mcp_context_cache.get(mcp_key)):
+            if time.monotonic() - cached[0] < MCP_CONTEXT_REUSE_TTL:
+                dynamic_system.append(cached[1])
+            else:
+                del self._mcp_context_cache[mcp_key]
+
         if context:
-            if "system_prompt" in context:
-                # Додаємо базовий системний промпт, потім додаємо користувацький
-                base_system = system_prompt
-                user_system = context["system_prompt"]
-                system_prompt = f"{base_system}\n\n{user_system}"
-            
             # Додавання базової інформації про користувача та курс
             context_text = []
             if "user_role" in context:
@@ -326,7 +499,10 @@ class ClaudeProvider(LLMProvider):
                 context_text.append(f"Назва курсу: {context['selected_course_name']}")
             
             if context_text:
-                system_prompt += "\n\n" + "\n".join(context_text)
+                dynamic_system.append("\n".join(context_text))
+
+        if dynamic_system:
+            system_blocks.append({"type": "text", "text": "\n\n".join(dynamic_system)})
         
         # Підготовка повідомлень з історії чату (якщо є)
         messages = []
@@ -346,45 +522,10 @@ class ClaudeProvider(LLMProvider):
         data = {
             "model": self.model,
             "messages": messages,
-            "system": system_prompt,
+            "system": system_blocks,
             "max_tokens": 8000
         }
-        
-        try:
-            print(f"Відправка запиту до Claude API, модель: {self.model}")
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                
-                # Отримання текстової відповіді
-                content = result.get("content", [])
-                text_chunks = []
-                
-                for item in content:
-                    if item.get("type") == "text":
-                        text_chunks.append(item.get("text", ""))
-                
-                return "".join(text_chunks) if text_chunks else "Помилка: Не вдалося отримати текстову відповідь від Claude API."
-                
-        except httpx.HTTPStatusError as e:
-            error_msg = f"Помилка HTTP при виклику Claude API: {e.response.status_code}"
-            try:
-                error_data = e.response.json()
-                if "error" in error_data:
-                    error_msg += f"\nДеталі: {error_data['error'].get('message', '')}"
-            except:
-                pass
-            print(error_msg)
-            return f"Помилка генерації відповіді: {error_msg}"
-        except Exception as e:
-            error_msg = f"Помилка взаємодії з Claude API: {str(e)}"
-            print(error_msg)
-            return f"Помилка генерації відповіді: {error_msg}"
+        return headers, data
 
 class LLMProviderFactory:
     """Фабрика для створення екземплярів LLM провайдерів."""
@@ -398,11 +539,11 @@ class LLMProviderFactory:
                 if await provider.is_available():
                     return provider
                 else:
-                    print(f"Провайдер {provider_name} недоступний (відсутній API ключ)")
+                    logger.warning("Провайдер %s недоступний (відсутній API ключ)", provider_name)
                     return None
             else:
-                print(f"Непідтримуваний провайдер: {provider_name}")
+                logger.error("Непідтримуваний провайдер: %s", provider_name)
                 return None
         except Exception as e:
-            print(f"Помилка створення провайдера {provider_name}: {e}")
+            logger.error("Помилка створення провайдера %s: %s", provider_name, e)
             return None
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Постійний кеш відповідей LLM.
+Зберігає відповіді в SQLite, тому кеш переживає перезапуски додатку
+і спільний для кількох процесів. Записи розділені за користувачами.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "responses.sqlite3")
+# Зміни завдань курсу відкидаються версією даних курсу в ключі, решта даних (оцінки, вміст)
+# не потрапляє в ключ, тому відповіді застарівають за добу
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
+class ResponseCache:
+    """Кеш відповідей LLM на SQLite з точним збігом ключа."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        # Звернення йдуть з потоків пулу asyncio.to_thread, тому з'єднання захищене блокуванням
+        self._lock = threading.Lock()
+        # WAL дозволяє одночасне читання кешу з кількох процесів під час запису
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "session_id TEXT NOT NULL, "
+            "key TEXT NOT NULL, "
+            "response TEXT NOT NULL, "
+            "created REAL NOT NULL, "
+            "PRIMARY KEY (session_id, key))"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, session_id: Any = None) -> Optional[str]:
+        """Отримання відповіді з кешу (None, якщо запису немає або він застарів)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE session_id = ? AND key = ?",
+                (str(session_id), key)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def set(self, key: str, response: str, session_id: Any = None) -> None:
+        """Збереження відповіді в кеші."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (session_id, key, response, created) VALUES (?, ?, ?, ?)",
+                (str(session_id), key, response, time.time())
+            )
+
+    def close(self) -> None:
+        """Закриття з'єднання з базою кешу."""
+        with self._lock:
+            self._conn.close()
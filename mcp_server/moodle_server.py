@@ -7,16 +7,26 @@ import httpx
 import json
 import asyncio
 import argparse
-from typing import Dict, Any, Tuple, List, Optional
+import calendar
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Any, Tuple, List, Optional, AsyncIterator
 from mcp.server.fastmcp import FastMCP, Context, Image
 
 # Імпорт нашого модуля LLM провайдера
 try:
     from common.llm_provider import LLMProviderFactory
+    from common.async_utils import gather_bounded
 except ImportError:
     import sys
     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
     from common.llm_provider import LLMProviderFactory
+    from common.async_utils import gather_bounded
+
+# Обмеження одночасних запитів до Moodle API, щоб не перевантажувати сервер
+MAX_CONCURRENT_REQUESTS = 8
+# Кількість ID користувачів в одному запиті core_user_get_users_by_field
+USERS_BATCH_SIZE = 100
 
 
 class MoodleMCPServer:
@@ -39,9 +49,10 @@ class MoodleMCPServer:
         self.is_teacher = False  # Прапорець ролі викладача
         self.mode = "analytical"  # Режим роботи: "analytical" або "administrative"
         self.llm_provider = None  # LLM провайдер
+        self._client: Optional[httpx.AsyncClient] = None  # Спільний HTTP клієнт з пулом з'єднань
         
-        # Ініціалізація FastMCP сервера
-        self.mcp = FastMCP("moodle-assistant")
+        # Ініціалізація FastMCP сервера; після завершення його роботи закривається HTTP клієнт
+        self.mcp = FastMCP("moodle-assistant", lifespan=self._lifespan)
         
         # Реєстрація ресурсів і інструментів
         self._register_tools()
@@ -235,7 +246,6 @@ class MoodleMCPServer:
                     submission = data["submission"]
                     time_modified = submission.get("timemodified")
                     if time_modified:
-                        from datetime import datetime
                         time_str = datetime.fromtimestamp(time_modified).strftime('%d.%m.%Y %H:%M')
                         result.append(f"Останнє оновлення: {time_str}")
                 
@@ -258,8 +268,6 @@ class MoodleMCPServer:
                 return "Необхідно спочатку виконати аутентифікацію"
             
             # Отримання першого і останнього дня місяця
-            import calendar
-            from datetime import datetime
             
             first_day = int(datetime(year, month, 1).timestamp())
             last_day = int(datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59).timestamp())
@@ -397,6 +405,13 @@ class MoodleMCPServer:
                 if "assignments" not in data or not data["assignments"]:
                     return f"Здані роботи не знайдені для завдання з ID {assignment_id}"
                 
+                # Інформація про всіх студентів запитується одночасно, а не по черзі
+                users = await self._get_users_by_ids([
+                    submission.get("userid")
+                    for assignment in data["assignments"]
+                    for submission in assignment.get("submissions", [])
+                ])
+                
                 result = []
                 for assignment in data["assignments"]:
                     result.append(f"Завдання: {assignment.get('name', f'ID: {assignment_id}')}")
@@ -409,12 +424,11 @@ class MoodleMCPServer:
                         status = "Здано" if submission.get("status") == "submitted" else "Чернетка"
                         time = submission.get("timemodified", "Невідомо")
                         if time != "Невідомо":
-                            from datetime import datetime
                             time = datetime.fromtimestamp(time).strftime('%d.%m.%Y %H:%M')
                         
                         # Отримання додаткової інформації про студента
                         user_id = submission.get("userid")
-                        user_info = await self._get_user_by_id(user_id)
+                        user_info = users.get(user_id, {})
                         user_name = user_info.get("fullname", f"ID: {user_id}")
                         
                         result.append(f"  - Студент: {user_name}")
@@ -803,8 +817,6 @@ class MoodleMCPServer:
                 return "Місяць і рік повинні бути числами"
             
             # Отримання першого і останнього дня місяця
-            import calendar
-            from datetime import datetime
             
             first_day = int(datetime(year, month, 1).timestamp())
             last_day = int(datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59).timestamp())
@@ -856,7 +868,6 @@ class MoodleMCPServer:
                         for assignment in course["assignments"]:
                             due_date = "Не встановлено"
                             if assignment.get("duedate") and assignment["duedate"] > 0:
-                                from datetime import datetime
                                 due_date = datetime.fromtimestamp(assignment["duedate"]).strftime('%d.%m.%Y %H:%M')
                             
                             assignments.append(f"ID: {assignment['id']}, Назва: {assignment['name']}, Термін здачі: {due_date}")
@@ -880,7 +891,6 @@ class MoodleMCPServer:
                         if module.get("dates") and len(module["dates"]) > 0:
                             for date in module["dates"]:
                                 if date.get("label") == "Due:":
-                                    from datetime import datetime
                                     due_timestamp = date.get("timestamp")
                                     if due_timestamp:
                                         due_date = datetime.fromtimestamp(due_timestamp).strftime('%d.%m.%Y %H:%M')
@@ -977,25 +987,48 @@ class MoodleMCPServer:
             Переконайтеся, що ви працюєте в адміністративному режимі. Якщо потрібно змінити режим, використайте інструмент set_mode("administrative").
             """
     
+    def _get_client(self) -> httpx.AsyncClient:
+        """Спільний HTTP клієнт з keep-alive пулом з'єднань до Moodle (створюється ліниво)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=20, keepalive_expiry=60)
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Закриття спільного HTTP клієнта."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+    
+    @asynccontextmanager
+    async def _lifespan(self, server: FastMCP) -> AsyncIterator[None]:
+        """Життєвий цикл FastMCP: з'єднання пулу закриваються в циклі подій сервера при його зупинці."""
+        try:
+            yield
+        finally:
+            await self.aclose()
+    
     async def _authenticate(self, username: str, password: str) -> Tuple[bool, str]:
         """Аутентифікація і отримання токена."""
         try:
             # Використання Moodle Web Service для аутентифікації
-            url = f"{self.base_url}/login/token.php"
+            url = "/login/token.php"
             params = {
                 "username": username,
                 "password": password,
                 "service": "moodle_mobile_app"  # Стандартний сервіс Moodle
             }
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, params=params)
-                data = response.json()
-                
-                if "token" in data:
-                    self.token = data["token"]
-                    return True, "Аутентифікація успішна"
-                else:
-                    return False, f"Помилка аутентифікації: {data.get('error', 'Невідома помилка')}"
+            response = await self._get_client().post(url, params=params)
+            data = response.json()
+            
+            if "token" in data:
+                self.token = data["token"]
+                return True, "Аутентифікація успішна"
+            else:
+                return False, f"Помилка аутентифікації: {data.get('error', 'Невідома помилка')}"
         except Exception as e:
             return False, f"Помилка при підключенні до Moodle: {str(e)}"
     
@@ -1005,7 +1038,7 @@ class MoodleMCPServer:
             return False, "Необхідно спочатку виконати аутентифікацію"
         
         try:
-            url = f"{self.base_url}/webservice/rest/server.php"
+            url = "/webservice/rest/server.php"
             request_params = {
                 "wstoken": self.token,
                 "wsfunction": function,
@@ -1015,15 +1048,14 @@ class MoodleMCPServer:
             if params:
                 request_params.update(params)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=request_params)
-                data = response.json()
-                
-                # Перевірка на помилки у відповіді Moodle
-                if isinstance(data, dict) and "exception" in data:
-                    return False, f"{data.get('message', 'Помилка Moodle API')}"
-                
-                return True, data
+            response = await self._get_client().get(url, params=request_params)
+            data = response.json()
+            
+            # Перевірка на помилки у відповіді Moodle
+            if isinstance(data, dict) and "exception" in data:
+                return False, f"{data.get('message', 'Помилка Moodle API')}"
+            
+            return True, data
         except Exception as e:
             return False, f"Помилка при виклику Moodle API: {str(e)}"
     
@@ -1100,6 +1132,27 @@ class MoodleMCPServer:
             return user_data[0]
         return {}
     
+    async def _get_users_by_ids(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Отримання інформації про кількох користувачів пакетними запитами."""
+        unique_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+        batches = [unique_ids[i:i + USERS_BATCH_SIZE] for i in range(0, len(unique_ids), USERS_BATCH_SIZE)]
+        
+        results = await gather_bounded(
+            (
+                self._call_moodle_api("core_user_get_users_by_field", {
+                    "field": "id",
+                    **{f"values[{i}]": user_id for i, user_id in enumerate(batch)}
+                })
+                for batch in batches
+            ),
+            MAX_CONCURRENT_REQUESTS
+        )
+        users = {}
+        for result in results:
+            if isinstance(result, tuple) and result[0] and isinstance(result[1], list):
+                users.update((user["id"], user) for user in result[1] if "id" in user)
+        return users
+    
     def run(self):
         """Запуск MCP сервера."""
         self.mcp.run()
@@ -1,7 +1,10 @@
 import os
 import json
+import logging
 from typing import Dict, Any, Optional
 
+logger = logging.getLogger(__name__)
+
 def save_config(config: Dict[str, Any], filename: str = "config.json") -> bool:
     """Збереження налаштувань у файл."""
     try:
@@ -10,7 +13,7 @@ def save_config(config: Dict[str, Any], filename: str = "config.json") -> bool:
             json.dump(config, f, ensure_ascii=False, indent=2)
         return True
     except Exception as e:
-        print(f"Помилка збереження конфігурації: {e}")
+        logger.error("Помилка збереження конфігурації: %s", e)
         return False
 
 def load_config(filename: str = "config.json") -> Optional[Dict[str, Any]]:
@@ -21,5 +24,5 @@ def load_config(filename: str = "config.json") -> Optional[Dict[str, Any]]:
         with open(filename, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
-        print(f"Помилка завантаження конфігурації: {e}")
+        logger.error("Помилка завантаження конфігурації: %s", e)
         return None
\ No newline at end of file
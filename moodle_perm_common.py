@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Спільна частина скриптів тестування дозволів API токена Moodle
+(test_mcp_permissions.py і test_moodle_permissions.py): кольори консолі, токен з .env
+і клієнт REST API Moodle
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import httpx
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple, Optional, Union
+from dotenv import load_dotenv
+from common.auth import (
+    API_RETRY_ATTEMPTS, API_RETRY_BASE_DELAY, TRANSIENT_STATUS_CODES, NOT_PROCESSED_STATUS_CODES,
+    TRANSIENT_ERRORS, READ_TRANSIENT_ERRORS, HTTP2_AVAILABLE, is_read_only_function
+)
+
+# orjson пришвидшує розбір великих відповідей Moodle; без нього використовується stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Ознаки відмови в доступі в повідомленнях Moodle (один прохід без перетворення регістру)
+_DENIED_RE = re.compile(r"access control|permission|required capability|немає дозволу", re.IGNORECASE)
+
+# Функція Moodle для виконання кількох функцій одним запитом (Moodle 3.4+, плагін tool_mobile)
+BATCH_FUNCTION = "tool_mobile_call_external_functions"
+
+# Налаштування HTTP клієнта за замовчуванням (секунди / кількість з'єднань)
+DEFAULT_READ_TIMEOUT = 60.0  # Повільні запити на кшталт core_course_get_courses на великому сайті
+CONNECT_TIMEOUT = 5.0
+DEFAULT_POOL_SIZE = 100
+
+DEFAULT_MOODLE_URL = "http://78.137.2.119:2929"
+
+# Кольори для виводу в консоль
+class Colors:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+    # Без кольорів, якщо вивід перенаправлено у файл/CI-лог або задано NO_COLOR (https://no-color.org)
+    if not sys.stdout.isatty() or os.getenv("NO_COLOR"):
+        HEADER = BLUE = CYAN = GREEN = WARNING = FAIL = ENDC = BOLD = UNDERLINE = ''
+
+@lru_cache(maxsize=1)
+def load_token() -> Optional[str]:
+    """Токен API з .env файлу (файл читається лише під час запуску скрипта, а не при імпорті модуля)"""
+    load_dotenv()
+    return os.getenv("API_MOODLE_TOKEN")
+
+def is_permission_denied(error_msg: str) -> bool:
+    """Чи означає повідомлення Moodle відмову в доступі"""
+    return _DENIED_RE.search(error_msg) is not None
+
+def loads_json(raw: Union[bytes, str]) -> Any:
+    """Розбір JSON (orjson, якщо встановлено, інакше stdlib json)"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def dumps_json_pretty(obj: Any) -> str:
+    """Серіалізація у JSON з відступами для файлу результатів"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=str)
+
+def _unflatten_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Параметри у формі Moodle (key[0], key[sub]) -> вкладена структура для JSON-аргументів пакетного виклику
+    
+    Підтримується один рівень вкладеності, якого достатньо для параметрів тестів; індекси списків ідуть по порядку.
+    """
+    result = {}
+    for key, value in params.items():
+        name, _, rest = key.partition("[")
+        if not rest:
+            result[name] = value
+            continue
+        sub_key = rest.rstrip("]")
+        container = result.setdefault(name, [] if sub_key.isdigit() else {})
+        if isinstance(container, list):
+            container.append(value)
+        else:
+            container[sub_key] = value
+    return result
+
+class MoodleClient:
+    """Клієнт REST API Moodle для тестування дозволів
+    
+    Один пул keep-alive з'єднань (HTTP/2, якщо доступний), повтори при тимчасових збоях,
+    відповіді функцій читання запам'ятовуються на час запуску.
+    """
+
+    def __init__(self, token: str, base_url: str = DEFAULT_MOODLE_URL,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT, pool_size: int = DEFAULT_POOL_SIZE, http2: bool = True):
+        self.token = token
+        self.base_url = base_url
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        # HTTP/2: усі паралельні запити йдуть потоками одного з'єднання (потрібен пакет h2)
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_version: Optional[str] = None  # Версія протоколу, погоджена з Moodle (виводиться один раз)
+        # Відповіді функцій читання за запуск: (метод, параметри) -> задача запиту.
+        # Тест дозволу і пошук ID для наступних тестів використовують одну відповідь, навіть якщо виконуються одночасно
+        self._response_cache: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._batch_available = True  # Чи приймає Moodle пакетні виклики BATCH_FUNCTION
+
+    def _get_http(self) -> httpx.AsyncClient:
+        """Спільний HTTP клієнт з keep-alive з'єднаннями до Moodle (створюється ліниво)"""
+        if self._http is None or self._http.is_closed:
+            # pool=None: паралельні запити чекають на вільне з'єднання без тайм-ауту черги
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                timeout=httpx.Timeout(self.read_timeout, connect=CONNECT_TIMEOUT, pool=None),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=min(20, self.pool_size))
+            )
+        return self._http
+
+    async def aclose(self):
+        """Закриття HTTP клієнта"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _request_with_retry(self, request_params: Dict[str, Any], read_only: bool) -> httpx.Response:
+        """Запит до REST API Moodle з повторами та експоненційною затримкою при тимчасових збоях
+        
+        Правила повторів ті ж, що й у MoodleAuth: функції, що змінюють дані, повторюються лише тоді,
+        коли Moodle точно не обробив запит. Відповіді Moodle з exception не повторюються - це відмова в дозволі.
+        """
+        retry_statuses = TRANSIENT_STATUS_CODES if read_only else NOT_PROCESSED_STATUS_CODES
+        retry_errors = READ_TRANSIENT_ERRORS if read_only else TRANSIENT_ERRORS
+        method = request_params["wsfunction"]
+        delay = API_RETRY_BASE_DELAY
+        for attempt in range(1, API_RETRY_ATTEMPTS + 1):
+            try:
+                # POST з тілом форми: токен не потрапляє в URL і журнали доступу, довгі параметри не впираються в ліміт URL
+                response = await self._get_http().post("/webservice/rest/server.php", data=request_params)
+                if self._http_version is None:
+                    self._http_version = response.http_version
+                    print(f"{Colors.BLUE}З'єднання з Moodle: {self._http_version}{Colors.ENDC}")
+                if response.status_code not in retry_statuses or attempt == API_RETRY_ATTEMPTS:
+                    return response
+                print(f"{Colors.WARNING}{method}: Moodle відповів {response.status_code}, повтор {attempt}/{API_RETRY_ATTEMPTS - 1}...{Colors.ENDC}")
+            except retry_errors as e:
+                if attempt == API_RETRY_ATTEMPTS:
+                    raise
+                print(f"{Colors.WARNING}{method}: тимчасова помилка з'єднання ({e!r}), повтор {attempt}/{API_RETRY_ATTEMPTS - 1}...{Colors.ENDC}")
+            await asyncio.sleep(delay + random.uniform(0, delay / 5))
+            delay *= 2
+
+    async def call(self, method: str, params: Dict[str, Any] = None) -> Tuple[bool, Any]:
+        """Виклик функції Moodle: (успіх, дані або текст помилки)
+        
+        Відповіді функцій читання запам'ятовуються на час запуску.
+        """
+        if params is None:
+            params = {}
+        # Функції, що змінюють дані, виконуються щоразу
+        if not is_read_only_function(method):
+            return await self._request(method, params)
+        
+        key = self._cache_key(method, params)
+        task = self._response_cache.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(method, params))
+            self._response_cache[key] = task
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _cache_key(method: str, params: Dict[str, Any]) -> Tuple[str, str]:
+        """Ключ кешу відповідей: метод і параметри в стабільному порядку"""
+        return method, json.dumps(params, sort_keys=True, default=str)
+
+    async def _batch(self, calls: List[Tuple[str, Dict[str, Any]]]) -> Optional[List[Tuple[bool, Any]]]:
+        """Виконання кількох функцій Moodle одним запитом BATCH_FUNCTION
+        
+        Результати мають ту ж форму (успіх, дані), що й call; None, якщо пакетний виклик недоступний.
+        """
+        request_params = {
+            "wstoken": self.token,
+            "wsfunction": BATCH_FUNCTION,
+            "moodlewsrestformat": "json"
+        }
+        for i, (method, params) in enumerate(calls):
+            request_params[f"requests[{i}][function]"] = method
+            request_params[f"requests[{i}][arguments]"] = json.dumps(_unflatten_params(params), default=str)
+        
+        try:
+            response = await self._request_with_retry(request_params, read_only=True)
+            data = loads_json(response.content)
+        except Exception as e:
+            print(f"{Colors.WARNING}Помилка пакетного запиту: {e}{Colors.ENDC}")
+            return None
+        # Відповідь з exception означає, що функція не встановлена або не дозволена токену
+        if not isinstance(data, dict) or not isinstance(data.get("responses"), list):
+            return None
+        
+        results = []
+        for item in data["responses"]:
+            if item.get("error"):
+                exception = item.get("exception") or {}
+                results.append((False, exception.get("message", "Помилка Moodle API")))
+                continue
+            try:
+                results.append((True, loads_json(item.get("data") or "null")))
+            except ValueError as e:
+                results.append((False, f"Помилка запиту: {str(e)}"))
+        return results
+
+    async def prefetch(self, calls: List[Tuple[str, Dict[str, Any]]]):
+        """Завантаження відповідей функцій читання одним пакетним запитом у кеш відповідей
+        
+        Наступні call для цих викликів беруть відповідь з кешу; якщо пакетні виклики
+        недоступні, функції викликаються окремими запитами.
+        """
+        if not self._batch_available:
+            return
+        calls = [
+            (method, params) for method, params in calls
+            if is_read_only_function(method) and self._cache_key(method, params) not in self._response_cache
+        ]
+        if len(calls) < 2:
+            return
+        
+        results = await self._batch(calls)
+        if results is None or len(results) != len(calls):
+            self._batch_available = False
+            print(f"{Colors.BLUE}Пакетні виклики ({BATCH_FUNCTION}) недоступні, методи тестуються окремими запитами.{Colors.ENDC}")
+            return
+        
+        loop = asyncio.get_running_loop()
+        for (method, params), result in zip(calls, results):
+            future = loop.create_future()
+            future.set_result(result)
+            self._response_cache[self._cache_key(method, params)] = future
+
+    async def _request(self, method: str, params: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Запит до функції Moodle з розбором відповіді"""
+        try:
+            request_params = {
+                "wstoken": self.token,
+                "wsfunction": method,
+                "moodlewsrestformat": "json"
+            }
+            
+            # Вкладені словники передаються у формі Moodle: key[sub_key]
+            for key, value in params.items():
+                if isinstance(value, dict):
+                    request_params.update((f"{key}[{sub_key}]", sub_value) for sub_key, sub_value in value.items())
+                else:
+                    request_params[key] = value
+            
+            response = await self._request_with_retry(request_params, is_read_only_function(method))
+            data = loads_json(response.content)
+            
+            # Перевірка на помилки у відповіді Moodle
+            if isinstance(data, dict) and "exception" in data:
+                return False, data.get("message", "Помилка Moodle API")
+            
+            return True, data
+        except Exception as e:
+            return False, f"Помилка запиту: {str(e)}"
@@ -2,20 +2,62 @@ import gradio as gr
 import asyncio
 import os
 import sys
+import time
 import json
-from typing import Dict, Any, List, Tuple, Optional
+import functools
+import logging
+import hashlib
+import sqlite3
+import atexit
+from collections import deque
+from itertools import islice
+from typing import Dict, Any, List, Tuple, Optional, AsyncIterator
 
 # Імпортуємо необхідні модулі з проекту
-try:
-    from common.auth import MoodleAuth
-except ImportError:
-    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-    from common.auth import MoodleAuth
+from common.auth import MoodleAuth, moodle_array
+from common.llm_provider import LLMProviderFactory, dumps_json
+from common.response_cache import ResponseCache
+from common.async_utils import gather_bounded
 
-try:
-    from common.llm_provider import LLMProviderFactory
-except ImportError:
-    from common.llm_provider import LLMProviderFactory
+# Персона асистента для студента (незмінна частина системного промпту)
+STUDENT_SYSTEM_PROMPT = "Ви корисний асистент для навчальної платформи Moodle, що допомагає студенту. Надавайте пояснення, рекомендації для навчання та допомогу в розумінні матеріалів курсу. Не надавайте готових відповідей на завдання чи тести. Відповідайте українською мовою, якщо явно не зазначено інше."
+
+logger = logging.getLogger(__name__)
+
+# Підпис курсу у випадаючому списку: "<назва> (ID: <id>)"
+_COURSE_LABEL = "{} (ID: {})".format
+
+# Хеш-функція для ключів кешу відповідей (blake2b швидший за sha256 на коротких даних)
+_HASH = hashlib.blake2b
+
+# Короткі тексти чату інтернуються, довші дедуплікуються через пул панелі
+INTERN_MAX_LENGTH = 256
+
+# Скільки секунд версія даних курсу (для ключа кешу відповідей) використовується без повторного запиту
+COURSE_VERSION_TTL = 5 * 60
+
+# Максимум одночасних запитів статусу здачі при завантаженні списку завдань
+ASSIGNMENT_STATUS_CONCURRENCY = 8
+
+# Підписи статусів здачі Moodle (інші статуси показуються як є)
+_SUBMISSION_STATUS_LABELS = {
+    "submitted": "Здано",
+    "draft": "Чернетка",
+}
+
+@functools.lru_cache(maxsize=4096)
+def _format_timestamp_cached(timestamp: int) -> str:
+    """Форматування Unix-timestamp (з кешуванням, бо терміни здачі часто повторюються)."""
+    try:
+        return time.strftime('%d.%m.%Y %H:%M', time.localtime(timestamp))
+    except (OverflowError, OSError, ValueError, TypeError):
+        return f"Timestamp: {timestamp}"
+
+def _module_line(module: Dict[str, Any]) -> str:
+    """Рядок елемента курсу у вмісті курсу (для завдань з ID)."""
+    mod_type = module.get('modname', 'N/A')
+    id_part = f", ID: {module.get('instance')}" if mod_type == 'assign' else ""
+    return f"  - {module.get('name', 'Без назви')} (Тип: {mod_type}){id_part}"
 
 class StudentDashboard:
     """Клас для інтерфейсу студента."""
@@ -27,16 +69,58 @@ class StudentDashboard:
         
         # Стан панелі
         self.courses = []
+        self._courses_by_id = {}  # Індекс курсів за ID
         self.selected_course = None
         self.selected_course_name = None
         self.assignments = []
-        self.chat_history = []
+        # Версія даних курсу для ключа кешу відповідей: course_id -> (час отримання, найпізніший timemodified завдань)
+        self._course_versions: Dict[int, Tuple[float, int]] = {}
+        # Тип останньої помилки чату (для придушення повторних записів у лог)
+        self._last_err_type = ()
+        # Фонова задача попереднього прогріву LLM провайдера та MCP сервера
+        self._warm_task = None
 
         self.use_full_mcp_server = False  # За замовчуванням використовуємо прямий доступ
+        # Параметри MCP для виклику LLM, що оновлюються лише при зміні режиму або автентифікації
+        self._mcp_url_resolved = self.moodle_url
+        self._auth_token_cached = self.auth.token
         
         # Константи для обмеження історії чату
         self.MAX_HISTORY_LENGTH = 50  # Максимальна кількість повідомлень у історії
         self.MAX_CONTEXT_MESSAGES = 10  # Максимальна кількість повідомлень для контексту LLM
+        
+        # Історія чату як кільцевий буфер: найстаріші повідомлення відкидаються автоматично
+        self.chat_history = deque(maxlen=self.MAX_HISTORY_LENGTH)
+        # Пул довгих повторюваних текстів (шаблонні відповіді, повторні запитання)
+        self._response_pool = {}
+        
+        # Складові ключа кешу відповідей, що рідко змінюються
+        self._moodle_url_bytes = self.moodle_url.encode()
+        self._history_tail_msgs = None
+        self._history_tail_serialized = b""
+        
+        # Запити до LLM, що виконуються зараз: ключ кешу -> майбутня відповідь
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Постійний кеш відповідей LLM (переживає перезапуски додатку)
+        try:
+            self._response_cache = ResponseCache()
+            atexit.register(self._response_cache.close)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Кеш відповідей недоступний: %s", e)
+            self._response_cache = None
+
+        # Стабільна частина системного промпту будується один раз, щоб префікс
+        # запиту до Claude був ідентичним між ходами і потрапляв у prompt cache
+        self._system_blocks = [{
+            "type": "text",
+            "text": f"{STUDENT_SYSTEM_PROMPT}\n\nАдреса Moodle: {self.moodle_url}"
+        }]
+        self._stable_context = {
+            "user_role": "student",
+            "mode": "chat",
+            "system_blocks": self._system_blocks
+        }
     
     def build_ui(self) -> gr.Blocks:
         """Побудова інтерфейсу панелі студента."""
@@ -56,7 +140,7 @@ class StudentDashboard:
                         else:
                             auth_error_msg = "Очікування автентифікації..."
                             user_info_output.value = auth_error_msg
-                            print(auth_error_msg)
+                            logger.error(auth_error_msg)
                     
                     # Блок курсів
                     with gr.Group() as courses_group:
@@ -208,6 +292,13 @@ class StudentDashboard:
                 inputs=[],
                 outputs=[mcp_status]
             )
+            
+            # Прогрів LLM провайдера у фоні при завантаженні сторінки
+            dashboard.load(
+                fn=self._ensure_warm_task,
+                inputs=[],
+                outputs=[]
+            )
         
         return dashboard
     
@@ -220,10 +311,10 @@ class StudentDashboard:
             return
         
         try:
-            print("Оновлення інформації про студента...")
+            logger.debug("Оновлення інформації про студента...")
             success, data = await self.auth._call_api("core_user_get_users_by_field", {
                 "field": "id",
-                "values[0]": self.auth.user_id
+                **moodle_array("values", [self.auth.user_id])
             })
             
             if success and data and len(data) > 0:
@@ -238,17 +329,15 @@ class StudentDashboard:
                 ]
                 # Пряме присвоєння значення замість update
                 info_output_component.value = "\n".join(info)
-                print("Інформація про студента оновлена.")
+                logger.debug("Інформація про студента оновлена.")
             else:
                 error_msg = f"Не вдалося отримати дані користувача: {data if not success else 'Порожня відповідь'}"
-                print(error_msg)
+                logger.error(error_msg)
                 # Пряме присвоєння значення замість update
                 info_output_component.value = error_msg
         except Exception as e:
             error_msg = f"Критична помилка при оновленні інфо студента: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception(error_msg)
             # Пряме присвоєння значення замість update
             info_output_component.value = error_msg
     
@@ -263,15 +352,17 @@ class StudentDashboard:
             return
         
         try:
-            print("Завантаження курсів для студента...")
+            logger.debug("Завантаження курсів для студента...")
             success, data = await self.auth._call_api("core_enrol_get_users_courses", {
                 "userid": self.auth.user_id
             })
             
             if success:
                 self.courses = data
-                courses_list = [(f"{course.get('fullname', 'Без назви')} (ID: {course.get('id', 'N/A')})", course.get('id'))
-                               for course in data if course.get('id')]
+                self._courses_by_id = {course['id']: course for course in data if course.get('id')}
+                get = dict.get
+                courses_list = [(_COURSE_LABEL(get(course, 'fullname', 'Без назви'), course_id), course_id)
+                               for course in data if (course_id := get(course, 'id'))]
                 
                 if not courses_list:
                     # Пряме присвоєння властивостей замість update
@@ -283,19 +374,17 @@ class StudentDashboard:
                     dropdown_component.choices = courses_list
                     dropdown_component.value = None
                     dropdown_component.interactive = True
-                print(f"Курси для студента завантажено: {len(courses_list)}")
+                logger.debug("Курси для студента завантажено: %s", len(courses_list))
             else:
                 error_msg = f"Помилка API при завантаженні курсів: {data}"
-                print(error_msg)
+                logger.error(error_msg)
                 # Пряме присвоєння властивостей замість update
                 dropdown_component.choices = [(error_msg, None)]
                 dropdown_component.value = None
                 dropdown_component.interactive = False
         except Exception as e:
             error_msg = f"Критична помилка при завантаженні курсів: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception(error_msg)
             # Пряме присвоєння властивостей замість update
             dropdown_component.choices = [(error_msg, None)]
             dropdown_component.value = None
@@ -307,15 +396,17 @@ class StudentDashboard:
             return gr.update(choices=[("Помилка автентифікації", None)], value=None, interactive=False)
         
         try:
-            print("Оновлення списку курсів для студента...")
+            logger.debug("Оновлення списку курсів для студента...")
             success, data = await self.auth._call_api("core_enrol_get_users_courses", {
                 "userid": self.auth.user_id
             })
             
             if success:
                 self.courses = data
-                courses_list = [(f"{course.get('fullname', 'Без назви')} (ID: {course.get('id', 'N/A')})", course.get('id'))
-                               for course in data if course.get('id')]
+                self._courses_by_id = {course['id']: course for course in data if course.get('id')}
+                get = dict.get
+                courses_list = [(_COURSE_LABEL(get(course, 'fullname', 'Без назви'), course_id), course_id)
+                               for course in data if (course_id := get(course, 'id'))]
                 
                 if not courses_list:
                     return gr.update(choices=[("Курси не знайдено", None)], value=None, interactive=False)
@@ -323,27 +414,23 @@ class StudentDashboard:
                     return gr.update(choices=courses_list, value=None, interactive=True)
             else:
                 error_msg = f"Помилка API при оновленні курсів: {data}"
-                print(error_msg)
+                logger.error(error_msg)
                 return gr.update(choices=[(error_msg, None)], value=None, interactive=False)
         except Exception as e:
             error_msg = f"Критична помилка при оновленні курсів: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception(error_msg)
             return gr.update(choices=[(error_msg, None)], value=None, interactive=False)
     
     def select_course(self, course_id: str) -> None:
         """Вибір курсу зі списку."""
         self.selected_course = course_id
         self.selected_course_name = None
-        print(f"Студент обрав курс ID: {self.selected_course}")
+        logger.debug("Студент обрав курс ID: %s", self.selected_course)
         
-        if self.selected_course:
-            for course in self.courses:
-                if course.get('id') == self.selected_course:
-                    self.selected_course_name = course.get('fullname', 'Ім\'я не знайдено')
-                    print(f"Знайдено ім'я курсу: {self.selected_course_name}")
-                    break
+        course = self._courses_by_id.get(self.selected_course) if self.selected_course else None
+        if course:
+            self.selected_course_name = course.get('fullname', 'Ім\'я не знайдено')
+            logger.debug("Знайдено ім'я курсу: %s", self.selected_course_name)
     
     async def get_course_info(self) -> str:
         """Отримання інформації про вибраний курс."""
@@ -353,10 +440,8 @@ class StudentDashboard:
             return "Будь ласка, спочатку виберіть курс зі списку."
         
         try:
-            print(f"Отримання інформації для курсу ID: {self.selected_course}")
-            success, data = await self.auth._call_api("core_course_get_courses", {
-                "options[ids][0]": self.selected_course
-            })
+            logger.debug("Отримання інформації для курсу ID: %s", self.selected_course)
+            success, data = await self.auth._call_api("core_course_get_courses", moodle_array("options[ids]", [self.selected_course]))
             
             if success and data:
                 course = data[0]
@@ -374,9 +459,7 @@ class StudentDashboard:
                 return f"Помилка отримання інформації про курс: {data}"
         except Exception as e:
             error_msg = f"Критична помилка при отриманні інформації про курс: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception(error_msg)
             return error_msg
     
     async def get_course_content(self) -> str:
@@ -387,7 +470,7 @@ class StudentDashboard:
             return "Будь ласка, спочатку виберіть курс зі списку."
         
         try:
-            print(f"Отримання вмісту для курсу ID: {self.selected_course}")
+            logger.debug("Отримання вмісту для курсу ID: %s", self.selected_course)
             success, data = await self.auth._call_api("core_course_get_contents", {
                 "courseid": self.selected_course
             })
@@ -396,31 +479,26 @@ class StudentDashboard:
                 if not data:
                     return f"Вміст курсу '{self.selected_course_name or self.selected_course}' не знайдено або курс порожній."
                 
-                sections = []
+                lines = []
+                # Зв'язані методи списку отримуються один раз для всього циклу
+                append = lines.append
+                extend = lines.extend
                 for section in data:
-                    section_info = f"Розділ: {section.get('name', 'Без назви')}"
-                    modules = []
-                    for module in section.get("modules", []):
-                        module_info = f"  - {module.get('name', 'Без назви')} (Тип: {module.get('modname', 'N/A')})"
-                        if module.get('modname') == 'assign':
-                            module_info += f", ID: {module.get('instance')}"
-                        modules.append(module_info)
-                    
+                    if lines:
+                        append("")  # Порожній рядок між розділами
+                    append(f"Розділ: {section.get('name', 'Без назви')}")
+                    modules = section.get("modules", [])
                     if modules:
-                        section_info += "\n" + "\n".join(modules)
+                        extend(_module_line(module) for module in modules)
                     else:
-                        section_info += "\n  (Розділ порожній)"
-                    
-                    sections.append(section_info)
+                        append("  (Розділ порожній)")
                 
-                return "\n\n".join(sections)
+                return "\n".join(lines)
             else:
                 return f"Помилка отримання вмісту курсу: {data}"
         except Exception as e:
             error_msg = f"Критична помилка при отриманні вмісту курсу: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception(error_msg)
             return error_msg
     
     async def get_assignments(self) -> Dict:
@@ -432,37 +510,34 @@ class StudentDashboard:
             return gr.update(value=None)
         
         try:
-            print(f"Отримання завдань для курсу ID: {self.selected_course}")
-            success, data = await self.auth._call_api("mod_assign_get_assignments", {
-                "courseids[0]": self.selected_course
-            })
+            logger.debug("Отримання завдань для курсу ID: %s", self.selected_course)
+            success, data = await self.auth._call_api("mod_assign_get_assignments", moodle_array("courseids", [self.selected_course]))
             
             if success and "courses" in data:
-                assignments_list = []
-                self.assignments = []
+                # Спочатку збираємо завдання курсу, потім запитуємо статуси здачі паралельно
+                self.assignments = [
+                    assignment
+                    for course in data["courses"] if str(course.get('id')) == str(self.selected_course)
+                    for assignment in course.get("assignments", []) if assignment.get("id")
+                ]
+                # Щойно отриманий список оновлює версію курсу для кешу відповідей без окремого запиту
+                self._store_course_version(self.selected_course, self.assignments)
                 
-                for course in data["courses"]:
-                    if str(course.get('id')) == str(self.selected_course):
-                        for assignment in course.get("assignments", []):
-                            assignment_id = assignment.get("id")
-                            if not assignment_id:
-                                continue
-                            
-                            # Отримання статусу здачі
-                            status = await self._get_assignment_status(assignment_id)
-                            
-                            due_date = self._format_timestamp(assignment.get("duedate"))
-                            
-                            # Зберігаємо повні дані
-                            self.assignments.append(assignment)
-                            
-                            # Дані для таблиці
-                            assignments_list.append([
-                                assignment_id,
-                                assignment.get("name", "Без назви"),
-                                due_date,
-                                status
-                            ])
+                statuses = await gather_bounded(
+                    (self._get_assignment_status(assignment["id"]) for assignment in self.assignments),
+                    ASSIGNMENT_STATUS_CONCURRENCY
+                )
+                
+                # Дані для таблиці
+                assignments_list = [
+                    [
+                        assignment["id"],
+                        assignment.get("name", "Без назви"),
+                        self._format_timestamp(assignment.get("duedate")),
+                        "Помилка" if isinstance(status, BaseException) else status
+                    ]
+                    for assignment, status in zip(self.assignments, statuses)
+                ]
                 
                 if not assignments_list:
                     return gr.update(value=[["Завдання не знайдено", "", "", ""]])
@@ -472,9 +547,7 @@ class StudentDashboard:
                 return gr.update(value=[["Помилка отримання завдань", "", "", ""]])
         except Exception as e:
             error_msg = f"Критична помилка при отриманні завдань: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception(error_msg)
             return gr.update(value=[[error_msg, "", "", ""]])
     
     async def _get_assignment_status(self, assignment_id: int) -> str:
@@ -485,20 +558,14 @@ class StudentDashboard:
             })
             
             if success:
-                status = "Не здано"
-                if "laststatus" in data:
-                    last_status = data.get("laststatus")
-                    if last_status == "submitted":
-                        status = "Здано"
-                    elif last_status == "draft":
-                        status = "Чернетка"
-                    else:
-                        status = last_status
-                return status
+                if "laststatus" not in data:
+                    return "Не здано"
+                last_status = data.get("laststatus")
+                return _SUBMISSION_STATUS_LABELS.get(last_status, last_status)
             else:
                 return "Невідомо"
         except Exception as e:
-            print(f"Помилка отримання статусу завдання {assignment_id}: {e}")
+            logger.error("Помилка отримання статусу завдання %s: %s", assignment_id, e)
             return "Помилка"
     
     async def get_assignment_details(self, assignment_id: Optional[int]) -> str:
@@ -509,7 +576,7 @@ class StudentDashboard:
             return "Будь ласка, введіть ID завдання."
         
         try:
-            print(f"Отримання деталей завдання ID: {assignment_id}")
+            logger.debug("Отримання деталей завдання ID: %s", assignment_id)
             success, data = await self.auth._call_api("mod_assign_get_assignment", {
                 "assignmentid": assignment_id
             })
@@ -533,15 +600,13 @@ class StudentDashboard:
                 return f"Помилка отримання деталей завдання: {data}"
         except Exception as e:
             error_msg = f"Критична помилка при отриманні деталей завдання: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception(error_msg)
             return error_msg
     
     async def init_provider_callback(self, provider_name: str) -> str:
         """Ініціалізація вибраного LLM провайдера."""
         try:
-            print(f"Ініціалізація LLM провайдера: {provider_name}")
+            logger.debug("Ініціалізація LLM провайдера: %s", provider_name)
             self.llm_provider = await LLMProviderFactory.create_provider(provider_name)
             
             if self.llm_provider:
@@ -550,82 +615,43 @@ class StudentDashboard:
                 return f"Помилка: Не вдалося ініціалізувати провайдера '{provider_name}'. Перевірте налаштування API ключа."
         except Exception as e:
             error_msg = f"Помилка ініціалізації провайдера: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception(error_msg)
             return error_msg
     
     def clear_chat_history(self) -> List[Tuple[str, str]]:
         """Очищення історії чату."""
-        self.chat_history = []
-        return self.chat_history
+        self.chat_history.clear()
+        self._response_pool.clear()
+        return []
     
-    async def send_message(self, message: str) -> Tuple[List[Tuple[str, str]], str]:
-        """Відправка повідомлення до LLM та отримання відповіді."""
+    async def send_message(self, message: str) -> AsyncIterator[Tuple[List[Tuple[str, str]], str]]:
+        """Відправка повідомлення до LLM; відповідь з'являється в чаті поступово, в міру надходження."""
         if not message or message.strip() == "":
-            return self.chat_history, ""
+            yield list(self.chat_history), ""
+            return
+        
+        # Чекаємо на фоновий прогрів провайдера, якщо він ще триває
+        if self._warm_task is not None:
+            await self._warm_task
         
         # Автоматична ініціалізація LLM провайдера, якщо потрібно
         if not self.llm_provider:
             try:
-                print("Автоматична ініціалізація LLM провайдера (Claude)")
+                logger.debug("Автоматична ініціалізація LLM провайдера (Claude)")
                 self.llm_provider = await LLMProviderFactory.create_provider("claude")
                 
                 if not self.llm_provider:
                     error_msg = "Помилка: Не вдалося ініціалізувати LLM провайдера. Перевірте налаштування API ключа."
-                    print(error_msg)
+                    logger.error(error_msg)
                     self.chat_history.append((message, error_msg))
-                    return self.chat_history, ""
+                    yield list(self.chat_history), ""
+                    return
             except Exception as e:
                 error_msg = f"Помилка ініціалізації LLM провайдера: {e}"
-                print(error_msg)
+                logger.error(error_msg)
                 self.chat_history.append((message, f"Помилка ініціалізації LLM провайдера: {e}. Будь ласка, спочатку ініціалізуйте провайдера."))
-                return self.chat_history, ""
-        
-        # Підготовка контексту
-        context = {
-            "user_id": self.auth.user_id,
-            "user_role": "student",
-            "mode": "chat",
-            "system_prompt": "Ви корисний асистент для навчальної платформи Moodle, що допомагає студенту. Надавайте пояснення, рекомендації для навчання та допомогу в розумінні матеріалів курсу. Не надавайте готових відповідей на завдання чи тести. Відповідайте українською мовою, якщо явно не зазначено інше."
-        }
-        
-        # Додавання інформації про курс, якщо він вибраний
-        if self.selected_course:
-            context["course"] = {
-                "id": self.selected_course,
-                "name": self.selected_course_name
-            }
-            
-            # Отримання інформації про курс
-            try:
-                success, course_info = await self.auth._call_api("core_course_get_courses", {
-                    "options[ids][0]": self.selected_course
-                })
-                if success and course_info:
-                    context["course_info"] = course_info[0]
-            except Exception as e:
-                print(f"Помилка отримання інформації про курс: {e}")
-            
-            # Отримання завдань курсу
-            try:
-                success, assignments = await self.auth._call_api("mod_assign_get_assignments", {
-                    "courseids[0]": self.selected_course
-                })
-                if success and assignments:
-                    context["assignments"] = assignments.get("courses", [{}])[0].get("assignments", [])
-            except Exception as e:
-                print(f"Помилка отримання завдань курсу: {e}")
-            
-            # Отримання вмісту курсу
-            try:
-                success, content = await self.auth._call_api("core_course_get_contents", {
-                    "courseid": self.selected_course
-                })
-                if success and content:
-                    context["course_content"] = content
-            except Exception as e:
-                print(f"Помилка отримання вмісту курсу: {e}")
+                yield list(self.chat_history), ""
+                return
         
         try:
             # Додаємо до історії перед отриманням відповіді з тимчасовим повідомленням
@@ -635,52 +661,104 @@ class StudentDashboard:
             # Формування повідомлень з історії для Claude
             messages = []
             # Беремо останні повідомлення для контексту, пропускаючи поточне тимчасове
-            for idx, (user_msg, assistant_msg) in enumerate(self.chat_history[:-1]):
-                if len(self.chat_history) - idx <= self.MAX_CONTEXT_MESSAGES:
-                    if user_msg and user_msg.strip():
-                        messages.append({"role": "user", "content": user_msg})
-                    if assistant_msg and assistant_msg.strip() and assistant_msg != tmp_msg:
-                        messages.append({"role": "assistant", "content": assistant_msg})
+            history_len = len(self.chat_history)
+            recent_history = islice(self.chat_history, max(history_len - self.MAX_CONTEXT_MESSAGES, 0), history_len - 1)
+            for user_msg, assistant_msg in recent_history:
+                # Хід, що ще очікує на відповідь (напр. подвійне натискання), не входить у контекст
+                if assistant_msg == tmp_msg:
+                    continue
+                if user_msg and user_msg.strip():
+                    messages.append({"role": "user", "content": user_msg})
+                if assistant_msg and assistant_msg.strip():
+                    messages.append({"role": "assistant", "content": assistant_msg})
             
             # Додавання поточного повідомлення
             messages.append({"role": "user", "content": message})
             
+            # Те саме запитання з тією ж історією і курсом обслуговується з кешу без виклику LLM;
+            # версія даних курсу в ключі відкидає відповіді, дані для яких у Moodle вже змінилися
+            course_version = await self._course_version(self.selected_course) if self.selected_course else None
+            cache_key = self._cache_key(messages, course_version)
+            # Без версії даних курсу (помилка Moodle) відповідь не читається з кешу і не записується в нього
+            response_cache = self._response_cache if course_version is not None or not self.selected_course else None
+            if response_cache is not None:
+                # SQLite блокує потік, тому звернення до кешу виконуються поза циклом подій
+                cached = await asyncio.to_thread(response_cache.get, cache_key, self.auth.user_id)
+                if cached is not None:
+                    self.chat_history[-1] = (self._share_text(message), self._share_text(cached))
+                    yield list(self.chat_history), ""
+                    return
+            
+            # Такий самий запит уже виконується: чекаємо на його відповідь замість повторного виклику LLM
+            inflight = self._inflight.get(cache_key)
+            if inflight is not None:
+                shared_response = await inflight
+                if shared_response is not None:
+                    self.chat_history[-1] = (self._share_text(message), self._share_text(shared_response))
+                    yield list(self.chat_history), ""
+                    return
+            
+            # Підготовка контексту: незмінні між ходами ключі йдуть першими у фіксованому порядку
+            context = {**self._stable_context, "user_id": self.auth.user_id}
+            
+            # Додавання інформації про курс, якщо він вибраний
+            if self.selected_course:
+                context["course"] = {
+                    "id": self.selected_course,
+                    "name": self.selected_course_name
+                }
+            
             # Додавання історії чату до контексту
             context["messages"] = messages
             context["chat_history"] = messages  # Дублюємо для сумісності
             
-            # Додавання MCP параметрів для використання MCP функцій
-            context["use_mcp"] = True
-            context["mcp_server_url"] = self.moodle_url
-            context["mcp_token"] = self.auth.token
-            
-            # Отримання відповіді від LLM з використанням історії
-            print(f"Відправка запиту до Claude з {len(messages)} повідомленнями в історії")
-            
-            # Отримання відповіді від LLM 
-            response = await self.llm_provider.generate_response(
-                message, 
-                context,
-                use_mcp=True,  # Дозволяємо використання MCP
-                mcp_server_url="auto" if self.use_full_mcp_server else self.moodle_url,
-                mcp_token=self.auth.token,
-                use_full_mcp_server=self.use_full_mcp_server
-            )
+            logger.debug("Відправка запиту до Claude", extra={"history_len": len(messages)})
+            
+            response_future = asyncio.get_running_loop().create_future()
+            self._inflight[cache_key] = response_future
+            try:
+                # Відповідь передається потоком: змінюється лише останній запис історії
+                response = ""
+                async for delta in self.llm_provider.generate_response_stream(
+                    message,
+                    context,
+                    use_mcp=True,  # Дозволяємо використання MCP
+                    mcp_server_url=self._mcp_url_resolved,
+                    mcp_token=self._auth_token_cached,
+                    use_full_mcp_server=self.use_full_mcp_server
+                ):
+                    response += delta
+                    self.chat_history[-1] = (message, response)
+                    yield list(self.chat_history), ""
+                
+                if self._is_cacheable(response):
+                    response_future.set_result(response)
+                    if response_cache is not None:
+                        await asyncio.to_thread(response_cache.set, cache_key, response, self.auth.user_id)
+            finally:
+                # Очікувачі отримують None при помилці і виконують власний запит
+                if not response_future.done():
+                    response_future.set_result(None)
+                self._inflight.pop(cache_key, None)
+            
+            self._last_err_type = ()
+            message = self._share_text(message)
+            response = self._share_text(response)
             
             # Оновлення останнього повідомлення в історії з відповіддю
             if self.chat_history:
                 self.chat_history[-1] = (message, response)
             
-            # Обмеження довжини історії чату
-            if len(self.chat_history) > self.MAX_HISTORY_LENGTH:
-                self.chat_history = self.chat_history[-self.MAX_HISTORY_LENGTH:]
-            
-            return self.chat_history, ""
+            yield list(self.chat_history), ""
         except Exception as e:
             error_msg = f"Помилка отримання відповіді: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            # Логуємо лише новий тип помилки, щоб серія однакових збоїв не засмічувала лог
+            if not isinstance(e, self._last_err_type):
+                self._last_err_type = type(e)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.exception("Помилка обробки повідомлення чату")
+                else:
+                    logger.error(error_msg)
             
             # Оновлення останнього повідомлення з повідомленням про помилку
             if self.chat_history and self.chat_history[-1][0] == message:
@@ -688,37 +766,119 @@ class StudentDashboard:
             else:
                 self.chat_history.append((message, error_msg))
             
-            return self.chat_history, ""
+            yield list(self.chat_history), ""
+    
+    def _cache_key(self, messages: List[Dict[str, str]], course_version: Optional[int] = None) -> str:
+        """Ключ кешу відповідей: повідомлення діалогу, обраний курс, версія його даних і режим доступу до Moodle."""
+        buf = b"\x00".join([
+            messages[-1]["content"].encode(),
+            str(self.selected_course).encode(),
+            str(course_version).encode(),
+            str(self.use_full_mcp_server).encode(),
+            self._moodle_url_bytes,
+            self._history_tail_bytes(messages[:-1])
+        ])
+        return _HASH(buf, digest_size=16).hexdigest()
+    
+    async def _course_version(self, course_id: int) -> Optional[int]:
+        """Найпізніший timemodified завдань курсу (запитується не частіше за COURSE_VERSION_TTL; None при помилці)."""
+        cached = self._course_versions.get(course_id)
+        if cached is not None and time.monotonic() - cached[0] < COURSE_VERSION_TTL:
+            return cached[1]
+        
+        try:
+            success, data = await self.auth._call_api("mod_assign_get_assignments", moodle_array("courseids", [course_id]))
+        except Exception as e:
+            logger.error("Помилка отримання версії даних курсу %s: %s", course_id, e)
+            return None
+        if not success or "courses" not in data:
+            return None
+        return self._store_course_version(course_id, [
+            assignment for course in data["courses"] if str(course.get('id')) == str(course_id)
+            for assignment in course.get("assignments", [])
+        ])
+    
+    def _store_course_version(self, course_id: int, assignments: List[Dict[str, Any]]) -> int:
+        """Запам'ятовування версії даних курсу за вже отриманим списком завдань."""
+        version = max((assignment.get("timemodified") or 0 for assignment in assignments), default=0)
+        self._course_versions[course_id] = (time.monotonic(), version)
+        return version
+    
+    def _history_tail_bytes(self, tail: List[Dict[str, str]]) -> bytes:
+        """Серіалізована попередня частина діалогу; перераховується лише після зміни історії."""
+        if tail != self._history_tail_msgs:
+            self._history_tail_msgs = tail
+            self._history_tail_serialized = dumps_json(tail)
+        return self._history_tail_serialized
+    
+    @staticmethod
+    def _is_cacheable(response: str) -> bool:
+        """Повідомлення про помилки не кешуються, щоб повторна спроба знову зверталася до LLM."""
+        return bool(response) and not response.startswith("Помилка") and "Помилка генерації відповіді:" not in response
+    
+    def _share_text(self, text: str) -> str:
+        """Повернення спільного екземпляра рядка, щоб повтори в історії чату не займали окрему пам'ять."""
+        if len(text) < INTERN_MAX_LENGTH:
+            return sys.intern(text)
+        shared = self._response_pool.get(text)
+        if shared is None:
+            # str не підтримує weakref, тому пул обмежуємо вручну: тримаємо лише тексти з історії
+            if len(self._response_pool) >= 2 * self.MAX_HISTORY_LENGTH:
+                alive = {id(t) for pair in self.chat_history for t in pair}
+                self._response_pool = {t: t for t in self._response_pool if id(t) in alive}
+            shared = self._response_pool[text] = text
+        return shared
+    
+    async def _ensure_warm_task(self) -> None:
+        """Запуск фонового прогріву LLM провайдера (один раз за життя панелі).
+        
+        Обробник async, щоб Gradio викликав його в циклі подій: create_task потребує запущеного циклу.
+        """
+        if self._warm_task is None:
+            self._warm_task = asyncio.create_task(self._warm_llm_provider())
+    
+    async def _warm_llm_provider(self) -> None:
+        """Створення LLM провайдера до першого повідомлення (MCP сервер запускається лише на вимогу)."""
+        try:
+            if not self.llm_provider:
+                self.llm_provider = await LLMProviderFactory.create_provider("claude")
+        except Exception as e:
+            logger.error("Помилка попереднього прогріву LLM провайдера: %s", e)
     
     def _format_timestamp(self, timestamp: Optional[int]) -> str:
         """Форматування Unix-timestamp у читабельну дату."""
         if not timestamp:
             return "Не вказано"
         
-        from datetime import datetime
-        try:
-            return datetime.fromtimestamp(timestamp).strftime('%d.%m.%Y %H:%M')
-        except Exception:
-            return f"Timestamp: {timestamp}"
+        return _format_timestamp_cached(timestamp)
         
-    def switch_mcp_mode(self, mode: str) -> Tuple[Dict, str]:
+    async def switch_mcp_mode(self, mode: str) -> Tuple[Dict, str]:
         """Перемикання режиму інтеграції з MCP."""
         if mode == "Повний MCP сервер":
             self.use_full_mcp_server = True
+            self._mcp_url_resolved = "auto"
             return gr.update(visible=True), "MCP сервер не запущено. Натисніть кнопку 'Запустити MCP сервер'."
         else:
             self.use_full_mcp_server = False
+            self._mcp_url_resolved = self.moodle_url
             # Зупиняємо MCP сервер, якщо він запущений
             if self.llm_provider:
                 try:
-                    status = self.llm_provider.stop_mcp_server()
+                    status = await self.llm_provider.stop_mcp_server()
                     return gr.update(visible=False), f"Режим прямого доступу активовано. {status}"
                 except Exception as e:
                     return gr.update(visible=False), f"Режим прямого доступу активовано. Помилка при зупинці MCP сервера: {e}"
             return gr.update(visible=False), "Режим прямого доступу активовано."
 
+    def refresh_auth_cache(self) -> None:
+        """Оновлення кешованого токена після (повторної) автентифікації."""
+        self._auth_token_cached = self.auth.token
+
     async def start_mcp_server(self) -> str:
         """Запуск MCP сервера."""
+        if self._warm_task is not None:
+            await self._warm_task
+        
         if not self.llm_provider:
             try:
                 self.llm_provider = await LLMProviderFactory.create_provider("claude")
@@ -731,13 +891,13 @@ class StudentDashboard:
         except Exception as e:
             return f"Помилка запуску MCP сервера: {e}"
 
-    def stop_mcp_server(self) -> str:
+    async def stop_mcp_server(self) -> str:
         """Зупинка MCP сервера."""
         if not self.llm_provider:
             return "LLM провайдер не ініціалізовано."
         
         try:
-            status = self.llm_provider.stop_mcp_server()
+            status = await self.llm_provider.stop_mcp_server()
             return status
         except Exception as e:
             return f"Помилка зупинки MCP сервера: {e}"
\ No newline at end of file
@@ -1,22 +1,29 @@
 import gradio as gr
 import asyncio
-import subprocess
 import os
 import json
 import sys
-from typing import Dict, Any, List, Tuple, Optional
+import time
+import csv
+import io
+import logging
+import sqlite3
+import atexit
+import heapq
+import functools
+import numpy as np
+import pandas as pd
+from collections import Counter, defaultdict
+from itertools import chain, islice
+from operator import itemgetter
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple, Optional, Union, Callable, Awaitable, AsyncIterator
 
 # Імпортуємо необхідні модулі з проекту
-try:
-    from common.auth import MoodleAuth
-except ImportError:
-    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-    from common.auth import MoodleAuth
-
-try:
-    from common.llm_provider import LLMProviderFactory
-except ImportError:
-    from common.llm_provider import LLMProviderFactory
+from common.auth import MoodleAuth, moodle_array
+from common.llm_provider import LLMProviderFactory
+from common.api_cache import ApiCache, DEFAULT_CACHE_DIR
+from common.async_utils import gather_bounded
 
 # Аналогічно для MoodleMCPServer, якщо він існує
 try:
@@ -24,6 +31,183 @@ try:
 except ImportError:
     MoodleMCPServer = None
 
+log = logging.getLogger(__name__)
+
+# Час життя кешованих відповідей Moodle API (секунди)
+COURSES_CACHE_TTL = 5 * 60  # Список курсів змінюється рідко; кнопка оновлення оминає кеш
+USER_INFO_CACHE_TTL = 10 * 60  # Профіль поточного викладача
+COURSE_DATA_CACHE_TTL = 30
+USER_CACHE_TTL = 5 * 60  # Профілі користувачів змінюються рідко
+SUBMISSIONS_CACHE_TTL = 2 * 60  # Здані роботи, завантажені наперед, мають дожити до перегляду
+GRADES_CACHE_TTL = 2 * 60  # Звіт оцінок курсу - найбільша відповідь для аналітики й звітів
+# Найбільший ttl + stale_ttl серед викликів _cached_call: старші записи на диску не використовуються
+DISK_CACHE_MAX_AGE = 2 * USER_INFO_CACHE_TTL
+ASSIGNMENTS_REUSE_TTL = 5 * 60  # Завантажений список завдань (з кількістю зданих робіт) повторно використовується у звітах
+SUBMISSIONS_PREFETCH_CONCURRENCY = 6  # Одночасні запити при попередньому завантаженні зданих робіт
+COURSE_LOG_PAGE_SIZE = 1000  # Записів логу курсу на сторінку report_log_get_course_log
+COURSE_LOG_MAX_PAGES = 100  # Запобіжник від нескінченної пагінації, якщо сервер не повертає total
+COURSE_LOG_CONCURRENCY = 6  # Одночасні запити сторінок логу
+
+# Скрипт MCP сервера та інтерпретатор для його запуску
+_SERVER_SCRIPT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_server", "moodle_server.py"))
+_PYTHON_EXECUTABLE = os.path.abspath(sys.executable)
+# Скрипт входить до пакета, тож його наявність перевіряється один раз при імпорті
+# (якщо файл зникне пізніше, процес завершиться одразу і це виявить перевірка запуску)
+_SERVER_SCRIPT_FOUND = os.path.exists(_SERVER_SCRIPT)
+# Кодувальник конфігурації MCP (створюється один раз для генерації та збереження)
+_MCP_CONFIG_ENCODER = json.JSONEncoder(indent=2, ensure_ascii=False)
+
+# Тайм-аути керування процесом локального MCP сервера (секунди)
+MCP_STARTUP_CHECK_TIMEOUT = 0.5  # Очікування можливого аварійного завершення одразу після старту
+MCP_STOP_TIMEOUT = 5  # Очікування завершення після terminate
+
+# Незмінні дані для типових оновлень компонентів. Сам gr.update() створюється
+# щоразу заново, бо Gradio змінює словник оновлення під час обробки (забирає "value")
+AUTH_ERROR_COURSES = {"choices": [("Помилка автентифікації", None)], "value": None, "interactive": False}
+NO_COURSES = {"choices": [("Призначені курси не знайдено", None)], "value": None, "interactive": False}
+AUTH_ERROR_STUDENTS_ROWS = [["Помилка автентифікації", "", ""]]
+NO_STUDENTS_ROWS = [["Студентів не знайдено", "", ""]]
+AUTH_ERROR_ASSIGNMENTS_ROWS = [["Помилка автентифікації", "", "", ""]]
+NO_ASSIGNMENTS_ROWS = [["Завдань не знайдено", "", "", ""]]
+# Оновлення видимості не містять "value", тож Gradio їх не змінює і їх можна перевикористовувати
+_SHOW = gr.update(visible=True)
+_HIDE = gr.update(visible=False)
+
+# Підпис курсу у випадаючому списку: "<назва> (ID: <id>)"
+_COURSE_LABEL = "{} (ID: {})".format
+
+# Заголовки колонок таблиці студентів
+STUDENT_COLUMNS = ("ID", "Ім'я", "Email")
+# Таблиця студентів надсилається в браузер сторінками: великий Dataframe повільно рендериться
+STUDENTS_PAGE_SIZE = 100
+STUDENTS_PAGE_SIZE_MAX = 1000
+# Буфер запису CSV експорту: файл записується великими блоками замість багатьох дрібних write
+CSV_WRITE_BUFFER = 1 << 20
+# Заголовок CSV експорту студентів
+STUDENTS_CSV_HEADER = ("ID", "Повне ім'я", "Email")
+
+# Колонки таблиці завдань: ключ у self.assignments -> заголовок у Dataframe
+ASSIGNMENT_COLUMNS = {'id': "ID", 'name': "Назва", 'duedate': "Термін здачі", 'submissions': "Зданих робіт"}
+# Рядок таблиці завдань: значення полів у порядку колонок (усі ключі заповнюються в get_course_assignments)
+_ASSIGNMENT_ROW = itemgetter(*ASSIGNMENT_COLUMNS)
+
+# Основи слів, за якими повідомлення в чаті вважається питанням про дані курсу
+_COURSE_KEYWORDS = frozenset(("курс", "студент", "завдан", "оцін", "розділ", "модул", "course", "student", "assign", "grade"))
+
+# Типи елементів курсу, для яких в інформації про курс показується ID
+ID_MODULE_TYPES = frozenset({'assign', 'quiz', 'forum'})
+
+# Створення елементів курсу: тип -> (функція API, додаткові поля до спільних).
+# Поле зі значенням None заповнюється описом елемента
+_MODULE_SPECS = {
+    "assign": ("mod_assign_add_assignment", {
+        "duedate": 0,  # 0 = без терміну
+        "grade": 100  # Максимальна оцінка
+    }),
+    # Файл (потребує додаткового API для завантаження файлу)
+    "resource": ("core_course_add_mod_resource", {}),
+    "page": ("core_course_add_mod_page", {"content": None, "contentformat": 1}),
+    "url": ("core_course_add_mod_url", {"externalurl": "https://example.com"}),  # Тут треба вказати реальну URL
+    "forum": ("core_course_add_mod_forum", {}),
+}
+
+class _SafeFilenameTable(dict):
+    """Таблиця для str.translate: літери, цифри, '_' і '-' залишаються, решта символів замінюється на '_'.
+    
+    Рішення для кожного символу обчислюється один раз (в т.ч. для кирилиці) і кешується в словнику.
+    """
+    def __missing__(self, codepoint: int) -> int:
+        char = chr(codepoint)
+        self[codepoint] = codepoint if char.isalnum() or char in '_-' else ord('_')
+        return self[codepoint]
+
+_SAFE_FILENAME_TABLE = _SafeFilenameTable()
+
+# Ролі Moodle, користувачі з якими вважаються студентами курсу
+STUDENT_ROLES = frozenset({'student'})
+
+# Формат дат Moodle (усі часові мітки показуються в UTC)
+_TIME_FMT = '%d.%m.%Y %H:%M UTC'
+
+# Підписи статусів зданих робіт Moodle
+_STATUS_MAP = {
+    "new": "Немає спроб",
+    "draft": "Чернетка",
+    "submitted": "Здано",
+    "marked": "Оцінено",
+    "graded": "Оцінено",
+}
+
+# Опції core_enrol_get_enrolled_users для списку студентів: лише активні записи
+# і лише поля, потрібні для таблиці та фільтрації за роллю
+ENROLLED_STUDENTS_OPTIONS = [
+    {"name": "onlyactive", "value": 1},
+    {"name": "userfields", "value": "id,fullname,email,roles"}
+]
+
+
+def _is_student(user: Dict[str, Any]) -> bool:
+    """Чи є учасник курсу (запис core_enrol_get_enrolled_users) студентом."""
+    return bool(user.get('id')) and not STUDENT_ROLES.isdisjoint(role.get('shortname') for role in user.get('roles') or ())
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_ts_utc(timestamp: int) -> str:
+    """Дата Moodle у форматі _TIME_FMT (UTC); кешується, бо терміни і часи здачі часто повторюються."""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(_TIME_FMT)
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_ts_local(timestamp: int) -> str:
+    """Дата Moodle у місцевому часі сервера (для звіту активності)."""
+    return datetime.fromtimestamp(timestamp).strftime('%d.%m.%Y %H:%M')
+
+
+def _has_grade(grade: Dict[str, Any]) -> bool:
+    """Чи містить запис mod_assign_get_grades виставлену оцінку (Moodle позначає її відсутність як -1)."""
+    try:
+        return float(grade.get('grade')) >= 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _fmt_module(module: Dict[str, Any]) -> str:
+    """Рядок модуля курсу для опису вмісту курсу."""
+    mod_type = module.get('modname', 'N/A')
+    # Додамо ID для завдань (assign) та тестів (quiz) для зручності
+    id_part = f", ID: {module['instance']}" if mod_type in ID_MODULE_TYPES and 'instance' in module else ""
+    return f"  - {module.get('name', 'Без назви')} (Тип: {mod_type}{id_part})"
+
+
+def _section_lines(section: Dict[str, Any]) -> List[str]:
+    """Рядки розділу курсу з порожнім рядком-роздільником попереду."""
+    modules = section.get("modules")
+    return ["", f"Розділ: {section.get('name', 'Без назви')}",
+            *(map(_fmt_module, modules) if modules else ("  (Розділ порожній)",))]
+
+
+def _write_comments_plugin(plugin: Dict[str, Any], buf: io.StringIO) -> None:
+    """Коментарі до зданої роботи (плагін comments)."""
+    buf.write("".join(
+        f"\n    Коментар: {field['text']}"
+        for field in plugin.get("editorfields", ()) if field.get("text")
+    ))
+
+
+def _write_file_plugin(plugin: Dict[str, Any], buf: io.StringIO) -> None:
+    """Файли зданої роботи (плагін file)."""
+    buf.write("".join(
+        f"\n    Файли: {', '.join(f.get('filename', 'N/A') for f in area['files'])}"
+        for area in plugin.get("fileareas", ()) if area.get("files")
+    ))
+
+
+# Обробники плагінів зданих робіт за типом плагіна
+_PLUGIN_HANDLERS: Dict[str, Callable[[Dict[str, Any], io.StringIO], None]] = {
+    "comments": _write_comments_plugin,
+    "file": _write_file_plugin,
+}
+
 
 class TeacherDashboard:
     """Клас для інтерфейсу викладача з підтримкою аналітичного та адміністративного режимів."""
@@ -33,429 +217,615 @@ class TeacherDashboard:
         self.auth = MoodleAuth(moodle_url)
         self.selected_course = None
         self.courses = []
+        self._courses_choices = []  # Варіанти (назва, id) для випадаючого списку курсів
+        self._courses_by_id = {}  # Індекс курсів за ID
         self.students = []
+        # Відповідь core_enrol_get_enrolled_users, з якої побудовано self.students. Кеш повертає той самий
+        # об'єкт, доки відповідь не оновиться, тому порівняння за ідентичністю нічого не коштує
+        self._students_source: Optional[List[Dict[str, Any]]] = None
         self.assignments = []
+        # Курс і час (time.monotonic), для яких self.assignments завантажено повністю
+        self._assignments_course: Optional[int] = None
+        self._assignments_ts = 0.0
         self.messages = []  # Існуючий код
         self.chat_history = self.messages  # Додати цей рядок для сумісності
         self.llm_provider = None
         self.mode = "analytical"  # Додаємо ініціалізацію режиму
-        self._initialize_auth()  # Викликаємо синхронно
         self.use_full_mcp_server = False  # За замовчуванням використовуємо прямий доступ
+        self.mcp_process = None  # Процес локального MCP сервера (asyncio.subprocess.Process)
+        self._mcp_stderr_task: Optional[asyncio.Task] = None  # Читання stderr запущеного MCP сервера
+        self._mcp_cfg_cache: Dict[str, str] = {}  # Згенерована конфігурація MCP: URL Moodle -> JSON
         self.MAX_HISTORY_LENGTH = 50  # Максимальна кількість повідомлень у історії
         self.MAX_CONTEXT_MESSAGES = 10  # Максимальна кількість повідомлень для контексту LLM
+        # Кеш успішних відповідей API: (функція, ("course" | "user", id), ...) -> (час, результат)
+        self._cache: Dict[tuple, Tuple[float, Tuple[bool, Any]]] = {}
+        # Постійний кеш відповідей API на диску (відкривається після визначення користувача)
+        self._disk_cache: Optional[ApiCache] = None
+        self._disk_cache_failed = False
+        # Обробники, що виконуються зараз: ключ -> задача (для повторних натискань кнопок)
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        # Кеш профілів користувачів: id -> (час, дані користувача)
+        self._user_cache: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        # Знайдені форуми оголошень: id курсу -> id форуму
+        self._announce_forum_cache: Dict[int, int] = {}
+        # Фонове попереднє завантаження зданих робіт для завдань курсу
+        self._prefetch_task: Optional[asyncio.Task] = None
+        
+    
+    async def _cached_call(self, key: tuple, ttl: float, coro_factory: Callable[[], Awaitable[Tuple[bool, Any]]], force: bool = False, stale_ttl: float = 0) -> Tuple[bool, Any]:
+        """Виклик API з кешуванням успішного результату на ttl секунд (force=True оминає кеш).
+        
+        Протягом ще stale_ttl секунд після ttl повертається застарілий результат,
+        а свіжий завантажується у фоні (stale-while-revalidate).
+        """
+        cached = self._cache.get(key)
+        if not force and cached is None:
+            cached = await self._load_from_disk(key)
+        if not force and cached:
+            age = time.monotonic() - cached[0]
+            if age < ttl:
+                return cached[1]
+            if age < ttl + stale_ttl:
+                refresh_key = ("refresh",) + key
+                task = self._inflight.get(refresh_key)
+                if task is None or task.done():
+                    task = self._inflight[refresh_key] = asyncio.create_task(self._cached_call(key, ttl, coro_factory, force=True))
+                    task.add_done_callback(lambda done: self._inflight.pop(refresh_key, None) if self._inflight.get(refresh_key) is done else None)
+                return cached[1]
         
+        # Однакові одночасні запити (наприклад, подвійне натискання кнопки) чекають на один виклик API
+        return await self._once(("call",) + key, lambda: self._fetch_and_store(key, coro_factory))
     
-    def _initialize_auth(self):
-        """Ініціалізація автентифікації"""
-        if self.auth.token:
-            print("Спроба автоматичної автентифікації...")
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+    async def _fetch_and_store(self, key: tuple, coro_factory: Callable[[], Awaitable[Tuple[bool, Any]]]) -> Tuple[bool, Any]:
+        """Виклик API і збереження успішного результату в кеші (у пам'яті та на диску)."""
+        result = await coro_factory()
+        if result[0]:
+            self._cache[key] = (time.monotonic(), result)
+            disk_cache = self._get_disk_cache()
+            if disk_cache is not None:
+                try:
+                    await asyncio.to_thread(disk_cache.set, key, result)
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    log.warning("Не вдалося зберегти відповідь у кеш на диску: %s", e)
+        return result
+    
+    def _get_disk_cache(self) -> Optional[ApiCache]:
+        """Кеш на диску для поточного користувача (None, поки користувач невідомий або кеш недоступний)."""
+        if self._disk_cache is None and not self._disk_cache_failed and self.auth.user_id:
             try:
-                success, message = loop.run_until_complete(self.auth.authenticate_with_token())
-                if success:
-                    print(f"Автентифікація успішна. User ID: {self.auth.user_id}, Is Teacher: {self.auth.is_teacher}")
-                else:
-                    print(f"Помилка автентифікації: {message}")
-            finally:
-                loop.close()
+                self._disk_cache = ApiCache(os.path.join(DEFAULT_CACHE_DIR, f"{self.auth.user_id}.sqlite3"), DISK_CACHE_MAX_AGE)
+                atexit.register(self._disk_cache.close)
+            except (sqlite3.Error, OSError) as e:
+                log.warning("Кеш відповідей API на диску недоступний: %s", e)
+                self._disk_cache_failed = True
+        return self._disk_cache
+    
+    async def _load_from_disk(self, key: tuple) -> Optional[Tuple[float, Tuple[bool, Any]]]:
+        """Завантаження запису з кешу на диску в пам'ять (вік запису переводиться на time.monotonic)."""
+        disk_cache = self._get_disk_cache()
+        if disk_cache is None:
+            return None
+        try:
+            entry = await asyncio.to_thread(disk_cache.get, key)
+        except sqlite3.Error as e:
+            log.warning("Помилка читання кешу на диску: %s", e)
+            return None
+        if entry is None:
+            return None
+        
+        cached = (time.monotonic() - (time.time() - entry[0]), entry[1])
+        self._cache.setdefault(key, cached)
+        return self._cache[key]
+    
+    async def _once(self, key: tuple, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Виконання обробника з об'єднанням повторних викликів: поки задача з тим самим ключем
+        не завершена, нові виклики чекають на її результат замість повторного запиту до Moodle."""
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            return await asyncio.shield(task)
+        
+        task = asyncio.create_task(coro_factory())
+        self._inflight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self._inflight.get(key) is task and task.done():
+                del self._inflight[key]
+    
+    async def _resolve_users(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Отримання профілів користувачів за ID; з API запитуються лише відсутні в кеші."""
+        now = time.monotonic()
+        users = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = self._user_cache.get(user_id)
+            if cached and now - cached[0] < USER_CACHE_TTL:
+                users[user_id] = cached[1]
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            success, data = await self.auth._call_api("core_user_get_users_by_field", {
+                "field": "id",
+                **moodle_array("values", missing)
+            })
+            if success:
+                for user in data:
+                    self._user_cache[user['id']] = (now, user)
+                    users[user['id']] = user
+            else:
+                log.error("Помилка отримання даних користувачів: %s", data)
+        return users
+    
+    async def _invalidate_course_cache(self, course_id: Any) -> None:
+        """Видалення кешованих відповідей API для курсу (після змін курсу або ручного оновлення).
+        
+        Видаляються лише ключі з областю ("course", course_id), тож записи користувача з тим самим числовим id лишаються.
+        """
+        scope = ("course", course_id)
+        for key in [key for key in self._cache if key[1] == scope]:
+            del self._cache[key]
+        if self._disk_cache is not None:
+            try:
+                await asyncio.to_thread(self._disk_cache.invalidate, scope)
+            except sqlite3.Error as e:
+                log.warning("Не вдалося очистити кеш курсу на диску: %s", e)
+    
+    async def _authenticate(self) -> None:
+        """Автентифікація за токеном (виконується при першому відкритті панелі)."""
+        log.debug("Спроба автоматичної автентифікації...")
+        success, message = await self.auth.authenticate_with_token()
+        if success:
+            log.info("Автентифікація успішна. User ID: %s, Is Teacher: %s", self.auth.user_id, self.auth.is_teacher)
+        else:
+            log.error("Помилка автентифікації: %s", message)
     
     def build_ui(self) -> gr.Blocks:
-        """Побудова інтерфейсу панелі викладача."""
+        """Побудова інтерфейсу панелі викладача: компонування вкладок і спільні обробники."""
         with gr.Blocks(title="Moodle Асистент - Панель викладача") as dashboard:
             gr.Markdown("# Moodle Асистент - Панель викладача")
             
             with gr.Row():
                 with gr.Column(scale=1):
-                    # Вибір режиму роботи
-                    with gr.Group() as mode_selection_group:
-                        gr.Markdown("### Режим роботи")
-                        with gr.Row():
-                            analytical_mode_button = gr.Button("Аналітичний режим", variant="primary")
-                            administrative_mode_button = gr.Button("Адміністративний режим", variant="secondary")
-                        
-                        mode_status = gr.Textbox(label="Поточний режим", value="Аналітичний режим", interactive=False)
-                    
-                    # Блок інформації про користувача
-                    with gr.Group() as user_info_group:
-                        gr.Markdown("### Інформація про викладача")
-                        user_info_output = gr.Textbox(label="Профіль", interactive=False, lines=6)
-                        
-                        # Оновлюємо інформацію про користувача синхронно
-                        if self.auth.authenticated and self.auth.token and self.auth.user_id:
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            try:
-                                loop.run_until_complete(self.update_user_info(user_info_output))
-                            finally:
-                                loop.close()
-                        else:
-                            user_info_output.value = "Очікування автентифікації..."
-                    
-                    # Блок курсів
-                    with gr.Group() as courses_group:
-                        gr.Markdown("### Мої курси")
-                        refresh_courses_button = gr.Button("Оновити список курсів")
-                        courses_dropdown = gr.Dropdown(label="Виберіть курс", choices=[("Завантаження...", None)], interactive=False)
-                        
-                        # Завантажуємо курси синхронно
-                        if self.auth.token and self.auth.user_id:
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            try:
-                                loop.run_until_complete(self.load_courses(courses_dropdown))
-                            finally:
-                                loop.close()
+                    sidebar = self._build_sidebar()
                 
                 with gr.Column(scale=2):
-                    with gr.Tabs() as tabs:
-                        # Вкладка інформації про курс (спільна для обох режимів)
-                        with gr.Tab("Інформація про курс"):
-                            course_info_button = gr.Button("Отримати інформацію про курс")
-                            course_info_output = gr.Textbox(label="Інформація про курс", interactive=False, lines=10)
-                        
-                        # Вкладка студентів (спільна для обох режимів)
-                        with gr.Tab("Студенти"):
-                            with gr.Row():
-                                get_students_button = gr.Button("Отримати список студентів")
-                                export_students_button = gr.Button("Експортувати список (CSV)")
-                            
-                            students_output = gr.Dataframe(
-                                headers=["ID", "Ім'я", "Email"],
-                                datatype=["number", "str", "str"],
-                                label="Студенти курсу"
-                            )
-                        
-                        # Вкладка завдань (спільна для обох режимів)
-                        with gr.Tab("Завдання"):
-                            get_assignments_button = gr.Button("Отримати список завдань")
-                            assignments_table = gr.Dataframe(
-                                headers=["ID", "Назва", "Термін здачі", "Зданих робіт"],
-                                datatype=["number", "str", "str", "number"],
-                                label="Завдання курсу"
-                            )
-                            
-                            assignment_id_input = gr.Number(label="ID завдання")
-                            get_submissions_button = gr.Button("Отримати здані роботи")
-                            submissions_output = gr.Textbox(label="Здані роботи", interactive=False, lines=10)
-                        
-                        # Вкладки для аналітичного режиму
-                        with gr.Tab("Аналітика", visible=True) as analytics_tab:
-                            gr.Markdown("### Аналіз курсу")
-                            
-                            with gr.Group():
-                                gr.Markdown("#### Активність студентів")
-                                get_activity_button = gr.Button("Аналізувати активність студентів")
-                                activity_output = gr.Textbox(label="Аналіз активності", interactive=False, lines=10)
-                            
-                            with gr.Group():
-                                gr.Markdown("#### Статистика оцінювання")
-                                get_grades_stats_button = gr.Button("Отримати статистику оцінювання")
-                                grades_stats_output = gr.Textbox(label="Статистика оцінювання", interactive=False, lines=10)
-                            
-                            with gr.Group():
-                                gr.Markdown("#### Генерація звітів")
-                                report_type_dropdown = gr.Dropdown(
-                                    label="Тип звіту",
-                                    choices=[
-                                        ("Загальна інформація про курс", "general"),
-                                        ("Активність студентів", "activity"),
-                                        ("Статистика завдань", "assignments"),
-                                        ("Повний звіт", "full")
-                                    ],
-                                    value="general"
-                                )
-                                generate_report_button = gr.Button("Згенерувати звіт")
-                                report_output = gr.Textbox(label="Звіт", interactive=False, lines=15)
-                        
-                        # Вкладки для адміністративного режиму
-                        with gr.Tab("Управління контентом", visible=False) as content_tab:
-                            gr.Markdown("### Управління контентом курсу")
-                            
-                            with gr.Accordion("Створення нового розділу", open=False):
-                                section_name_input = gr.Textbox(label="Назва розділу")
-                                section_desc_input = gr.Textbox(label="Опис розділу", lines=3)
-                                create_section_button = gr.Button("Створити розділ")
-                                section_status = gr.Textbox(label="Статус", interactive=False)
-                            
-                            with gr.Accordion("Створення нового елемента", open=False):
-                                module_type_dropdown = gr.Dropdown(
-                                    label="Тип елемента",
-                                    choices=[
-                                        ("Завдання", "assign"),
-                                        ("Файл", "resource"),
-                                        ("Сторінка", "page"),
-                                        ("URL", "url"),
-                                        ("Форум", "forum")
-                                    ],
-                                    value="assign"
-                                )
-                                module_name_input = gr.Textbox(label="Назва елемента")
-                                module_desc_input = gr.Textbox(label="Опис елемента", lines=3)
-                                section_id_input = gr.Number(label="ID розділу (0 - головний)")
-                                create_module_button = gr.Button("Створити елемент")
-                                module_status = gr.Textbox(label="Статус", interactive=False)
-                        
-                        # Вкладка оголошень (спільна для обох режимів)
-                        with gr.Tab("Оголошення"):
-                            with gr.Group():
-                                gr.Markdown("### Створення оголошення")
-                                announcement_subject = gr.Textbox(label="Тема оголошення")
-                                announcement_text = gr.Textbox(label="Текст оголошення", lines=5)
-                                create_announcement_button = gr.Button("Опублікувати оголошення")
-                                announcement_status = gr.Textbox(label="Статус", interactive=False)
-                        
-                        # Вкладка AI асистента (спільна для обох режимів)
-                        with gr.Tab("AI Асистент"):
-                            gr.Markdown("### Спілкування з AI Асистентом")
-                            
-                            # Історія чату
-                            chat_history_output = gr.Chatbot(label="Історія чату", height=400)
-                            
-                            # Вибір режиму інтеграції з MCP
-                            with gr.Row():
-                                gr.Markdown("#### Режим інтеграції з даними:")
-                                mcp_mode_selector = gr.Radio(
-                                    choices=["Прямий доступ до Moodle API", "Повний MCP сервер"],
-                                    value="Прямий доступ до Moodle API",
-                                    label="Режим взаємодії з Moodle",
-                                    info="Оберіть, як AI Асистент отримує дані з Moodle"
-                                )
-                                mcp_status = gr.Textbox(label="Статус MCP сервера", interactive=False)
-
-                            # Кнопки керування MCP сервером, видимі тільки в режимі повного MCP сервера
-                            with gr.Row(visible=False) as mcp_controls:
-                                start_mcp_button = gr.Button("Запустити MCP сервер")
-                                stop_mcp_button = gr.Button("Зупинити MCP сервер")
-                            
-                            # Введення та відправка
-                            with gr.Row():
-                                chat_input = gr.Textbox(label="Задайте питання", lines=2, placeholder="Наприклад: проаналізуй активність студентів у моєму курсі")
-                                send_button = gr.Button("Відправити")
-                            
-                            # Вибір провайдера
-                            with gr.Accordion("Налаштування AI", open=False):
-                                provider_dropdown = gr.Dropdown(
-                                    label="LLM Провайдер",
-                                    choices=[("Claude (Anthropic)", "claude")],
-                                    value="claude"
-                                )
-                                
-                                init_provider_button = gr.Button("Ініціалізувати провайдера")
-                                provider_status = gr.Textbox(label="Статус провайдера", interactive=False)
-                        
-                        # Вкладка MCP сервера
-                        if MoodleMCPServer is not None:  # Показуємо вкладку тільки якщо сервер імпортовано
-                            with gr.Tab("MCP Сервер"):
-                                gr.Markdown("### AI Асистент на базі MCP і Claude")
-                                
-                                with gr.Row():
-                                    mcp_status = gr.Textbox(label="Статус MCP сервера", value="Не запущено", interactive=False)
-                                    with gr.Column():
-                                        start_mcp_button = gr.Button("Запустити MCP сервер")
-                                        stop_mcp_button = gr.Button("Зупинити MCP сервер")
-                                
-                                gr.Markdown("""
-                                #### Інструкція з підключення до Claude Desktop:
-                                1. Встановіть Claude Desktop з офіційного сайту: [claude.ai/download](https://claude.ai/download)
-                                2. Після запуску MCP сервера налаштуйте інтеграцію у Claude Desktop
-                                3. Виберіть "Підключити MCP сервер" у налаштуваннях
-                                4. Використовуйте згенеровану JSON конфігурацію нижче
-                                """)
-                                
-                                with gr.Accordion("Налаштування MCP сервера", open=False):
-                                    mcp_config = gr.Code(label="Налаштування для claude_desktop_config.json", language="json")
-                                    update_mcp_config_button = gr.Button("Оновити налаштування")
+                    with gr.Tabs():
+                        self._build_course_info_tab()
+                        self._build_students_tab()
+                        self._build_assignments_tab()
+                        analytics_tab = self._build_analytics_tab()
+                        content_tab, content_forms_requested = self._build_content_tab()
+                        self._build_announcements_tab()
+                        assistant = self._build_assistant_tab()
+                        # Вкладка MCP сервера показується тільки якщо сервер імпортовано
+                        mcp = self._build_mcp_tab() if MoodleMCPServer is not None else None
             
             # Обробники перемикання режимів
-            analytical_mode_button.click(
+            sidebar["analytical_mode_button"].click(
                 fn=self.switch_to_analytical_mode,
                 inputs=[],
-                outputs=[mode_status, analytics_tab, content_tab]
+                outputs=[sidebar["mode_status"], analytics_tab, content_tab]
             )
             
-            administrative_mode_button.click(
+            sidebar["administrative_mode_button"].click(
                 fn=self.switch_to_administrative_mode,
                 inputs=[],
-                outputs=[mode_status, analytics_tab, content_tab]
-            )
-            
-            # Функції обробки подій для основного дашборду
-            refresh_courses_button.click(
-                fn=self.load_courses_callback,
-                inputs=[],
-                outputs=[courses_dropdown]
-            )
-            
-            courses_dropdown.change(
-                fn=self.select_course,
-                inputs=[courses_dropdown],
-                outputs=[]
-            )
-            
-            course_info_button.click(
-                fn=self.get_course_info,
-                inputs=[],
-                outputs=[course_info_output]
-            )
-            
-            get_students_button.click(
-                fn=self.get_course_students,
-                inputs=[],
-                outputs=[students_output]
-            )
-            
-            export_students_button.click(
-                fn=self.export_students_list,
-                inputs=[],
-                outputs=[]
-            )
-            
-            get_assignments_button.click(
-                fn=self.get_course_assignments,
-                inputs=[],
-                outputs=[assignments_table]
-            )
-            
-            get_submissions_button.click(
-                fn=self.get_assignment_submissions,
-                inputs=[assignment_id_input],
-                outputs=[submissions_output]
+                outputs=[sidebar["mode_status"], analytics_tab, content_tab, content_forms_requested]
             )
             
-            create_announcement_button.click(
-                fn=self.create_announcement,
-                inputs=[announcement_subject, announcement_text],
-                outputs=[announcement_status]
-            )
-            
-            # Обробники для аналітичного режиму
-            get_activity_button.click(
-                fn=self.analyze_student_activity,
+            clear_chat_button = gr.Button("Очистити історію")
+            clear_chat_button.click(
+                fn=self.clear_chat_history,
                 inputs=[],
-                outputs=[activity_output]
+                outputs=[assistant["chat_history_output"]]
             )
             
-            get_grades_stats_button.click(
-                fn=self.get_grades_statistics,
+            if mcp is not None:
+                assistant["mcp_mode_selector"].change(
+                    fn=self.switch_mcp_mode,
+                    inputs=[assistant["mcp_mode_selector"]],
+                    outputs=[assistant["mcp_controls"], mcp["mcp_status"]]
+                )
+        
+            # Профіль і курси завантажуються паралельно при відкритті сторінки
+            dashboard.load(
+                fn=self._on_load,
                 inputs=[],
-                outputs=[grades_stats_output]
+                outputs=[sidebar["user_info_output"], sidebar["courses_dropdown"]]
             )
+        
+        return dashboard
+    
+    def _build_sidebar(self) -> Dict[str, Any]:
+        """Бічна панель: вибір режиму, профіль викладача і список курсів."""
+        # Вибір режиму роботи
+        with gr.Group():
+            gr.Markdown("### Режим роботи")
+            with gr.Row():
+                analytical_mode_button = gr.Button("Аналітичний режим", variant="primary")
+                administrative_mode_button = gr.Button("Адміністративний режим", variant="secondary")
             
-            generate_report_button.click(
-                fn=self.generate_report,
-                inputs=[report_type_dropdown],
-                outputs=[report_output]
-            )
+            mode_status = gr.Textbox(label="Поточний режим", value="Аналітичний режим", interactive=False)
+        
+        # Блок інформації про користувача
+        with gr.Group():
+            gr.Markdown("### Інформація про викладача")
+            # Дані заповнюються обробником _on_load при відкритті сторінки
+            user_info_output = gr.Textbox(label="Профіль", value="Очікування автентифікації...", interactive=False, lines=6)
+        
+        # Блок курсів
+        with gr.Group():
+            gr.Markdown("### Мої курси")
+            refresh_courses_button = gr.Button("Оновити список курсів")
+            courses_dropdown = gr.Dropdown(label="Виберіть курс", choices=[("Завантаження...", None)], interactive=False)
+        
+        refresh_courses_button.click(
+            fn=self.load_courses_callback,
+            inputs=[],
+            outputs=[courses_dropdown]
+        )
+        
+        courses_dropdown.change(
+            fn=self.select_course,
+            inputs=[courses_dropdown],
+            outputs=[]
+        )
+        
+        return {
+            "analytical_mode_button": analytical_mode_button,
+            "administrative_mode_button": administrative_mode_button,
+            "mode_status": mode_status,
+            "user_info_output": user_info_output,
+            "courses_dropdown": courses_dropdown,
+        }
+    
+    def _build_course_info_tab(self) -> None:
+        """Вкладка інформації про курс (спільна для обох режимів)."""
+        with gr.Tab("Інформація про курс"):
+            course_info_button = gr.Button("Отримати інформацію про курс")
+            course_info_output = gr.Textbox(label="Інформація про курс", interactive=False, lines=10)
+        
+        course_info_button.click(
+            fn=self.get_course_info,
+            inputs=[],
+            outputs=[course_info_output]
+        )
+    
+    def _build_students_tab(self) -> None:
+        """Вкладка студентів (спільна для обох режимів)."""
+        with gr.Tab("Студенти"):
+            with gr.Row():
+                get_students_button = gr.Button("Отримати список студентів")
+                export_students_button = gr.Button("Експортувати список (CSV)")
+            with gr.Row():
+                students_name_filter = gr.Textbox(label="Фільтр за іменем", placeholder="Частина імені студента")
+                students_page_size = gr.Slider(
+                    label="Розмір сторінки",
+                    minimum=10,
+                    maximum=STUDENTS_PAGE_SIZE_MAX,
+                    value=STUDENTS_PAGE_SIZE,
+                    step=10
+                )
             
-            # Обробники для адміністративного режиму
-            create_section_button.click(
-                fn=self.create_course_section,
-                inputs=[section_name_input, section_desc_input],
-                outputs=[section_status]
+            students_output = gr.Dataframe(
+                headers=list(STUDENT_COLUMNS),
+                datatype=["number", "str", "str"],
+                label="Студенти курсу"
             )
-            
-            create_module_button.click(
-                fn=self.create_course_module,
-                inputs=[module_type_dropdown, module_name_input, module_desc_input, section_id_input],
-                outputs=[module_status]
+            students_export_file = gr.File(label="Експортований список", interactive=False)
+        
+        get_students_button.click(
+            fn=self.get_course_students,
+            inputs=[students_page_size, students_name_filter],
+            outputs=[students_output]
+        )
+        
+        students_name_filter.submit(
+            fn=self.get_course_students,
+            inputs=[students_page_size, students_name_filter],
+            outputs=[students_output]
+        )
+        
+        export_students_button.click(
+            fn=self.export_students_list,
+            inputs=[],
+            outputs=[students_export_file]
+        )
+    
+    def _build_assignments_tab(self) -> None:
+        """Вкладка завдань і зданих робіт (спільна для обох режимів)."""
+        with gr.Tab("Завдання"):
+            get_assignments_button = gr.Button("Отримати список завдань")
+            assignments_table = gr.Dataframe(
+                headers=["ID", "Назва", "Термін здачі", "Зданих робіт"],
+                datatype=["number", "str", "str", "number"],
+                label="Завдання курсу"
             )
             
-            # Обробники для AI Асистента
-            init_provider_button.click(
-                fn=self.init_provider_callback,
-                inputs=[provider_dropdown],
-                outputs=[provider_status]
-            )
+            assignment_id_input = gr.Number(label="ID завдання")
+            get_submissions_button = gr.Button("Отримати здані роботи")
+            submissions_output = gr.Textbox(label="Здані роботи", interactive=False, lines=10)
+        
+        get_assignments_button.click(
+            fn=self.get_course_assignments,
+            inputs=[],
+            outputs=[assignments_table]
+        )
+        
+        get_submissions_button.click(
+            fn=self.get_assignment_submissions,
+            inputs=[assignment_id_input],
+            outputs=[submissions_output]
+        )
+    
+    def _build_analytics_tab(self) -> gr.Tab:
+        """Вкладка аналітики (видима в аналітичному режимі)."""
+        with gr.Tab("Аналітика", visible=True) as analytics_tab:
+            gr.Markdown("### Аналіз курсу")
+            
+            with gr.Group():
+                gr.Markdown("#### Активність студентів")
+                get_activity_button = gr.Button("Аналізувати активність студентів")
+                activity_output = gr.Textbox(label="Аналіз активності", interactive=False, lines=10)
+            
+            with gr.Group():
+                gr.Markdown("#### Статистика оцінювання")
+                get_grades_stats_button = gr.Button("Отримати статистику оцінювання")
+                grades_stats_output = gr.Textbox(label="Статистика оцінювання", interactive=False, lines=10)
+            
+            with gr.Group():
+                gr.Markdown("#### Генерація звітів")
+                report_type_dropdown = gr.Dropdown(
+                    label="Тип звіту",
+                    choices=[
+                        ("Загальна інформація про курс", "general"),
+                        ("Активність студентів", "activity"),
+                        ("Статистика завдань", "assignments"),
+                        ("Повний звіт", "full")
+                    ],
+                    value="general"
+                )
+                generate_report_button = gr.Button("Згенерувати звіт")
+                report_output = gr.Textbox(label="Звіт", interactive=False, lines=15)
+        
+        get_activity_button.click(
+            fn=self.analyze_student_activity,
+            inputs=[],
+            outputs=[activity_output]
+        )
+        
+        get_grades_stats_button.click(
+            fn=self.get_grades_statistics,
+            inputs=[],
+            outputs=[grades_stats_output]
+        )
+        
+        generate_report_button.click(
+            fn=self.generate_report,
+            inputs=[report_type_dropdown],
+            outputs=[report_output]
+        )
+        
+        return analytics_tab
+    
+    def _build_content_tab(self) -> Tuple[gr.Tab, gr.State]:
+        """Вкладка управління контентом (видима в адміністративному режимі).
+        
+        Повертає вкладку і стан, зміна якого запускає побудову форм.
+        """
+        with gr.Tab("Управління контентом", visible=False) as content_tab:
+            gr.Markdown("### Управління контентом курсу")
+            
+            content_forms_requested = gr.State(False)
+            
+            # Форми створюються лише після першого переходу в адміністративний режим,
+            # тож початкова сторінка не містить прихованих компонентів
+            @gr.render(inputs=[content_forms_requested], triggers=[content_forms_requested.change])
+            def render_content_forms(requested: bool) -> None:
+                if requested:
+                    self._build_content_forms()
+        
+        return content_tab, content_forms_requested
+    
+    def _build_announcements_tab(self) -> None:
+        """Вкладка оголошень (спільна для обох режимів)."""
+        with gr.Tab("Оголошення"):
+            with gr.Group():
+                gr.Markdown("### Створення оголошення")
+                announcement_subject = gr.Textbox(label="Тема оголошення")
+                announcement_text = gr.Textbox(label="Текст оголошення", lines=5)
+                create_announcement_button = gr.Button("Опублікувати оголошення")
+                announcement_status = gr.Textbox(label="Статус", interactive=False)
+        
+        create_announcement_button.click(
+            fn=self.create_announcement,
+            inputs=[announcement_subject, announcement_text],
+            outputs=[announcement_status]
+        )
+    
+    def _build_assistant_tab(self) -> Dict[str, Any]:
+        """Вкладка AI асистента (спільна для обох режимів)."""
+        with gr.Tab("AI Асистент"):
+            gr.Markdown("### Спілкування з AI Асистентом")
             
-            send_button.click(
-                fn=self.send_message,
-                inputs=[chat_input],
-                outputs=[chat_history_output, chat_input]
-            )
+            # Історія чату
+            chat_history_output = gr.Chatbot(label="Історія чату", height=400)
             
-            clear_chat_button = gr.Button("Очистити історію")
-
-            # Додати обробник до списку обробників:
-            clear_chat_button.click(
-                fn=self.clear_chat_history,
-                inputs=[],
-                outputs=[chat_history_output]
-            )
-
-            # Обробники для MCP сервера
-            if MoodleMCPServer is not None:
-                start_mcp_button.click(
-                    fn=self.start_mcp_server,
-                    inputs=[],
-                    outputs=[mcp_status, mcp_config]
-                )
-                
-                stop_mcp_button.click(
-                    fn=self.stop_mcp_server,
-                    inputs=[],
-                    outputs=[mcp_status]
-                )
-                
-                update_mcp_config_button.click(
-                    fn=lambda c: self.update_mcp_config(c),
-                    inputs=[mcp_config],
-                    outputs=[mcp_status]
-                )
-
-                mcp_mode_selector.change(
-                    fn=self.switch_mcp_mode,
-                    inputs=[mcp_mode_selector],
-                    outputs=[mcp_controls, mcp_status]
-                )
-
-                start_mcp_button.click(
-                    fn=self.start_mcp_server,
-                    inputs=[],
-                    outputs=[mcp_status]
+            # Вибір режиму інтеграції з MCP
+            with gr.Row():
+                gr.Markdown("#### Режим інтеграції з даними:")
+                mcp_mode_selector = gr.Radio(
+                    choices=["Прямий доступ до Moodle API", "Повний MCP сервер"],
+                    value="Прямий доступ до Moodle API",
+                    label="Режим взаємодії з Moodle",
+                    info="Оберіть, як AI Асистент отримує дані з Moodle"
                 )
+                gr.Textbox(label="Статус MCP сервера", interactive=False)
 
-                stop_mcp_button.click(
-                    fn=self.stop_mcp_server,
-                    inputs=[],
-                    outputs=[mcp_status]
+            # Кнопки керування MCP сервером, видимі тільки в режимі повного MCP сервера
+            with gr.Row(visible=False) as mcp_controls:
+                gr.Button("Запустити MCP сервер")
+                gr.Button("Зупинити MCP сервер")
+            
+            # Введення та відправка
+            with gr.Row():
+                chat_input = gr.Textbox(label="Задайте питання", lines=2, placeholder="Наприклад: проаналізуй активність студентів у моєму курсі")
+                send_button = gr.Button("Відправити")
+            
+            # Вибір провайдера
+            with gr.Accordion("Налаштування AI", open=False):
+                provider_dropdown = gr.Dropdown(
+                    label="LLM Провайдер",
+                    choices=[("Claude (Anthropic)", "claude")],
+                    value="claude"
                 )
+                
+                init_provider_button = gr.Button("Ініціалізувати провайдера")
+                provider_status = gr.Textbox(label="Статус провайдера", interactive=False)
         
-        return dashboard
+        init_provider_button.click(
+            fn=self.init_provider_callback,
+            inputs=[provider_dropdown],
+            outputs=[provider_status]
+        )
+        
+        send_button.click(
+            fn=self.send_message,
+            inputs=[chat_input],
+            outputs=[chat_history_output, chat_input]
+        )
+        
+        return {
+            "chat_history_output": chat_history_output,
+            "mcp_mode_selector": mcp_mode_selector,
+            "mcp_controls": mcp_controls,
+        }
+    
+    def _build_mcp_tab(self) -> Dict[str, Any]:
+        """Вкладка запуску MCP сервера і конфігурації для Claude Desktop."""
+        with gr.Tab("MCP Сервер"):
+            gr.Markdown("### AI Асистент на базі MCP і Claude")
+            
+            with gr.Row():
+                mcp_status = gr.Textbox(label="Статус MCP сервера", value="Не запущено", interactive=False)
+                with gr.Column():
+                    start_mcp_button = gr.Button("Запустити MCP сервер")
+                    stop_mcp_button = gr.Button("Зупинити MCP сервер")
+            
+            gr.Markdown("""
+            #### Інструкція з підключення до Claude Desktop:
+            1. Встановіть Claude Desktop з офіційного сайту: [claude.ai/download](https://claude.ai/download)
+            2. Після запуску MCP сервера налаштуйте інтеграцію у Claude Desktop
+            3. Виберіть "Підключити MCP сервер" у налаштуваннях
+            4. Використовуйте згенеровану JSON конфігурацію нижче
+            """)
+            
+            with gr.Accordion("Налаштування MCP сервера", open=False):
+                mcp_config = gr.Code(label="Налаштування для claude_desktop_config.json", language="json")
+                update_mcp_config_button = gr.Button("Оновити налаштування")
+        
+        start_mcp_button.click(
+            fn=self.start_mcp_server,
+            inputs=[],
+            outputs=[mcp_status, mcp_config]
+        )
+        
+        stop_mcp_button.click(
+            fn=self.stop_mcp_server,
+            inputs=[],
+            outputs=[mcp_status]
+        )
+        
+        update_mcp_config_button.click(
+            fn=self.update_mcp_config,
+            inputs=[mcp_config],
+            outputs=[mcp_status]
+        )
+        
+        return {"mcp_status": mcp_status}
+    
+    def _build_content_forms(self) -> None:
+        """Форми адміністративного режиму (створення розділів і елементів курсу) з обробниками."""
+        with gr.Accordion("Створення нового розділу", open=False):
+            section_name_input = gr.Textbox(label="Назва розділу")
+            section_desc_input = gr.Textbox(label="Опис розділу", lines=3)
+            create_section_button = gr.Button("Створити розділ")
+            section_status = gr.Textbox(label="Статус", interactive=False)
+        
+        with gr.Accordion("Створення нового елемента", open=False):
+            module_type_dropdown = gr.Dropdown(
+                label="Тип елемента",
+                choices=[
+                    ("Завдання", "assign"),
+                    ("Файл", "resource"),
+                    ("Сторінка", "page"),
+                    ("URL", "url"),
+                    ("Форум", "forum")
+                ],
+                value="assign"
+            )
+            module_name_input = gr.Textbox(label="Назва елемента")
+            module_desc_input = gr.Textbox(label="Опис елемента", lines=3)
+            section_id_input = gr.Number(label="ID розділу (0 - головний)")
+            create_module_button = gr.Button("Створити елемент")
+            module_status = gr.Textbox(label="Статус", interactive=False)
+        
+        create_section_button.click(
+            fn=self.create_course_section,
+            inputs=[section_name_input, section_desc_input],
+            outputs=[section_status]
+        )
+        
+        create_module_button.click(
+            fn=self.create_course_module,
+            inputs=[module_type_dropdown, module_name_input, module_desc_input, section_id_input],
+            outputs=[module_status]
+        )
     
     def switch_to_analytical_mode(self) -> Tuple[str, Dict, Dict]:
         """Перемикання в аналітичний режим."""
         self.mode = "analytical"
-        print("Перемикання в аналітичний режим")
-        return (
-            "Аналітичний режим",
-            gr.update(visible=True),
-            gr.update(visible=False)
-        )
+        log.debug("Перемикання в аналітичний режим")
+        return "Аналітичний режим", _SHOW, _HIDE
     
-    def switch_to_administrative_mode(self) -> Tuple[str, Dict, Dict]:
-        """Перемикання в адміністративний режим."""
+    def switch_to_administrative_mode(self) -> Tuple[str, Dict, Dict, bool]:
+        """Перемикання в адміністративний режим (останнє значення вмикає побудову форм вкладки)."""
         self.mode = "administrative"
-        print("Перемикання в адміністративний режим")
-        return (
-            "Адміністративний режим",
-            gr.update(visible=False),
-            gr.update(visible=True)
+        log.debug("Перемикання в адміністративний режим")
+        return "Адміністративний режим", _HIDE, _SHOW, True
+    
+    async def _on_load(self) -> Tuple[str, Dict]:
+        """Початкове заповнення панелі: профіль викладача та список курсів."""
+        # Профіль і курси залежать від user_id, тому автентифікація виконується першою
+        if self.auth.token and not self.auth.authenticated:
+            await self._once(("authenticate",), self._authenticate)
+        user_info, courses_update = await asyncio.gather(
+            self._fetch_user_info(),
+            self.load_courses_callback(force=False)
         )
+        return user_info, courses_update
     
     async def update_user_info(self, info_output_component: gr.Textbox) -> None:
         """Оновлення інформації про користувача."""
+        info_output_component.value = await self._fetch_user_info()
+    
+    async def _fetch_user_info(self) -> str:
+        """Отримання тексту профілю поточного користувача."""
         if not self.auth.token or not self.auth.user_id:
-            await asyncio.sleep(0)
-            info_output_component.value = "Помилка: Не вдалося отримати інформацію (проблема автентифікації)."
-            return
+            return "Помилка: Не вдалося отримати інформацію (проблема автентифікації)."
         
         try:
-            print("Оновлення інформації про користувача...")
-            success, data = await self.auth._call_api("core_user_get_users_by_field", {
-                "field": "id",
-                "values[0]": self.auth.user_id
-            })
+            log.debug("Оновлення інформації про користувача...")
+            user_id = self.auth.user_id
+            success, data = await self._cached_call(
+                ("core_user_get_users_by_field", ("user", user_id)), USER_INFO_CACHE_TTL,
+                lambda: self.auth._call_api("core_user_get_users_by_field", {
+                    "field": "id",
+                    **moodle_array("values", [user_id])
+                }),
+                stale_ttl=USER_INFO_CACHE_TTL
+            )
             
             if success and data and len(data) > 0:
                 user = data[0]
@@ -467,110 +837,103 @@ class TeacherDashboard:
                     f"Email: {user.get('email', 'N/A')}",
                     f"Є викладачем: {'Так' if self.auth.is_teacher else 'Ні (або не визначено)'}"
                 ]
-                info_output_component.value = "\n".join(info)
-                print("Інформація про користувача оновлена.")
+                log.debug("Інформація про користувача оновлена.")
+                return "\n".join(info)
             else:
                 error_msg = f"Не вдалося отримати дані користувача: {data if not success else 'Порожня відповідь'}"
-                print(error_msg)
-                info_output_component.value = error_msg
+                log.error(error_msg)
+                return error_msg
         except Exception as e:
             error_msg = f"Критична помилка при оновленні інфо користувача: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
-            info_output_component.value = error_msg
+            log.exception(error_msg)
+            return error_msg
+    
+    async def _fetch_courses(self, force: bool = False) -> Tuple[bool, Any]:
+        """Отримання курсів користувача; варіанти для випадаючого списку зберігаються в self._courses_choices."""
+        success, data = await self._cached_call(
+            ("core_enrol_get_users_courses", ("user", self.auth.user_id)), COURSES_CACHE_TTL,
+            lambda: self.auth._call_api("core_enrol_get_users_courses", {"userid": self.auth.user_id}),
+            force=force,
+            stale_ttl=COURSES_CACHE_TTL
+        )
+        
+        # Варіанти перераховуються лише для нових даних, а не для відповіді з кешу
+        if success and data is not self.courses:
+            self.courses = data
+            get = dict.get
+            self._courses_choices = [(_COURSE_LABEL(get(course, 'fullname', 'Без назви'), course_id), course_id)
+                                     for course in data if (course_id := get(course, 'id'))]
+            self._courses_by_id = {course['id']: course for course in data if course.get('id')}
+        return success, data
     
     async def load_courses(self, dropdown_component: gr.Dropdown) -> None:
         """Завантаження курсів для випадаючого списку."""
-        if not self.auth.token or not self.auth.user_id:
-            await asyncio.sleep(0)
-            dropdown_component.choices = [("Помилка автентифікації", None)]
-            dropdown_component.value = None
-            dropdown_component.interactive = False
-            return
-        
-        try:
-            print("Завантаження курсів...")
-            success, data = await self.auth._call_api("core_enrol_get_users_courses", {
-                "userid": self.auth.user_id
-            })
-            
-            if success:
-                self.courses = data
-                courses_list = [(f"{course.get('fullname', 'Без назви')} (ID: {course.get('id', 'N/A')})", course.get('id'))
-                               for course in data if course.get('id')]
-                
-                if not courses_list:
-                    dropdown_component.choices = [("Призначені курси не знайдено", None)]
-                    dropdown_component.value = None
-                    dropdown_component.interactive = False
-                else:
-                    dropdown_component.choices = courses_list
-                    dropdown_component.value = None
-                    dropdown_component.interactive = True
-                print(f"Курси завантажено: {len(courses_list)}")
-            else:
-                error_msg = f"Помилка API при завантаженні курсів: {data}"
-                print(error_msg)
-                dropdown_component.choices = [(error_msg, None)]
-                dropdown_component.value = None
-                dropdown_component.interactive = False
-        except Exception as e:
-            error_msg = f"Критична помилка при завантаженні курсів: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
-            dropdown_component.choices = [(error_msg, None)]
-            dropdown_component.value = None
-            dropdown_component.interactive = False
-    
-    async def load_courses_callback(self) -> Dict:
+        state = await self._courses_dropdown_state(force=False)
+        dropdown_component.choices = state["choices"]
+        dropdown_component.value = state["value"]
+        dropdown_component.interactive = state["interactive"]
+    
+    async def load_courses_callback(self, force: bool = True) -> Dict:
         """Завантаження курсів при натисканні кнопки оновлення (повертає оновлення для Gradio)."""
+        return await self._once(("courses", force), lambda: self._load_courses_update(force))
+    
+    async def _load_courses_update(self, force: bool) -> Dict:
+        """Оновлення для випадаючого списку курсів."""
+        if force:
+            # Форум оголошень курсу стабільний, тож його шукають заново лише після ручного оновлення курсів
+            self._announce_forum_cache.clear()
+            # Ручне оновлення також скидає кешовані дані обраного курсу
+            if self.selected_course:
+                await self._invalidate_course_cache(self.selected_course)
+        return gr.update(**await self._courses_dropdown_state(force))
+    
+    async def _courses_dropdown_state(self, force: bool) -> Dict[str, Any]:
+        """Отримання курсів і стану випадаючого списку (choices, value, interactive)."""
         if not self.auth.token or not self.auth.user_id:
-            return gr.update(choices=[("Помилка автентифікації", None)], value=None, interactive=False)
+            return AUTH_ERROR_COURSES
         
         try:
-            print("Оновлення списку курсів (callback)...")
-            success, data = await self.auth._call_api("core_enrol_get_users_courses", {
-                "userid": self.auth.user_id
-            })
+            log.debug("Оновлення списку курсів (force=%s)...", force)
+            # Кнопка оновлення (force=True) завжди звертається до Moodle і оновлює кеш
+            success, data = await self._fetch_courses(force=force)
             
             if success:
-                self.courses = data
-                courses_list = [(f"{course.get('fullname', 'Без назви')} (ID: {course.get('id', 'N/A')})", course.get('id'))
-                               for course in data if course.get('id')]
+                courses_list = self._courses_choices
                 
                 if not courses_list:
-                    print("Призначені курси не знайдено (callback).")
-                    return gr.update(choices=[("Призначені курси не знайдено", None)], value=None, interactive=False)
-                else:
-                    print(f"Курси оновлено: {len(courses_list)} (callback).")
-                    return gr.update(choices=courses_list, value=None, interactive=True)
+                    log.debug("Призначені курси не знайдено.")
+                    return NO_COURSES
+                log.debug("Курси оновлено: %s.", len(courses_list))
+                return {"choices": courses_list, "value": None, "interactive": True}
             else:
                 error_msg = f"Помилка API при оновленні курсів: {data}"
-                print(error_msg)
-                return gr.update(choices=[(error_msg, None)], value=None, interactive=False)
+                log.error(error_msg)
+                return {"choices": [(error_msg, None)], "value": None, "interactive": False}
         except Exception as e:
             error_msg = f"Критична помилка при оновленні курсів: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
-            return gr.update(choices=[(error_msg, None)], value=None, interactive=False)
+            log.exception(error_msg)
+            return {"choices": [(error_msg, None)], "value": None, "interactive": False}
     
-    def select_course(self, course_id: str) -> None:
+    def select_course(self, course_id: Optional[Any]) -> None:
         """Вибір курсу зі списку."""
-        self.selected_course = course_id
         self.selected_course_name = None
-        print(f"Обрано курс ID: {self.selected_course}")
+        # Dropdown може повернути ID курсу рядком, тому зберігаємо його як int
+        try:
+            self.selected_course = int(course_id) if course_id not in (None, '') else None
+        except (TypeError, ValueError):
+            log.warning("Попередження: Некоректний ID курсу: %s", course_id)
+            self.selected_course = None
+        log.debug("Обрано курс ID: %s", self.selected_course)
         
         if self.selected_course:
-            for course in self.courses:
-                if course.get('id') == self.selected_course:
-                    self.selected_course_name = course.get('fullname', 'Ім\'я не знайдено')
-                    print(f"Знайдено ім'я курсу: {self.selected_course_name}")
-                    break
-            if not self.selected_course_name:
-                print(f"Попередження: Не вдалося знайти ім'я для курсу ID {self.selected_course} у списку self.courses.")
+            # Кеш курсу не скидається: свіжість даних забезпечують TTL і фонове оновлення застарілих записів,
+            # тож після перезапуску дані курсу одразу беруться з диска
+            course = self._courses_by_id.get(self.selected_course)
+            if course:
+                self.selected_course_name = course.get('fullname', 'Ім\'я не знайдено')
+                log.debug("Знайдено ім'я курсу: %s", self.selected_course_name)
+            else:
+                log.warning("Попередження: Не вдалося знайти ім'я для курсу ID %s у списку self.courses.", self.selected_course)
     
     async def get_course_info(self) -> str:
         """Отримання інформації про вибраний курс."""
@@ -580,181 +943,192 @@ class TeacherDashboard:
             return "Будь ласка, спочатку виберіть курс зі списку."
         
         try:
-            print(f"Отримання інформації для курсу ID: {self.selected_course}")
-            success, data = await self.auth._call_api("core_course_get_contents", {
-                "courseid": self.selected_course
-            })
+            log.debug("Отримання інформації для курсу ID: %s", self.selected_course)
+            success, data = await self._fetch_course_contents(self.selected_course)
             
             if success:
                 if not data:
                     course_name = self.selected_course_name or f"ID {self.selected_course}"
-                    print(f"Вміст курсу '{course_name}' не знайдено або курс порожній.")
+                    log.debug("Вміст курсу '%s' не знайдено або курс порожній.", course_name)
                     return f"Вміст курсу '{course_name}' не знайдено або курс порожній."
                 
-                sections_output = []
-                for section in data:
-                    section_name = section.get('name', 'Без назви')
-                    section_info = f"Розділ: {section_name}"
-                    modules_output = []
-                    for module in section.get("modules", []):
-                        mod_name = module.get('name', 'Без назви')
-                        mod_type = module.get('modname', 'N/A')
-                        module_info = f"  - {mod_name} (Тип: {mod_type}"
-                        # Додамо ID для завдань (assign) та тестів (quiz) для зручності
-                        if mod_type in ['assign', 'quiz', 'forum'] and 'instance' in module:
-                            module_info += f", ID: {module['instance']}"
-                        module_info += ")"
-                        modules_output.append(module_info)
-                    
-                    if modules_output:
-                        section_info += "\n" + "\n".join(modules_output)
-                    else:
-                        section_info += "\n  (Розділ порожній)"
-                    sections_output.append(section_info)
-                
-                result = "\n\n".join(sections_output)
-                print(f"Інформація про курс ID {self.selected_course} отримана.")
+                # Розділи розгортаються в один потік рядків; роздільник перед першим розділом пропускається
+                result = "\n".join(islice(chain.from_iterable(map(_section_lines, data)), 1, None))
+                log.debug("Інформація про курс ID %s отримана.", self.selected_course)
                 return result
             else:
                 error_msg = f"Помилка API при отриманні вмісту курсу: {data}"
-                print(error_msg)
+                log.error(error_msg)
                 return error_msg
         except Exception as e:
             error_msg = f"Критична помилка при отриманні вмісту курсу: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
-    async def get_course_students(self) -> Dict:
-        """Отримання списку студентів курсу (повертає оновлення для Dataframe)."""
+    async def get_course_students(self, page_size: float = STUDENTS_PAGE_SIZE, name_filter: str = "") -> Dict:
+        """Отримання списку студентів курсу (повертає оновлення для Dataframe).
+        
+        У таблицю потрапляють лише перші page_size студентів, чиє ім'я містить name_filter;
+        повний список зберігається в self.students для експорту.
+        """
+        page_size = int(page_size or STUDENTS_PAGE_SIZE)
+        query = (name_filter or "").strip().lower()
+        return await self._once(
+            ("students", self.selected_course, page_size, query),
+            lambda: self._load_course_students(page_size, query)
+        )
+    
+    async def _load_course_students(self, page_size: int, query: str) -> Dict:
+        """Завантаження студентів обраного курсу (одна сторінка з урахуванням фільтра)."""
         if not self.auth.token:
-            return gr.update(value=[["Помилка автентифікації", "", ""]])
+            return gr.update(value=AUTH_ERROR_STUDENTS_ROWS)
         if not self.selected_course:
             gr.Warning("Будь ласка, спочатку виберіть курс.")
             return gr.update(value=None)
         
         try:
-            print(f"Отримання студентів для курсу ID: {self.selected_course}")
-            success, data = await self.auth._call_api("core_enrol_get_enrolled_users", {
-                "courseid": self.selected_course
-            })
+            log.debug("Отримання студентів для курсу ID: %s", self.selected_course)
+            success, data = await self._fetch_enrolled_users(self.selected_course)
             
             if success:
-                # Фільтруємо користувачів з роллю 'student'
-                students = [user for user in data if user.get('id') and any(role.get('shortname') == 'student' for role in user.get('roles', []))]
-                
-                if not students:
-                    print(f"Студентів не знайдено в курсі ID {self.selected_course}.")
-                    self.students = []
-                    return gr.update(value=[["Студентів не знайдено", "", ""]])
+                # Користувачі з роллю 'student' і рядки сторінки таблиці збираються за один прохід
+                students = []
+                matched = 0
+                ids, names, emails = [], [], []
+                for user in data:
+                    if _is_student(user):
+                        students.append(user)
+                        fullname = user.get('fullname', 'N/A')
+                        if query and query not in fullname.lower():
+                            continue
+                        matched += 1
+                        if len(ids) < page_size:
+                            ids.append(user['id'])
+                            names.append(fullname)
+                            emails.append(user.get('email', 'N/A'))
                 
                 self.students = students
-                result_list = [[
-                    student['id'],
-                    student.get('fullname', 'N/A'),
-                    student.get('email', 'N/A')
-                ] for student in students]
-                print(f"Отримано студентів: {len(result_list)}")
-                return gr.update(value=result_list)
+                self._students_source = data
+                if not ids:
+                    log.debug("Студентів не знайдено в курсі ID %s (фільтр: %r).", self.selected_course, query)
+                    return gr.update(value=NO_STUDENTS_ROWS, label="Студенти курсу")
+                
+                log.debug("Отримано студентів: %s, показано: %s", len(students), len(ids))
+                # Gradio серіалізує DataFrame по колонках, без обходу кожної клітинки
+                return gr.update(
+                    value=pd.DataFrame(dict(zip(STUDENT_COLUMNS, (ids, names, emails)))),
+                    label=f"Студенти курсу (показано {len(ids)} з {matched})"
+                )
             else:
                 error_msg = f"Помилка API при отриманні студентів: {data}"
-                print(error_msg)
+                log.error(error_msg)
                 return gr.update(value=[[error_msg, "", ""]])
         except Exception as e:
             error_msg = f"Критична помилка при отриманні студентів: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return gr.update(value=[[error_msg, "", ""]])
     
-    def export_students_list(self) -> None:
-        """Експорт поточного списку студентів (self.students) у CSV файл."""
+    def _fetch_course_contents(self, course_id: Optional[int]) -> Awaitable[Tuple[bool, Any]]:
+        """Отримання (з кешу) розділів і модулів курсу."""
+        return self._cached_call(
+            ("core_course_get_contents", ("course", course_id)), COURSE_DATA_CACHE_TTL,
+            lambda: self.auth._call_api("core_course_get_contents", {"courseid": course_id})
+        )
+    
+    def _fetch_course(self, course_id: Optional[int]) -> Awaitable[Tuple[bool, Any]]:
+        """Отримання (з кешу) опису курсу."""
+        return self._cached_call(
+            ("core_course_get_courses", ("course", course_id)), COURSE_DATA_CACHE_TTL,
+            lambda: self.auth._call_api("core_course_get_courses", moodle_array("options[ids]", [course_id]))
+        )
+    
+    async def _fetch_enrolled_users(self, course_id: Optional[int]) -> Tuple[bool, Any]:
+        """Отримання (з кешу) активних учасників курсу."""
+        if not course_id:
+            return False, "Курс не вибрано"
+        return await self._cached_call(
+            ("core_enrol_get_enrolled_users", ("course", course_id)), COURSE_DATA_CACHE_TTL,
+            lambda: self.auth._call_api("core_enrol_get_enrolled_users", {
+                "courseid": course_id,
+                "options": ENROLLED_STUDENTS_OPTIONS
+            })
+        )
+    
+    async def export_students_list(self) -> Optional[str]:
+        """Експорт поточного списку студентів (self.students) у CSV файл (повертає шлях для завантаження)."""
         if not self.students:
             gr.Warning("Список студентів порожній або ще не завантажений. Спочатку натисніть 'Отримати список студентів'.")
-            return
+            return None
         
         course_name_part = f"_{self.selected_course}" if self.selected_course else "_no_course_selected"
-        safe_course_name = "".join(c if c.isalnum() or c in ('_', '-') else '_' for c in str(self.selected_course_name or course_name_part))
+        safe_course_name = str(self.selected_course_name or course_name_part).translate(_SAFE_FILENAME_TABLE)
         filename = f"students{safe_course_name}.csv"
         
         try:
-            import csv
-            print(f"Експорт списку студентів у файл: {filename}")
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['ID', 'Повне ім\'я', 'Email'])
-                
-                for student in self.students:
-                    writer.writerow([
-                        student.get('id', 'N/A'),
-                        student.get('fullname', 'N/A'),
-                        student.get('email', 'N/A')
-                    ])
+            log.debug("Експорт списку студентів у файл: %s", filename)
+            # Запис файлу виконується в окремому потоці, щоб не блокувати цикл подій Gradio.
+            # Список не копіюється: self.students лише замінюється новим списком, а не змінюється
+            await asyncio.to_thread(self._write_students_csv, filename, self.students)
             gr.Info(f"Список студентів експортовано у файл: {filename}")
+            return os.path.abspath(filename)
         except Exception as e:
             error_msg = f"Помилка експорту студентів: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             gr.Error(error_msg)
+            return None
     
-    async def get_course_assignments(self) -> Dict:
-        """Отримання списку завдань курсу (повертає оновлення для Dataframe)."""
+    @staticmethod
+    def _write_students_csv(filename: str, students: List[Dict[str, Any]]) -> None:
+        """Запис списку студентів у CSV файл."""
+        with open(filename, 'w', newline='', encoding='utf-8', buffering=CSV_WRITE_BUFFER) as f:
+            writer = csv.writer(f)
+            writer.writerow(STUDENTS_CSV_HEADER)
+            writer.writerows(
+                (student.get('id', 'N/A'), student.get('fullname', 'N/A'), student.get('email', 'N/A'))
+                for student in students
+            )
+    
+    async def get_course_assignments(self) -> AsyncIterator[Dict]:
+        """Отримання списку завдань курсу (оновлення для Dataframe).
+        
+        Таблиця показується одразу після отримання завдань, а кількість зданих робіт
+        додається наступним оновленням.
+        """
         if not self.auth.token:
-            return gr.update(value=[["Помилка автентифікації", "", "", ""]])
+            yield gr.update(value=AUTH_ERROR_ASSIGNMENTS_ROWS)
+            return
         if not self.selected_course:
             gr.Warning("Будь ласка, спочатку виберіть курс.")
-            return gr.update(value=None)
+            yield gr.update(value=None)
+            return
         
-        assignments_list_for_df = []
+        # Список завдань без позначки курсу не використовується повторно, доки не завантажиться повністю
         self.assignments = []
+        self._assignments_course = None
         
         try:
-            print(f"Отримання завдань для курсу ID: {self.selected_course}")
-            success, data = await self.auth._call_api("mod_assign_get_assignments", {
-                "courseids[0]": self.selected_course
-            })
+            # Спочатку збираємо завдання (id, назва, термін), а кількість зданих робіт
+            # отримуємо потім для всіх завдань разом
+            raw_assignments = []
+            log.debug("Отримання завдань для курсу ID: %s", self.selected_course)
+            course_id = self.selected_course
+            success, data = await self._cached_call(
+                ("mod_assign_get_assignments", ("course", course_id)), COURSE_DATA_CACHE_TTL,
+                lambda: self.auth._call_api("mod_assign_get_assignments", moodle_array("courseids", [course_id]))
+            )
             
             if success and "courses" in data:
-                print(f"Отримано дані завдань через mod_assign_get_assignments.")
+                log.debug("Отримано дані завдань через mod_assign_get_assignments.")
                 for course_info in data['courses']:
                     if str(course_info.get('id')) == str(self.selected_course):
                         for assignment in course_info.get('assignments', []):
                             assignment_id = assignment.get('id')
                             if not assignment_id:
                                 continue
-                            
-                            submission_count = await self._get_submission_count(assignment_id)
-                            
-                            due_date_ts = assignment.get('duedate')
-                            due_date_str = "Немає"
-                            if due_date_ts and due_date_ts > 0:
-                                from datetime import datetime, timezone
-                                try:
-                                    due_date_str = datetime.fromtimestamp(due_date_ts, tz=timezone.utc).strftime('%d.%m.%Y %H:%M UTC')
-                                except Exception as dt_err:
-                                    print(f"Помилка форматування дати {due_date_ts}: {dt_err}")
-                                    due_date_str = f"Timestamp: {due_date_ts}"
-                            
-                            current_assignment = {
-                                'id': assignment_id,
-                                'name': assignment.get('name', 'Без назви'),
-                                'duedate': due_date_str,
-                                'submissions': submission_count
-                            }
-                            self.assignments.append(current_assignment)
-                            assignments_list_for_df.append([
-                                assignment_id,
-                                current_assignment['name'],
-                                current_assignment['duedate'],
-                                submission_count
-                            ])
+                            raw_assignments.append((assignment_id, assignment.get('name', 'Без назви'), assignment.get('duedate')))
             else:
-                print("Функція mod_assign_get_assignments не повернула даних, спроба через core_course_get_contents...")
-                success_cont, course_data = await self.auth._call_api("core_course_get_contents", {
-                    "courseid": self.selected_course
-                })
+                log.debug("Функція mod_assign_get_assignments не повернула даних, спроба через core_course_get_contents...")
+                success_cont, course_data = await self._fetch_course_contents(self.selected_course)
                 if success_cont:
                     for section in course_data:
                         for module in section.get("modules", []):
@@ -762,67 +1136,124 @@ class TeacherDashboard:
                                 assignment_id = module.get('instance')
                                 if not assignment_id:
                                     continue
-                                
-                                submission_count = await self._get_submission_count(assignment_id)
-                                
-                                due_date_str = "Немає"
-                                
-                                current_assignment = {
-                                    'id': assignment_id,
-                                    'name': module.get('name', 'Без назви'),
-                                    'duedate': due_date_str,
-                                    'submissions': submission_count
-                                }
-                                self.assignments.append(current_assignment)
-                                assignments_list_for_df.append([
-                                    assignment_id,
-                                    current_assignment['name'],
-                                    current_assignment['duedate'],
-                                    submission_count
-                                ])
+                                raw_assignments.append((assignment_id, module.get('name', 'Без назви'), None))
                 else:
                     error_msg = f"Помилка API при отриманні вмісту курсу: {course_data}"
-                    print(error_msg)
-                    return gr.update(value=[[error_msg, "", "", ""]])
+                    log.error(error_msg)
+                    yield gr.update(value=[[error_msg, "", "", ""]])
+                    return
+            
+            if not raw_assignments:
+                log.debug("Завдань не знайдено в курсі ID %s.", self.selected_course)
+                yield gr.update(value=NO_ASSIGNMENTS_ROWS)
+                return
+            
+            bad_dates = []  # Помилки форматування дат логуються одним записом після циклу
+            for assignment_id, name, due_date_ts in raw_assignments:
+                due_date_str = "Немає"
+                if due_date_ts and due_date_ts > 0:
+                    try:
+                        due_date_str = _format_ts_utc(int(due_date_ts))
+                    except Exception as dt_err:
+                        bad_dates.append((due_date_ts, dt_err))
+                        due_date_str = f"Timestamp: {due_date_ts}"
+                
+                self.assignments.append({
+                    'id': assignment_id,
+                    'name': name,
+                    'duedate': due_date_str,
+                    'submissions': None  # Заповнюється після запиту оцінок
+                })
             
-            if not assignments_list_for_df:
-                print(f"Завдань не знайдено в курсі ID {self.selected_course}.")
-                return gr.update(value=[["Завдань не знайдено", "", "", ""]])
+            if bad_dates:
+                log.error("Помилка форматування %s дат термінів здачі (перша: %s: %s)", len(bad_dates), *bad_dates[0])
+            log.debug("Отримано завдань: %s", len(self.assignments))
+            yield gr.update(value=self._assignments_dataframe())
+            
+            # Поки викладач переглядає таблицю, здані роботи завантажуються у фоні
+            if self._prefetch_task is None or self._prefetch_task.done():
+                self._prefetch_task = asyncio.create_task(self._prefetch_all_submissions(
+                    course_id, [assignment_id for assignment_id, _, _ in raw_assignments]
+                ))
+            
+            # Кількість зданих робіт для всіх завдань курсу отримуємо одним запитом
+            counts = await self._get_submission_counts_bulk(course_id, [assignment_id for assignment_id, _, _ in raw_assignments])
+            if counts is None:
+                # Без кількості зданих робіт список не позначається свіжим і завантажиться знову при наступному зверненні
+                for assignment in self.assignments:
+                    assignment['submissions'] = "н/д"
             else:
-                print(f"Отримано завдань: {len(assignments_list_for_df)}")
-                return gr.update(value=assignments_list_for_df)
+                for assignment in self.assignments:
+                    assignment['submissions'] = counts.get(int(assignment['id']), 0)
+                self._assignments_course = course_id
+                self._assignments_ts = time.monotonic()
+            yield gr.update(value=self._assignments_dataframe())
         
         except Exception as e:
             error_msg = f"Критична помилка при отриманні завдань: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
-            return gr.update(value=[[error_msg, "", "", ""]])
+            log.exception(error_msg)
+            yield gr.update(value=[[error_msg, "", "", ""]])
+    
+    def _fetch_submissions(self, course_id: Optional[int], assignment_id: int) -> Awaitable[Tuple[bool, Any]]:
+        """Отримання (з кешу) зданих робіт завдання."""
+        return self._cached_call(
+            ("mod_assign_get_submissions", ("course", course_id), assignment_id), SUBMISSIONS_CACHE_TTL,
+            lambda: self.auth._call_api("mod_assign_get_submissions", moodle_array("assignmentids", [assignment_id]))
+        )
+    
+    async def _prefetch_all_submissions(self, course_id: int, assignment_ids: List[int]) -> None:
+        """Фонове завантаження зданих робіт для всіх завдань курсу в кеш."""
+        # Завдання зі свіжими даними в кеші не займають місця серед одночасних запитів
+        now = time.monotonic()
+        pending = [
+            assignment_id for assignment_id in assignment_ids
+            if not ((cached := self._cache.get(("mod_assign_get_submissions", ("course", course_id), assignment_id)))
+                    and now - cached[0] < SUBMISSIONS_CACHE_TTL)
+        ]
+        
+        results = await gather_bounded(
+            (self._fetch_submissions(course_id, assignment_id) for assignment_id in pending),
+            SUBMISSIONS_PREFETCH_CONCURRENCY
+        )
+        failed = sum(1 for result in results if isinstance(result, BaseException))
+        if failed:
+            log.warning("Не вдалося попередньо завантажити здані роботи для %s з %s завдань", failed, len(pending))
     
-    async def _get_submission_count(self, assignment_id: int) -> int:
-        """Отримання кількості зданих робіт для завдання."""
-        if not self.auth.token or not assignment_id:
-            return 0
+    def _assignments_dataframe(self) -> pd.DataFrame:
+        """Таблиця завдань з self.assignments із заголовками колонок для Dataframe."""
+        return pd.DataFrame.from_records(map(_ASSIGNMENT_ROW, self.assignments), columns=list(ASSIGNMENT_COLUMNS.values()))
+    
+    async def _get_submission_counts_bulk(self, course_id: int, assignment_ids: List[int]) -> Optional[Dict[int, int]]:
+        """Отримання кількості зданих робіт для кількох завдань одним викликом mod_assign_get_grades.
+        
+        mod_assign_get_grades повертає лише оцінки без вмісту робіт і файлів, тому для підрахунку
+        він значно легший за mod_assign_get_submissions. Записи без оцінки ("-1" або порожні) не враховуються.
+        None, якщо кількість отримати не вдалося (на відміну від завдань без зданих робіт).
+        """
+        if not self.auth.token:
+            return None
+        if not assignment_ids:
+            return {}
         
         try:
-            success, data = await self.auth._call_api("mod_assign_get_grades", {
-                "assignmentids[0]": assignment_id
-            })
-            
-            count = 0
-            if success and data.get('assignments'):
-                for assignment_info in data['assignments']:
-                    if str(assignment_info.get('assignmentid')) == str(assignment_id):
-                        for grade_info in assignment_info.get('grades', []):
-                            count += 1
-                        break
-            else:
-                print(f"Помилка або порожня відповідь від mod_assign_get_grades для ID {assignment_id}: {data}")
+            params = moodle_array("assignmentids", assignment_ids)
+            success, data = await self._cached_call(
+                ("mod_assign_get_grades", ("course", course_id), tuple(assignment_ids)), COURSE_DATA_CACHE_TTL,
+                lambda: self.auth._call_api("mod_assign_get_grades", params)
+            )
             
-            return count
+            # Порожній список assignments - завдання ще без оцінок, а не помилка
+            if success and isinstance(data, dict):
+                return {
+                    int(assignment_info['assignmentid']): sum(1 for grade in assignment_info.get('grades', ()) if _has_grade(grade))
+                    for assignment_info in data.get('assignments', ())
+                    if assignment_info.get('assignmentid')
+                }
+            log.error("Помилка від mod_assign_get_grades для завдань %s: %s", assignment_ids, data)
+            return None
         except Exception as e:
-            print(f"Помилка при отриманні кількості зданих для завдання {assignment_id}: {e}")
-            return 0
+            log.error("Помилка при отриманні кількості зданих для завдань %s: %s", assignment_ids, e)
+            return None
     
     async def get_assignment_submissions(self, assignment_id: Optional[int]) -> str:
         """Отримання інформації про здані роботи для завдання."""
@@ -837,10 +1268,13 @@ class TeacherDashboard:
             return "Некоректний ID завдання. Введіть число."
         
         try:
-            print(f"Отримання зданих робіт для завдання ID: {assignment_id}")
-            success, data = await self.auth._call_api("mod_assign_get_submissions", {
-                "assignmentids[0]": assignment_id
-            })
+            log.debug("Отримання зданих робіт для завдання ID: %s", assignment_id)
+            # Учасники курсу завантажуються паралельно зі зданими роботами,
+            # тож окремий запит користувачів потрібен лише для тих, кого немає серед них
+            (success, data), (success_enrolled, enrolled_data) = await asyncio.gather(
+                self._fetch_submissions(self.selected_course, assignment_id),
+                self._fetch_enrolled_users(self.selected_course)
+            )
             
             if success:
                 assignments_data = data.get("assignments")
@@ -851,77 +1285,74 @@ class TeacherDashboard:
                 assignment_name = assignment_data.get('assignmentname', f'Завдання ID: {assignment_id}')
                 submissions = assignment_data.get("submissions")
                 
-                result_lines = [f"Завдання: {assignment_name}"]
-                
                 if not submissions:
-                    result_lines.append("  Немає зданих робіт.")
-                    return "\n".join(result_lines)
+                    return f"Завдання: {assignment_name}\n  Немає зданих робіт."
                 
-                user_ids = [s.get("userid") for s in submissions if s.get("userid")]
-                user_info_map = {}
+                user_info_map = {user['id']: user for user in enrolled_data} if success_enrolled else {}
+                # Деякі інсталяції Moodle повертають ім'я автора прямо в зданій роботі
+                user_info_map.update(
+                    (s["userid"], {"fullname": s["userfullname"]})
+                    for s in submissions
+                    if s.get("userfullname") and s.get("userid") not in user_info_map
+                )
+                # Кілька спроб одного студента дають повторювані userid — запитуємо кожного один раз
+                user_ids = list({s.get("userid") for s in submissions if s.get("userid")} - user_info_map.keys())
+                users_task = None
                 if user_ids:
-                    success_users, users_data = await self.auth._call_api("core_user_get_users_by_field", {
-                        "field": "id",
-                        **{f"values[{i}]": user_id for i, user_id in enumerate(user_ids)}
-                    })
-                    if success_users:
-                        user_info_map = {user['id']: user for user in users_data}
-                    else:
-                        print(f"Помилка отримання даних користувачів: {users_data}")
+                    # Профілі завантажуються, поки формуються незалежні від імен частини тексту;
+                    # sleep(0) дає задачі відправити запит до початку обробки
+                    users_task = asyncio.create_task(self._resolve_users(user_ids))
+                    await asyncio.sleep(0)
                 
+                # Статус, час і плагіни кожної роботи; ім'я студента додається після отримання профілів
+                details = []
+                bad_dates = []  # Помилки форматування дат логуються одним записом після циклу
                 for submission in submissions:
-                    user_id = submission.get("userid")
-                    user_name = f"ID: {user_id}"
-                    if user_id in user_info_map:
-                        user_name = user_info_map[user_id].get("fullname", user_name)
-                    
                     status_key = submission.get("status")
-                    status_map = {
-                        "new": "Немає спроб",
-                        "draft": "Чернетка",
-                        "submitted": "Здано",
-                        "marked": "Оцінено",
-                        "graded": "Оцінено",
-                    }
-                    status_text = status_map.get(status_key, f"Статус: {status_key}")
+                    status_text = _STATUS_MAP.get(status_key, f"Статус: {status_key}")
                     
                     time_modified_ts = submission.get("timemodified")
                     time_str = "N/A"
                     if time_modified_ts:
-                        from datetime import datetime, timezone
                         try:
-                            time_str = datetime.fromtimestamp(time_modified_ts, tz=timezone.utc).strftime('%d.%m.%Y %H:%M UTC')
+                            time_str = _format_ts_utc(int(time_modified_ts))
                         except Exception as dt_err:
-                            print(f"Помилка форматування дати {time_modified_ts}: {dt_err}")
+                            bad_dates.append((time_modified_ts, dt_err))
                             time_str = f"Timestamp: {time_modified_ts}"
                     
-                    result_lines.append(f"\n  - Студент: {user_name} (ID: {user_id})")
-                    result_lines.append(f"    {status_text}")
-                    result_lines.append(f"    Останнє оновлення: {time_str}")
-                    
-                    if "plugins" in submission:
-                        for plugin in submission["plugins"]:
-                            if plugin.get("type") == "comments" and "editorfields" in plugin:
-                                for field in plugin["editorfields"]:
-                                    if field.get("text"):
-                                        result_lines.append(f"    Коментар: {field['text']}")
-                            elif plugin.get("type") == "file" and "fileareas" in plugin:
-                                for area in plugin["fileareas"]:
-                                    if area.get("files"):
-                                        files_str = ", ".join([f.get('filename', 'N/A') for f in area["files"]])
-                                        result_lines.append(f"    Файли: {files_str}")
+                    detail_buf = io.StringIO()
+                    detail_buf.write(f"\n    {status_text}\n    Останнє оновлення: {time_str}")
+                    for plugin in submission.get("plugins", ()):
+                        handler = _PLUGIN_HANDLERS.get(plugin.get("type"))
+                        if handler:
+                            handler(plugin, detail_buf)
+                    details.append(detail_buf.getvalue())
+                
+                if users_task is not None:
+                    user_info_map.update(await users_task)
+                
+                # Текст збирається в одному буфері замість списку коротких рядків
+                buf = io.StringIO()
+                buf.write(f"Завдання: {assignment_name}")
+                for submission, detail in zip(submissions, details):
+                    user_id = submission.get("userid")
+                    user_name = f"ID: {user_id}"
+                    if user_id in user_info_map:
+                        user_name = user_info_map[user_id].get("fullname", user_name)
+                    buf.write(f"\n\n  - Студент: {user_name} (ID: {user_id})")
+                    buf.write(detail)
                 
-                print(f"Здані роботи для завдання {assignment_id} отримані.")
-                return "\n".join(result_lines)
+                if bad_dates:
+                    log.error("Помилка форматування %s дат зданих робіт (перша: %s: %s)", len(bad_dates), *bad_dates[0])
+                log.debug("Здані роботи для завдання %s отримані.", assignment_id)
+                return buf.getvalue()
             else:
                 error_msg = f"Помилка API при отриманні зданих робіт: {data}"
-                print(error_msg)
+                log.error(error_msg)
                 return error_msg
         except Exception as e:
             error_msg = f"Критична помилка при отриманні зданих робіт: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
     async def create_announcement(self, subject: str, message: str) -> str:
@@ -933,38 +1364,19 @@ class TeacherDashboard:
         if not subject or not message:
             return "Будь ласка, введіть тему та текст оголошення."
         
-        forum_id = None
+        forum_id = self._announce_forum_cache.get(self.selected_course)
         try:
-            print(f"Пошук форуму оголошень для курсу ID: {self.selected_course}")
-            success_cont, course_data = await self.auth._call_api("core_course_get_contents", {
-                "courseid": self.selected_course
-            })
-            
-            if not success_cont:
-                return f"Помилка отримання вмісту курсу для пошуку форуму: {course_data}"
-            
-            if course_data and isinstance(course_data, list):
-                for section in course_data:
-                    is_general_section = section.get('id') == 0 or 'general' in section.get('name', '').lower()
-                    if not is_general_section:
-                        continue
-                    
-                    for module in section.get("modules", []):
-                        is_news_forum = module.get('modname') == 'forum' and module.get('id') == course_data[0].get('newsitems', [{}])[0].get('id')
-                        is_announcement_by_name = module.get('modname') == 'forum' and ('оголошення' in module.get('name', '').lower() or 'news forum' in module.get('name', '').lower())
-                        
-                        if is_news_forum or is_announcement_by_name:
-                            forum_id = module.get("instance")
-                            print(f"Знайдено форум оголошень ID: {forum_id}")
-                            break
-                    if forum_id:
-                        break
+            if forum_id is None:
+                forum_id = await self._find_announcement_forum()
+                if isinstance(forum_id, str):
+                    return forum_id
             
             if not forum_id:
-                print(f"Форум оголошень не знайдено автоматично в курсі ID: {self.selected_course}")
+                log.warning("Форум оголошень не знайдено автоматично в курсі ID: %s", self.selected_course)
                 return "Не вдалося автоматично знайти форум оголошень у цьому курсі. Можливо, він має нестандартну назву або структуру."
+            self._announce_forum_cache[self.selected_course] = forum_id
             
-            print(f"Створення оголошення у форумі ID: {forum_id}")
+            log.debug("Створення оголошення у форумі ID: %s", forum_id)
             success_add, data_add = await self.auth._call_api("mod_forum_add_discussion", {
                 "forumid": forum_id,
                 "subject": subject.strip(),
@@ -977,11 +1389,13 @@ class TeacherDashboard:
             
             if success_add and data_add.get('discussionid'):
                 disc_id = data_add['discussionid']
-                print(f"Оголошення успішно створено! ID: {disc_id}")
+                log.info("Оголошення успішно створено! ID: %s", disc_id)
                 return f"Оголошення успішно створено! ID обговорення: {disc_id}"
             else:
+                # Форум міг бути видалений або змінений — наступна спроба знайде його заново
+                self._announce_forum_cache.pop(self.selected_course, None)
                 error_msg = f"Помилка API при створенні оголошення: {data_add}"
-                print(error_msg)
+                log.error(error_msg)
                 if isinstance(data_add, dict):
                     if data_add.get("errorcode") == "cannotcreatediscussion":
                         return "Помилка: Недостатньо прав для створення обговорення в цьому форумі."
@@ -990,11 +1404,112 @@ class TeacherDashboard:
                 return error_msg
         except Exception as e:
             error_msg = f"Критична помилка при створенні оголошення: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
+    async def _find_announcement_forum(self) -> Union[int, str, None]:
+        """Пошук форуму оголошень обраного курсу (рядок з помилкою, якщо вміст курсу не отримано)."""
+        log.debug("Пошук форуму оголошень для курсу ID: %s", self.selected_course)
+        # Moodle явно позначає форум оголошень типом 'news' — один запит замість перебору розділів
+        success_forums, forums_data = await self.auth._call_api("mod_forum_get_forums_by_courses", {
+            "courseids[0]": self.selected_course
+        })
+        if success_forums and isinstance(forums_data, list):
+            forum_id = next((f.get("id") for f in forums_data if f.get("type") == "news"), None)
+            if forum_id:
+                log.debug("Знайдено форум оголошень ID: %s", forum_id)
+                return forum_id
+        
+        # Резервний пошук за назвою у вмісті курсу
+        success_cont, course_data = await self._fetch_course_contents(self.selected_course)
+        
+        if not success_cont:
+            return f"Помилка отримання вмісту курсу для пошуку форуму: {course_data}"
+        
+        if not course_data or not isinstance(course_data, list):
+            return None
+        
+        # Форуми загального розділу курсу (назви приводяться до нижнього регістру один раз)
+        forums = [
+            (module.get("instance"), (module.get("name") or "").lower())
+            for section in course_data
+            if section.get("id") == 0 or "general" in (section.get("name") or "").lower()
+            for module in section.get("modules", [])
+            if module.get("modname") == "forum"
+        ]
+        # Перевага форуму з назвою оголошень, інакше перший форум загального розділу
+        forum_id = next(
+            (instance for instance, name in forums if "оголошення" in name or "news forum" in name),
+            forums[0][0] if forums else None
+        )
+        if forum_id:
+            log.debug("Знайдено форум оголошень ID: %s", forum_id)
+        
+        return forum_id
+    
+    async def _fetch_course_log_page(self, course_id: int, page: int) -> Tuple[bool, Any]:
+        """Одна сторінка логу курсу за весь час."""
+        return await self.auth._call_api("report_log_get_course_log", {
+            "courseid": course_id,
+            "enddate": 0,  # 0 означає "до теперішнього часу"
+            "startdate": 0,  # Від початку курсу
+            "page": page,
+            "perpage": COURSE_LOG_PAGE_SIZE
+        })
+    
+    async def _iter_course_log(self, course_id: int, first_page: Dict, status: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict]:
+        """Записи логу курсу з усіх сторінок, починаючи з уже отриманої першої.
+        
+        Якщо сервер повідомляє total, решта сторінок завантажується паралельно (з обмеженням),
+        інакше - послідовно, доки не прийде неповна сторінка. Сторінки з помилкою пропускаються.
+        Якщо лог довший за COURSE_LOG_MAX_PAGES сторінок, у status["truncated_at"] записується
+        кількість прочитаних записів.
+        """
+        logs = first_page.get("logs") or []
+        for entry in logs:
+            yield entry
+        if len(logs) < COURSE_LOG_PAGE_SIZE:
+            return
+        
+        total = first_page.get("total")
+        if isinstance(total, int):
+            n_pages = min(-(-total // COURSE_LOG_PAGE_SIZE), COURSE_LOG_MAX_PAGES)
+            if total > n_pages * COURSE_LOG_PAGE_SIZE:
+                self._report_course_log_truncated(course_id, n_pages, status, total)
+            pages = await gather_bounded(
+                (self._fetch_course_log_page(course_id, page) for page in range(1, n_pages)),
+                COURSE_LOG_CONCURRENCY
+            )
+            for page, result in enumerate(pages, start=1):
+                if isinstance(result, BaseException) or not result[0] or not isinstance(result[1], dict):
+                    log.warning("Не вдалося отримати сторінку %s логу курсу %s: %s", page, course_id,
+                                result if isinstance(result, BaseException) else result[1])
+                    continue
+                for entry in result[1].get("logs") or []:
+                    yield entry
+            return
+        
+        for page in range(1, COURSE_LOG_MAX_PAGES):
+            success, data = await self._fetch_course_log_page(course_id, page)
+            if not success or not isinstance(data, dict):
+                log.warning("Не вдалося отримати сторінку %s логу курсу %s: %s", page, course_id, data)
+                return
+            logs = data.get("logs") or []
+            for entry in logs:
+                yield entry
+            if len(logs) < COURSE_LOG_PAGE_SIZE:
+                return
+        self._report_course_log_truncated(course_id, COURSE_LOG_MAX_PAGES, status)
+    
+    @staticmethod
+    def _report_course_log_truncated(course_id: int, n_pages: int, status: Optional[Dict[str, Any]], total: Optional[int] = None) -> None:
+        """Попередження про те, що прочитано лише перші n_pages сторінок логу курсу."""
+        read = n_pages * COURSE_LOG_PAGE_SIZE
+        log.warning("Лог курсу %s обрізано до перших %s записів (всього: %s)", course_id, read,
+                    total if total is not None else "невідомо")
+        if status is not None:
+            status["truncated_at"] = read
+    
     async def analyze_student_activity(self) -> str:
         """Аналіз активності студентів у курсі."""
         if not self.auth.token:
@@ -1003,72 +1518,69 @@ class TeacherDashboard:
             return "Будь ласка, спочатку виберіть курс."
         
         try:
-            print(f"Аналіз активності студентів для курсу ID: {self.selected_course}")
-            # Отримання списку студентів, якщо він ще не завантажений
-            if not self.students:
-                success, data = await self.auth._call_api("core_enrol_get_enrolled_users", {
-                    "courseid": self.selected_course
-                })
-                if success:
-                    self.students = [user for user in data if user.get('id') and any(role.get('shortname') == 'student' for role in user.get('roles', []))]
-                else:
-                    return f"Помилка отримання списку студентів: {data}"
+            log.debug("Аналіз активності студентів для курсу ID: %s", self.selected_course)
+            # Лише активні записи з полями id, fullname, email, roles (та ж кешована відповідь, що й для вкладки студентів).
+            # Список студентів перебудовується, лише якщо кеш повернув нову відповідь (оновлення або інший курс)
+            success, data = await self._fetch_enrolled_users(self.selected_course)
+            if not success:
+                return f"Помилка отримання списку студентів: {data}"
+            if data is not self._students_source:
+                self.students = [user for user in data if _is_student(user)]
+                self._students_source = data
             
             if not self.students:
                 return "Студентів не знайдено в цьому курсі."
             
-            # Отримання логів активності для курсу
-            success_logs, logs_data = await self.auth._call_api("report_log_get_course_log", {
-                "courseid": self.selected_course,
-                "enddate": 0,  # 0 означає "до теперішнього часу"
-                "startdate": 0,  # Від початку курсу
-                "page": 0,
-                "perpage": 1000  # Обмеження кількості записів
-            })
+            # Перша сторінка логів активності курсу (з неї відомо загальну кількість записів)
+            success_logs, logs_data = await self._fetch_course_log_page(self.selected_course, 0)
             
             if not success_logs:
                 return f"Помилка отримання логів активності: {logs_data}"
             
+            # Індекс студентів за ID: перевірка і пошук імені для кожного запису логу за O(1)
+            students_by_id = {str(student['id']): student for student in self.students if student.get('id')}
+            
             # Аналіз активності
             student_activities = {}
-            for log in logs_data.get("logs", []):
-                user_id = log.get("userid")
+            log_status: Dict[str, Any] = {}
+            async for entry in self._iter_course_log(self.selected_course, logs_data, log_status):
+                user_id = entry.get("userid")
                 if not user_id:
                     continue
                 
                 # Перевіряємо, чи це студент
-                if not any(str(student.get('id')) == str(user_id) for student in self.students):
+                student = students_by_id.get(str(user_id))
+                if student is None:
                     continue
                 
                 if user_id not in student_activities:
-                    student_name = next((student.get('fullname', f'ID: {user_id}') for student in self.students if str(student.get('id')) == str(user_id)), f'ID: {user_id}')
+                    student_name = student.get('fullname', f'ID: {user_id}')
                     student_activities[user_id] = {
                         "name": student_name,
                         "total_actions": 0,
                         "last_access": 0,
-                        "actions": {}
+                        "actions": defaultdict(int)
                     }
                 
                 # Додаємо активність
                 student_activities[user_id]["total_actions"] += 1
                 
                 # Оновлюємо час останнього доступу
-                timestamp = log.get("timecreated", 0)
+                timestamp = entry.get("timecreated", 0)
                 if timestamp > student_activities[user_id]["last_access"]:
                     student_activities[user_id]["last_access"] = timestamp
                 
                 # Рахуємо типи дій
-                action = log.get("action", "unknown")
-                if action not in student_activities[user_id]["actions"]:
-                    student_activities[user_id]["actions"][action] = 0
-                student_activities[user_id]["actions"][action] += 1
+                student_activities[user_id]["actions"][entry.get("action", "unknown")] += 1
             
             # Формуємо звіт
             if not student_activities:
                 return "Активність студентів не знайдена в логах курсу."
             
-            report_lines = [f"Аналіз активності студентів у курсі '{self.selected_course_name or self.selected_course}'"]
-            report_lines.append("")
+            buf = io.StringIO()
+            w = buf.write
+            w(f"Аналіз активності студентів у курсі '{self.selected_course_name or self.selected_course}'\n")
+            w("\n")
             
             # Сортуємо студентів за кількістю дій (найактивніші спочатку)
             sorted_students = sorted(
@@ -1081,43 +1593,38 @@ class TeacherDashboard:
                 # Форматуємо час останнього доступу
                 last_access_str = "Ніколи"
                 if student["last_access"] > 0:
-                    from datetime import datetime
-                    last_access_str = datetime.fromtimestamp(student["last_access"]).strftime('%d.%m.%Y %H:%M')
+                    last_access_str = _format_ts_local(int(student["last_access"]))
                 
-                report_lines.append(f"Студент: {student['name']}")
-                report_lines.append(f"Загальна кількість дій: {student['total_actions']}")
-                report_lines.append(f"Останній доступ: {last_access_str}")
+                w(f"Студент: {student['name']}\n")
+                w(f"Загальна кількість дій: {student['total_actions']}\n")
+                w(f"Останній доступ: {last_access_str}\n")
                 
                 # Топ-3 найчастіших дій
                 if student["actions"]:
-                    top_actions = sorted(
-                        student["actions"].items(),
-                        key=lambda x: x[1],
-                        reverse=True
-                    )[:3]
+                    top_actions = heapq.nlargest(3, student["actions"].items(), key=itemgetter(1))
                     
-                    report_lines.append("Найчастіші дії:")
+                    w("Найчастіші дії:\n")
                     for action, count in top_actions:
-                        report_lines.append(f"- {action}: {count}")
+                        w(f"- {action}: {count}\n")
                 
-                report_lines.append("")
+                w("\n")
             
             # Додаємо загальну статистику
             total_actions = sum(student["total_actions"] for student in student_activities.values())
             avg_actions = total_actions / len(student_activities) if student_activities else 0
             
-            report_lines.append("Загальна статистика:")
-            report_lines.append(f"Всього студентів: {len(self.students)}")
-            report_lines.append(f"Активних студентів: {len(student_activities)}")
-            report_lines.append(f"Загальна кількість дій: {total_actions}")
-            report_lines.append(f"Середня кількість дій на студента: {avg_actions:.2f}")
+            w("Загальна статистика:\n")
+            w(f"Всього студентів: {len(self.students)}\n")
+            w(f"Активних студентів: {len(student_activities)}\n")
+            w(f"Загальна кількість дій: {total_actions}\n")
+            w(f"Середня кількість дій на студента: {avg_actions:.2f}\n")
+            if "truncated_at" in log_status:
+                w(f"\nПримітка: аналіз базується на перших {log_status['truncated_at']} записах логу курсу.\n")
             
-            return "\n".join(report_lines)
+            return buf.getvalue().removesuffix("\n")
         except Exception as e:
             error_msg = f"Критична помилка при аналізі активності студентів: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
     async def get_grades_statistics(self) -> str:
@@ -1128,10 +1635,12 @@ class TeacherDashboard:
             return "Будь ласка, спочатку виберіть курс."
         
         try:
-            print(f"Отримання статистики оцінювання для курсу ID: {self.selected_course}")
-            success, data = await self.auth._call_api("gradereport_user_get_grade_items", {
-                "courseid": self.selected_course
-            })
+            log.debug("Отримання статистики оцінювання для курсу ID: %s", self.selected_course)
+            course_id = self.selected_course
+            success, data = await self._cached_call(
+                ("gradereport_user_get_grade_items", ("course", course_id)), GRADES_CACHE_TTL,
+                lambda: self.auth._call_api("gradereport_user_get_grade_items", {"courseid": course_id})
+            )
             
             if not success:
                 return f"Помилка отримання оцінок: {data}"
@@ -1139,8 +1648,8 @@ class TeacherDashboard:
             if "usergrades" not in data or not data["usergrades"]:
                 return "Оцінки не знайдені для цього курсу."
             
-            # Словник для зберігання статистики за кожним елементом оцінювання
-            grade_stats = {}
+            # Оцінки за кожним елементом оцінювання (статистика рахується після збору)
+            grades_by_item: Dict[str, List[float]] = {}
             
             # Проходимо по всіх оцінках
             for usergrade in data["usergrades"]:
@@ -1157,71 +1666,55 @@ class TeacherDashboard:
                     if grade_value is None:
                         continue
                     
-                    if item_name not in grade_stats:
-                        grade_stats[item_name] = {
-                            "sum": 0,
-                            "count": 0,
-                            "max": float("-inf"),
-                            "min": float("inf"),
-                            "grades": []
-                        }
-                    
-                    # Додаємо оцінку до статистики
-                    grade_stats[item_name]["sum"] += grade_value
-                    grade_stats[item_name]["count"] += 1
-                    grade_stats[item_name]["max"] = max(grade_stats[item_name]["max"], grade_value)
-                    grade_stats[item_name]["min"] = min(grade_stats[item_name]["min"], grade_value)
-                    grade_stats[item_name]["grades"].append(grade_value)
+                    grades_by_item.setdefault(item_name, []).append(grade_value)
             
             # Формуємо звіт
-            if not grade_stats:
+            if not grades_by_item:
                 return "Статистика оцінювання недоступна для цього курсу."
             
-            report_lines = [f"Статистика оцінювання для курсу '{self.selected_course_name or self.selected_course}'"]
-            report_lines.append("")
-            
-            for item_name, stats in grade_stats.items():
-                if stats["count"] == 0:
-                    continue
-                
-                avg_grade = stats["sum"] / stats["count"]
-                
-                # Медіана
-                median = 0
-                if stats["grades"]:
-                    sorted_grades = sorted(stats["grades"])
-                    n = len(sorted_grades)
-                    if n % 2 == 0:
-                        median = (sorted_grades[n//2 - 1] + sorted_grades[n//2]) / 2
-                    else:
-                        median = sorted_grades[n//2]
+            buf = io.StringIO()
+            w = buf.write
+            w(f"Статистика оцінювання для курсу '{self.selected_course_name or self.selected_course}'\n")
+            w("\n")
+            
+            total_grade_count = 0
+            total_grade_sum = 0.0
+            for item_name, grades in grades_by_item.items():
+                # Середнє, медіана, максимум і мінімум рахуються векторно numpy
+                arr = np.fromiter(grades, dtype=np.float64, count=len(grades))
+                total_grade_count += arr.size
+                total_grade_sum += arr.sum()
                 
-                report_lines.append(f"Елемент оцінювання: {item_name}")
-                report_lines.append(f"Кількість оцінок: {stats['count']}")
-                report_lines.append(f"Середня оцінка: {avg_grade:.2f}")
-                report_lines.append(f"Медіана: {median:.2f}")
-                report_lines.append(f"Максимальна оцінка: {stats['max']}")
-                report_lines.append(f"Мінімальна оцінка: {stats['min']}")
-                report_lines.append("")
+                w(f"Елемент оцінювання: {item_name}\n")
+                w(f"Кількість оцінок: {arr.size}\n")
+                w(f"Середня оцінка: {arr.mean():.2f}\n")
+                w(f"Медіана: {np.median(arr):.2f}\n")
+                w(f"Максимальна оцінка: {max(grades)}\n")
+                w(f"Мінімальна оцінка: {min(grades)}\n")
+                w("\n")
             
             # Загальна статистика курсу
-            total_grade_count = sum(stats["count"] for stats in grade_stats.values())
-            total_grade_sum = sum(stats["sum"] for stats in grade_stats.values())
             avg_course_grade = total_grade_sum / total_grade_count if total_grade_count > 0 else 0
             
-            report_lines.append("Загальна статистика курсу:")
-            report_lines.append(f"Всього елементів оцінювання: {len(grade_stats)}")
-            report_lines.append(f"Всього виставлених оцінок: {total_grade_count}")
-            report_lines.append(f"Середня оцінка по курсу: {avg_course_grade:.2f}")
+            w("Загальна статистика курсу:\n")
+            w(f"Всього елементів оцінювання: {len(grades_by_item)}\n")
+            w(f"Всього виставлених оцінок: {total_grade_count}\n")
+            w(f"Середня оцінка по курсу: {avg_course_grade:.2f}\n")
             
-            return "\n".join(report_lines)
+            return buf.getvalue().removesuffix("\n")
         except Exception as e:
             error_msg = f"Критична помилка при отриманні статистики оцінювання: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
+    async def _ensure_assignments_loaded(self, ttl: float = ASSIGNMENTS_REUSE_TTL) -> None:
+        """Завантаження завдань обраного курсу, якщо список не завантажено, він іншого курсу або старший за ttl."""
+        if (self.assignments and self._assignments_course == self.selected_course
+                and time.monotonic() - self._assignments_ts < ttl):
+            return
+        async for _ in self.get_course_assignments():
+            pass
+    
     async def generate_report(self, report_type: str) -> str:
         """Генерація звіту вибраного типу для курсу."""
         if not self.auth.token:
@@ -1230,108 +1723,127 @@ class TeacherDashboard:
             return "Будь ласка, спочатку виберіть курс."
         
         try:
-            print(f"Генерація звіту типу '{report_type}' для курсу ID: {self.selected_course}")
+            log.debug("Генерація звіту типу '%s' для курсу ID: %s", report_type, self.selected_course)
             
             # Отримання базової інформації про курс
             course_name = self.selected_course_name or f"ID: {self.selected_course}"
-            report_lines = [f"Звіт для курсу '{course_name}'"]
-            report_lines.append(f"Тип звіту: {report_type}")
-            report_lines.append(f"Дата створення: {self._get_current_datetime()}")
-            report_lines.append("")
+            buf = io.StringIO()
+            w = buf.write
+            w(f"Звіт для курсу '{course_name}'\n")
+            w(f"Тип звіту: {report_type}\n")
+            w(f"Дата створення: {self._get_current_datetime()}\n")
+            w("\n")
+            
+            # Дані для всіх розділів звіту не залежать одне від одного, тому запитуються паралельно
+            pending = {}
+            if report_type == "general" or report_type == "full":
+                pending["course"] = self._fetch_course(self.selected_course)
+                pending["contents"] = self._fetch_course_contents(self.selected_course)
+            if report_type == "activity" or report_type == "full":
+                pending["activity"] = self.analyze_student_activity()
+            if report_type == "assignments" or report_type == "full":
+                pending["assignments"] = self._ensure_assignments_loaded()
+                pending["grades"] = self.get_grades_statistics()
+            results = dict(zip(pending, await asyncio.gather(*pending.values(), return_exceptions=True)))
+            for name, result in results.items():
+                if isinstance(result, BaseException):
+                    log.error("Помилка отримання даних '%s' для звіту: %s", name, result)
+                    results[name] = (False, result) if name in ("course", "contents") else f"Помилка: {result}"
             
             # Генерація звіту в залежності від типу
             if report_type == "general" or report_type == "full":
-                # Загальна інформація про курс
-                success, course_data = await self.auth._call_api("core_course_get_courses", {
-                    "options[ids][0]": self.selected_course
-                })
+                success, course_data = results["course"]
+                success_contents, contents_data = results["contents"]
                 
                 if success and course_data:
                     course = course_data[0]
-                    report_lines.append("## Інформація про курс")
-                    report_lines.append(f"Повна назва: {course.get('fullname', 'N/A')}")
-                    report_lines.append(f"Коротка назва: {course.get('shortname', 'N/A')}")
-                    report_lines.append(f"Категорія: {course.get('categoryname', 'N/A')}")
+                    w("## Інформація про курс\n")
+                    w(f"Повна назва: {course.get('fullname', 'N/A')}\n")
+                    w(f"Коротка назва: {course.get('shortname', 'N/A')}\n")
+                    w(f"Категорія: {course.get('categoryname', 'N/A')}\n")
                     
                     # Кількість розділів і елементів
-                    success_contents, contents_data = await self.auth._call_api("core_course_get_contents", {
-                        "courseid": self.selected_course
-                    })
-                    
                     if success_contents:
                         section_count = len(contents_data)
-                        module_count = sum(len(section.get("modules", [])) for section in contents_data)
                         
-                        module_types = {}
-                        for section in contents_data:
-                            for module in section.get("modules", []):
-                                mod_type = module.get("modname", "unknown")
-                                if mod_type not in module_types:
-                                    module_types[mod_type] = 0
-                                module_types[mod_type] += 1
+                        # Один прохід по елементах курсу: гістограма типів, а з неї - загальна кількість
+                        module_types = Counter(
+                            module.get("modname", "unknown")
+                            for section in contents_data
+                            for module in section.get("modules", [])
+                        )
+                        module_count = sum(module_types.values())
                         
-                        report_lines.append(f"Кількість розділів: {section_count}")
-                        report_lines.append(f"Кількість елементів: {module_count}")
-                        report_lines.append("Типи елементів:")
-                        for mod_type, count in module_types.items():
-                            report_lines.append(f"- {mod_type}: {count}")
+                        w(f"Кількість розділів: {section_count}\n")
+                        w(f"Кількість елементів: {module_count}\n")
+                        w("Типи елементів:\n")
+                        # Найпоширеніші типи першими
+                        buf.writelines(f"- {mod_type}: {count}\n" for mod_type, count in module_types.most_common())
                     
                     # Кількість студентів
                     student_count = len(self.students) if self.students else "Не завантажено"
-                    report_lines.append(f"Кількість студентів: {student_count}")
+                    w(f"Кількість студентів: {student_count}\n")
                     
-                    report_lines.append("")
+                    w("\n")
             
             if report_type == "activity" or report_type == "full":
                 # Інформація про активність студентів
-                activity_report = await self.analyze_student_activity()
-                report_lines.append("## Активність студентів")
-                report_lines.append(activity_report)
-                report_lines.append("")
+                w("## Активність студентів\n")
+                w(results["activity"])
+                w("\n")
+                w("\n")
             
             if report_type == "assignments" or report_type == "full":
                 # Інформація про завдання і статистика оцінювання
-                report_lines.append("## Завдання та оцінювання")
-                
-                # Завантажуємо завдання, якщо ще не завантажені
-                if not self.assignments:
-                    await self.get_course_assignments()
+                w("## Завдання та оцінювання\n")
                 
                 if self.assignments:
-                    report_lines.append(f"Всього завдань: {len(self.assignments)}")
-                    report_lines.append("Список завдань:")
-                    for assignment in self.assignments:
-                        report_lines.append(f"- {assignment.get('name')} (ID: {assignment.get('id')})")
-                        report_lines.append(f"  Термін здачі: {assignment.get('duedate')}")
-                        report_lines.append(f"  Зданих робіт: {assignment.get('submissions')}")
+                    w(f"Всього завдань: {len(self.assignments)}\n")
+                    w("Список завдань:\n")
+                    # Поля розпаковуються однією C-функцією _ASSIGNMENT_ROW (id, назва, термін, здані роботи)
+                    buf.writelines(
+                        f"- {name} (ID: {assignment_id})\n"
+                        f"  Термін здачі: {due_date}\n"
+                        f"  Зданих робіт: {submissions}\n"
+                        for assignment_id, name, due_date, submissions in map(_ASSIGNMENT_ROW, self.assignments)
+                    )
                 else:
-                    report_lines.append("Завдання не знайдені або не завантажені.")
+                    w("Завдання не знайдені або не завантажені.\n")
                 
                 # Додаємо статистику оцінювання
-                grades_stats = await self.get_grades_statistics()
-                report_lines.append("")
-                report_lines.append("### Статистика оцінювання")
-                report_lines.append(grades_stats)
+                w("\n")
+                w("### Статистика оцінювання\n")
+                w(results["grades"])
+                w("\n")
             
-            return "\n".join(report_lines)
+            return buf.getvalue().removesuffix("\n")
         except Exception as e:
             error_msg = f"Критична помилка при генерації звіту: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
+    @staticmethod
+    def _validate(*checks: Tuple[Any, str]) -> Optional[str]:
+        """Повідомлення першої невиконаної умови з пар (умова, повідомлення) або None, якщо всі виконані."""
+        return next((message for condition, message in checks if not condition), None)
+    
+    def _create_preflight(self, name: Any, name_message: str, *checks: Tuple[Any, str]) -> Optional[str]:
+        """Перевірка перед створенням вмісту курсу: автентифікація, обраний курс, назва та додаткові умови."""
+        return self._validate(
+            (self.auth.token, "Помилка: Не автентифіковано."),
+            (self.selected_course, "Будь ласка, спочатку виберіть курс."),
+            (name, name_message),
+            *checks
+        )
+    
     async def create_course_section(self, section_name: str, section_desc: str) -> str:
         """Створення нового розділу в курсі."""
-        if not self.auth.token:
-            return "Помилка: Не автентифіковано."
-        if not self.selected_course:
-            return "Будь ласка, спочатку виберіть курс."
-        if not section_name:
-            return "Будь ласка, введіть назву розділу."
+        error = self._create_preflight(section_name, "Будь ласка, введіть назву розділу.")
+        if error:
+            return error
         
         try:
-            print(f"Створення нового розділу '{section_name}' в курсі ID: {self.selected_course}")
+            log.debug("Створення нового розділу '%s' в курсі ID: %s", section_name, self.selected_course)
             success, data = await self.auth._call_api("core_course_edit_section", {
                 "courseid": self.selected_course,
                 "sectionid": 0,  # 0 означає створення нового розділу
@@ -1341,128 +1853,82 @@ class TeacherDashboard:
             })
             
             if success:
+                # Вміст курсу змінився, тому кешовані відповіді для нього застаріли
+                await self._invalidate_course_cache(self.selected_course)
                 section_id = data.get("sectionid")
                 if section_id:
-                    print(f"Розділ успішно створено! ID: {section_id}")
+                    log.info("Розділ успішно створено! ID: %s", section_id)
                     return f"Розділ '{section_name}' успішно створено! ID: {section_id}"
                 else:
                     return "Розділ створено, але не вдалося отримати його ID."
             else:
                 error_msg = f"Помилка API при створенні розділу: {data}"
-                print(error_msg)
+                log.error(error_msg)
                 if isinstance(data, dict) and data.get("message"):
                     return f"Помилка створення розділу: {data['message']}"
                 return error_msg
         except Exception as e:
             error_msg = f"Критична помилка при створенні розділу: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
     async def create_course_module(self, module_type: str, module_name: str, module_desc: str, section_id: int) -> str:
         """Створення нового елемента в розділі курсу."""
-        if not self.auth.token:
-            return "Помилка: Не автентифіковано."
-        if not self.selected_course:
-            return "Будь ласка, спочатку виберіть курс."
-        if not module_name:
-            return "Будь ласка, введіть назву елемента."
-        if section_id is None:
-            return "Будь ласка, вкажіть ID розділу."
+        error = self._create_preflight(
+            module_name, "Будь ласка, введіть назву елемента.",
+            (section_id is not None, "Будь ласка, вкажіть ID розділу.")
+        )
+        if error:
+            return error
         
         try:
-            print(f"Створення нового елемента '{module_name}' типу '{module_type}' в розділі ID: {section_id}")
-            
-            # Різні типи модулів потребують різних API-викликів
-            if module_type == "assign":
-                # Створення завдання
-                success, data = await self.auth._call_api("mod_assign_add_assignment", {
-                    "coursemodule": 0,
-                    "course": self.selected_course,
-                    "name": module_name,
-                    "intro": module_desc,
-                    "introformat": 1,  # 1 = HTML
-                    "duedate": 0,  # 0 = без терміну
-                    "section": section_id,
-                    "visible": 1,  # 1 = видимий
-                    "grade": 100  # Максимальна оцінка
-                })
-            elif module_type == "resource":
-                # Створення файла (потребує додаткового API для завантаження файлу)
-                success, data = await self.auth._call_api("core_course_add_mod_resource", {
-                    "coursemodule": 0,
-                    "course": self.selected_course,
-                    "name": module_name,
-                    "intro": module_desc,
-                    "introformat": 1,
-                    "section": section_id,
-                    "visible": 1
-                })
-            elif module_type == "page":
-                # Створення сторінки
-                success, data = await self.auth._call_api("core_course_add_mod_page", {
-                    "coursemodule": 0,
-                    "course": self.selected_course,
-                    "name": module_name,
-                    "intro": module_desc,
-                    "introformat": 1,
-                    "content": module_desc,
-                    "contentformat": 1,
-                    "section": section_id,
-                    "visible": 1
-                })
-            elif module_type == "url":
-                # Створення URL-посилання
-                success, data = await self.auth._call_api("core_course_add_mod_url", {
-                    "coursemodule": 0,
-                    "course": self.selected_course,
-                    "name": module_name,
-                    "intro": module_desc,
-                    "introformat": 1,
-                    "externalurl": "https://example.com",  # Тут треба вказати реальну URL
-                    "section": section_id,
-                    "visible": 1
-                })
-            elif module_type == "forum":
-                # Створення форуму
-                success, data = await self.auth._call_api("core_course_add_mod_forum", {
-                    "coursemodule": 0,
-                    "course": self.selected_course,
-                    "name": module_name,
-                    "intro": module_desc,
-                    "introformat": 1,
-                    "section": section_id,
-                    "visible": 1
-                })
-            else:
+            log.debug("Створення нового елемента '%s' типу '%s' в розділі ID: %s", module_name, module_type, section_id)
+            
+            # Різні типи модулів потребують різних API-викликів зі спільною основою параметрів
+            spec = _MODULE_SPECS.get(module_type)
+            if spec is None:
                 return f"Непідтримуваний тип елемента: {module_type}"
+            function, extra = spec
+            params = {
+                "coursemodule": 0,
+                "course": self.selected_course,
+                "name": module_name,
+                "intro": module_desc,
+                "introformat": 1,  # 1 = HTML
+                "section": section_id,
+                "visible": 1,  # 1 = видимий
+            }
+            for field, value in extra.items():
+                params[field] = module_desc if value is None else value
+            success, data = await self.auth._call_api(function, params)
             
             if success:
+                await self._invalidate_course_cache(self.selected_course)
                 module_id = data.get("moduleinfo", {}).get("id") or data.get("id")
                 if module_id:
-                    print(f"Елемент успішно створено! ID: {module_id}")
+                    log.info("Елемент успішно створено! ID: %s", module_id)
                     return f"Елемент '{module_name}' типу '{module_type}' успішно створено! ID: {module_id}"
                 else:
                     return "Елемент створено, але не вдалося отримати його ID."
             else:
                 error_msg = f"Помилка API при створенні елемента: {data}"
-                print(error_msg)
+                log.error(error_msg)
                 if isinstance(data, dict) and data.get("message"):
                     return f"Помилка створення елемента: {data['message']}"
                 return error_msg
         except Exception as e:
             error_msg = f"Критична помилка при створенні елемента: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
     async def init_provider_callback(self, provider_name: str) -> str:
         """Ініціалізація вибраного LLM провайдера."""
         try:
-            print(f"Ініціалізація LLM провайдера: {provider_name}")
-            self.llm_provider = await LLMProviderFactory.create_provider(provider_name)
+            log.debug("Ініціалізація LLM провайдера: %s", provider_name)
+            # Повторні натискання під час ініціалізації чекають на той самий виклик фабрики
+            self.llm_provider = await self._once(
+                ("llm_provider", provider_name), lambda: LLMProviderFactory.create_provider(provider_name)
+            )
             
             if self.llm_provider:
                 return f"Провайдер '{provider_name}' успішно ініціалізовано."
@@ -1470,29 +1936,33 @@ class TeacherDashboard:
                 return f"Помилка: Не вдалося ініціалізувати провайдера '{provider_name}'. Перевірте налаштування API ключа."
         except Exception as e:
             error_msg = f"Помилка ініціалізації провайдера: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
     
-    async def send_message(self, message: str) -> Tuple[List[Tuple[str, str]], str]:
-        """Відправка повідомлення до LLM та отримання відповіді."""
+    async def send_message(self, message: str) -> AsyncIterator[Tuple[List[Tuple[str, str]], str]]:
+        """Відправка повідомлення до LLM; відповідь передається в чат потоком у міру надходження."""
         if not message or message.strip() == "":
-            return self.messages, ""
+            yield list(self.messages), ""
+            return
         
         # Автоматична ініціалізація LLM провайдера
         if not self.llm_provider:
             try:
-                print("Автоматична ініціалізація LLM провайдера (Claude)")
-                self.llm_provider = await LLMProviderFactory.create_provider("claude")
+                log.debug("Автоматична ініціалізація LLM провайдера (Claude)")
+                # Одночасні повідомлення ініціалізують провайдера один раз
+                provider = await self._once(("llm_provider", "claude"), lambda: LLMProviderFactory.create_provider("claude"))
+                # Провайдер, вибраний користувачем поки йшло очікування, має перевагу
+                self.llm_provider = self.llm_provider or provider
                 if not self.llm_provider:
                     error_msg = "Помилка: Не вдалося ініціалізувати LLM провайдера."
                     self.messages.append((message, error_msg))
-                    return self.messages, ""
+                    yield list(self.messages), ""
+                    return
             except Exception as e:
                 error_msg = f"Помилка ініціалізації LLM провайдера: {e}"
                 self.messages.append((message, error_msg))
-                return self.messages, ""
+                yield list(self.messages), ""
+                return
         
         # Підготовка контексту
         context = {
@@ -1504,8 +1974,9 @@ class TeacherDashboard:
         }
         
         try:
-            # Тимчасове повідомлення
+            # Тимчасове повідомлення показується одразу, а поле введення очищується
             self.messages.append((message, "Очікування відповіді..."))
+            yield list(self.messages), ""
             
             # Формування повідомлень з історії для Claude
             messages = []
@@ -1523,35 +1994,43 @@ class TeacherDashboard:
             # Додаємо історію в контекст ПЕРЕД викликом generate_response
             context["messages"] = messages
             
-            # Отримання відповіді - використовуємо тільки прямий доступ 
-            response = await self.llm_provider.generate_response(
+            # Дані курсу (студенти, завдання) запитуються з Moodle лише для першого повідомлення
+            # розмови або для питань про курс; решта повідомлень іде до LLM без цих запитів,
+            # але з даними курсу, отриманими провайдером протягом MCP_CONTEXT_REUSE_TTL
+            needs_course_ctx = bool(self.selected_course) and (
+                len(self.messages) == 1 or any(keyword in message.lower() for keyword in _COURSE_KEYWORDS)
+            )
+            
+            # Отримання відповіді потоком - використовуємо тільки прямий доступ;
+            # змінюється лише останній запис історії
+            response = ""
+            async for delta in self.llm_provider.generate_response_stream(
                 message, 
                 context,
-                use_mcp=True,
+                use_mcp=needs_course_ctx,
                 mcp_server_url=self.moodle_url,
                 mcp_token=self.auth.token,
                 use_full_mcp_server=False  # Вимикаємо повний MCP
-            )
-            
-            # Оновлення повідомлення
-            if self.messages:
+            ):
+                response += delta
                 self.messages[-1] = (message, response)
+                yield list(self.messages), ""
             
             # Обмеження довжини історії чату
             if len(self.messages) > self.MAX_HISTORY_LENGTH:
                 self.messages = self.messages[-self.MAX_HISTORY_LENGTH:]
             
-            return self.messages, ""
+            yield list(self.messages), ""
         except Exception as e:
             error_msg = f"Помилка отримання відповіді: {e}"
-            print(error_msg)
+            log.error(error_msg)
             
             if self.messages and self.messages[-1][0] == message:
                 self.messages[-1] = (message, error_msg)
             else:
                 self.messages.append((message, error_msg))
             
-            return self.messages, ""
+            yield list(self.messages), ""
 
     def clear_chat_history(self) -> List[Tuple[str, str]]:
         """Очищення історії чату."""
@@ -1560,113 +2039,122 @@ class TeacherDashboard:
     
     def _get_current_datetime(self) -> str:
         """Отримання поточної дати і часу в читабельному форматі."""
-        from datetime import datetime
         return datetime.now().strftime('%d.%m.%Y %H:%M:%S')
     
     # --- Методи для MCP сервера ---
-    def start_mcp_server(self) -> Tuple[str, str]:
+    async def start_mcp_server(self) -> Tuple[str, str]:
         """Запуск MCP сервера."""
         if MoodleMCPServer is None:
             return "Помилка: Модуль MCP сервера не знайдено.", ""
-        if self.mcp_process and self.mcp_process.poll() is None:
+        if self.mcp_process and self.mcp_process.returncode is None:
             return "MCP сервер вже запущено", self._generate_mcp_config()
         
         try:
-            server_script_path = os.path.join(os.path.dirname(__file__), "..", "mcp_server", "moodle_server.py")
-            server_script_path = os.path.abspath(server_script_path)
-            
-            if not os.path.exists(server_script_path):
-                return f"Помилка: Файл сервера не знайдено за шляхом {server_script_path}", ""
-            
-            print(f"Запуск MCP сервера зі скрипта: {server_script_path}")
-            cmd = [sys.executable, server_script_path, "--base-url", self.moodle_url]
-            
-            self.mcp_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8'
+            if not _SERVER_SCRIPT_FOUND:
+                return f"Помилка: Файл сервера не знайдено за шляхом {_SERVER_SCRIPT}", ""
+            
+            log.debug("Запуск MCP сервера зі скрипта: %s", _SERVER_SCRIPT)
+            cmd = [_PYTHON_EXECUTABLE, _SERVER_SCRIPT, "--base-url", self.moodle_url]
+            
+            # stdout серверу не потрібен; stderr після запуску постійно вичитується у фоні,
+            # інакше заповнений буфер каналу зупинить процес сервера
+            self.mcp_process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
             )
             
-            if self.mcp_process.poll() is not None:
-                stderr_output = self.mcp_process.stderr.read()
-                error_msg = f"Помилка запуску MCP сервера. Код виходу: {self.mcp_process.returncode}. Помилка: {stderr_output}"
-                print(error_msg)
-                self.mcp_process = None
-                return error_msg, ""
-            
-            print("MCP сервер успішно запущено (процес створено).")
-            return "MCP сервер запущено", self._generate_mcp_config()
+            # Процес, що завершився одразу після старту, вважаємо невдалим запуском
+            try:
+                await asyncio.wait_for(self.mcp_process.wait(), timeout=MCP_STARTUP_CHECK_TIMEOUT)
+            except asyncio.TimeoutError:
+                log.info("MCP сервер успішно запущено (процес створено).")
+                self._mcp_stderr_task = asyncio.create_task(self._drain_mcp_stderr(self.mcp_process.stderr))
+                return "MCP сервер запущено", self._generate_mcp_config()
+            
+            stderr_output = (await self.mcp_process.stderr.read()).decode('utf-8', errors='replace')
+            error_msg = f"Помилка запуску MCP сервера. Код виходу: {self.mcp_process.returncode}. Помилка: {stderr_output}"
+            log.error(error_msg)
+            self.mcp_process = None
+            return error_msg, ""
         
         except Exception as e:
             error_msg = f"Критична помилка запуску MCP сервера: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg, ""
     
-    def stop_mcp_server(self) -> str:
+    @staticmethod
+    async def _drain_mcp_stderr(stream: asyncio.StreamReader) -> None:
+        """Вичитування stderr MCP сервера в лог до завершення процесу."""
+        async for line in stream:
+            log.info("MCP сервер: %s", line.decode('utf-8', errors='replace').rstrip())
+    
+    async def stop_mcp_server(self) -> str:
         """Зупинка MCP сервера."""
-        if self.mcp_process and self.mcp_process.poll() is None:
-            print("Зупинка MCP сервера...")
+        if self.mcp_process and self.mcp_process.returncode is None:
+            log.debug("Зупинка MCP сервера...")
             self.mcp_process.terminate()
             try:
-                stdout, stderr = self.mcp_process.communicate(timeout=5)
-                print("MCP сервер зупинено.")
-                if stderr:
-                    print(f"Помилки MCP сервера при зупинці: {stderr}")
+                await asyncio.wait_for(self.mcp_process.wait(), timeout=MCP_STOP_TIMEOUT)
+                log.info("MCP сервер зупинено.")
                 return "MCP сервер зупинено"
-            except subprocess.TimeoutExpired:
-                print("MCP сервер не відповів на terminate, примусова зупинка (kill)...")
+            except asyncio.TimeoutError:
+                log.warning("MCP сервер не відповів на terminate, примусова зупинка (kill)...")
                 self.mcp_process.kill()
-                stdout, stderr = self.mcp_process.communicate()
-                print("MCP сервер примусово зупинено.")
+                await self.mcp_process.wait()
+                log.info("MCP сервер примусово зупинено.")
                 return "MCP сервер примусово зупинено"
             finally:
                 self.mcp_process = None
+                # Після завершення процесу читання stderr доходить до кінця потоку саме
+                if self._mcp_stderr_task is not None:
+                    await asyncio.gather(self._mcp_stderr_task, return_exceptions=True)
+                    self._mcp_stderr_task = None
         else:
-            print("Спроба зупинити MCP сервер, але він не запущений.")
+            log.debug("Спроба зупинити MCP сервер, але він не запущений.")
             return "MCP сервер не запущено"
     
     def _generate_mcp_config(self) -> str:
-        """Генерація конфігурації для Claude Desktop."""
-        server_script_path = os.path.join(os.path.dirname(__file__), "..", "mcp_server", "moodle_server.py")
-        server_script_path = os.path.abspath(server_script_path)
-        
-        args = [server_script_path, "--base-url", self.moodle_url]
-        
-        config = {
-            "mcpServers": {
-                "moodle-assistant": {
-                    "command": os.path.abspath(sys.executable),
-                    "args": args
+        """Генерація конфігурації для Claude Desktop (кешується за URL Moodle)."""
+        config_json = self._mcp_cfg_cache.get(self.moodle_url)
+        if config_json is None:
+            config = {
+                "mcpServers": {
+                    "moodle-assistant": {
+                        "command": _PYTHON_EXECUTABLE,
+                        "args": [_SERVER_SCRIPT, "--base-url", self.moodle_url]
+                    }
                 }
             }
-        }
-        return json.dumps(config, indent=2)
+            config_json = _MCP_CONFIG_ENCODER.encode(config)
+            self._mcp_cfg_cache[self.moodle_url] = config_json
+        return config_json
+    
+    @staticmethod
+    def _write_mcp_config(filename: str, config: Dict[str, Any]) -> None:
+        """Запис конфігурації MCP у JSON файл."""
+        with open(filename, "w", encoding='utf-8') as f:
+            f.writelines(_MCP_CONFIG_ENCODER.iterencode(config))
     
-    def update_mcp_config(self, config_json: str) -> str:
+    async def update_mcp_config(self, config_json: str) -> str:
         """Оновлення конфігурації MCP сервера (збереження у файл)."""
         config_filename = "mcp_config_manual.json"
         try:
             loaded_config = json.loads(config_json)
-            print(f"Збереження конфігурації MCP у файл: {config_filename}")
-            with open(config_filename, "w", encoding='utf-8') as f:
-                json.dump(loaded_config, f, indent=2, ensure_ascii=False)
+            log.debug("Збереження конфігурації MCP у файл: %s", config_filename)
+            # Запис файлу виконується в окремому потоці, щоб не блокувати цикл подій Gradio
+            await asyncio.to_thread(self._write_mcp_config, config_filename, loaded_config)
             return f"Конфігурацію збережено у файл {config_filename}"
         except json.JSONDecodeError as e:
             error_msg = f"Помилка: Некоректний JSON формат конфігурації - {e}"
-            print(error_msg)
+            log.error(error_msg)
             return error_msg
         except Exception as e:
             error_msg = f"Критична помилка збереження конфігурації MCP: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             return error_msg
         
-    def switch_mcp_mode(self, mode: str) -> Tuple[Dict, str]:
+    async def switch_mcp_mode(self, mode: str) -> Tuple[Dict, str]:
         """Перемикання режиму інтеграції з MCP."""
         if mode == "Повний MCP сервер":
             self.use_full_mcp_server = True
@@ -1674,55 +2162,10 @@ class TeacherDashboard:
         else:
             self.use_full_mcp_server = False
             # Зупиняємо MCP сервер, якщо він запущений
-            if self.llm_provider:
+            if self.mcp_process:
                 try:
-                    status = self.llm_provider.stop_mcp_server()
+                    status = await self.stop_mcp_server()
                     return gr.update(visible=False), f"Режим прямого доступу активовано. {status}"
                 except Exception as e:
                     return gr.update(visible=False), f"Режим прямого доступу активовано. Помилка при зупинці MCP сервера: {e}"
             return gr.update(visible=False), "Режим прямого доступу активовано."
-
-    async def start_mcp_server(self) -> Tuple[str, str]:
-        """Запуск MCP сервера."""
-        if not self.llm_provider:
-            try:
-                self.llm_provider = await LLMProviderFactory.create_provider("claude")
-            except Exception as e:
-                return f"Помилка ініціалізації LLM провайдера: {e}", ""  # Повертаємо два значення
-        
-        try:
-            # Проблема з аргументами - виправляємо виклик методу
-            # Не передаємо moodle_url у метод start_mcp_server об'єкта llm_provider
-            success, message, server_url = await self.llm_provider.start_mcp_server()
-            
-            if success and server_url:
-                # Генеруємо конфігурацію для Claude Desktop
-                config = {
-                    "mcpServers": {
-                        "moodle-assistant": {
-                            "command": sys.executable,
-                            "args": [
-                                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                                            "mcp_server", "moodle_server.py"),
-                                "--base-url", self.moodle_url
-                            ]
-                        }
-                    }
-                }
-                config_json = json.dumps(config, indent=2)
-                return message, config_json
-            else:
-                return message, ""  # Повертаємо два значення
-        except Exception as e:
-            return f"Помилка запуску MCP сервера: {e}", ""  # Повертаємо два значення
-
-    def stop_mcp_server(self) -> str:
-        """Зупинка MCP сервера."""
-        if not self.llm_provider:
-            return "LLM провайдер не ініціалізовано."
-        
-        try:
-            status = self.llm_provider.stop_mcp_server()
-            return status
-        except Exception as e:
-            return f"Помилка зупинки MCP сервера: {e}"
\ No newline at end of file
@@ -1,52 +1,67 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Автоматичне тестування MCP сервера для Moodle
+Автоматичне тестування дозволів API токена для MCP сервера Moodle
 Перевіряє наявність/відсутність дозволів наданих Адміном Moodle для API_MOODLE_TOKEN
+(запити йдуть напряму до REST API Moodle, запущений MCP сервер не потрібен)
 """
 
-import asyncio
 import json
 import argparse
 import sys
 import os
-import httpx
-from mcp_python import MCPClient, MCPClientConfig
+import re
+import time
+from datetime import datetime
 from typing import Dict, Any, List, Tuple, Optional
-from dotenv import load_dotenv
+from common.async_utils import gather_bounded
+from common.event_loop import run
+from moodle_perm_common import (
+    Colors, MoodleClient, load_token, is_permission_denied, dumps_json_pretty,
+    DEFAULT_MOODLE_URL, DEFAULT_READ_TIMEOUT, DEFAULT_POOL_SIZE
+)
 
-# Завантажуємо змінні середовища
-load_dotenv()
+# Назви форуму оголошень курсу
+_ANNOUNCEMENT_FORUM_RE = re.compile(r"announcement|news|оголошення", re.IGNORECASE)
 
-# Отримуємо токен з .env файлу
-MOODLE_API_TOKEN = os.getenv("API_MOODLE_TOKEN")
-if not MOODLE_API_TOKEN:
-    print("Помилка: API_MOODLE_TOKEN не знайдено в .env файлі")
-    sys.exit(1)
+# Максимум одночасних запитів до Moodle під час тестування
+PROBE_CONCURRENCY = 8
 
-# Кольори для виводу в консоль
-class Colors:
-    HEADER = '\033[95m'
-    BLUE = '\033[94m'
-    CYAN = '\033[96m'
-    GREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
+def _month_bounds(year: int, month: int) -> Tuple[int, int]:
+    """Межі місяця (початок поточного і початок наступного) як мітки часу за місцевим часом"""
+    next_year, next_month = (year, month + 1) if month < 12 else (year + 1, 1)
+    return (
+        int(time.mktime((year, month, 1, 0, 0, 0, 0, 0, -1))),
+        int(time.mktime((next_year, next_month, 1, 0, 0, 0, 0, 0, -1)))
+    )
 
 class MoodleTokenPermissionTester:
-    """Клас для тестування дозволів API токена Moodle через MCP сервер"""
+    """Клас для тестування дозволів API токена Moodle, потрібних MCP серверу"""
+
+    # Короткі імена ролей Moodle, з якими користувач вважається викладачем
+    TEACHER_ROLES = ("editingteacher", "teacher", "coursecreator", "manager")
+
+    # Метод -> метод, без дозволу на який тест не має сенсу (він завершиться тією ж відмовою)
+    DEPENDS = {
+        "core_course_get_contents": "core_course_get_courses",
+        "core_enrol_get_enrolled_users": "core_course_get_courses",
+        "mod_assign_get_assignments": "core_course_get_courses",
+        "gradereport_user_get_grade_items": "core_course_get_courses",
+        "core_course_edit_section": "core_course_get_courses",
+        "mod_assign_get_submissions": "mod_assign_get_assignments",
+        "mod_assign_get_submission_status": "mod_assign_get_assignments",
+        "mod_forum_add_discussion": "core_course_get_contents",
+        "core_role_assign_get_user_roles": "core_webservice_get_site_info",
+        "core_user_get_users_by_field": "core_webservice_get_site_info"
+    }
 
-    def __init__(self, mcp_url: str, moodle_api_token: str, moodle_base_url: str = "http://78.137.2.119:2929"):
-        self.mcp_url = mcp_url
+    def __init__(self, moodle_api_token: str, moodle_base_url: str = DEFAULT_MOODLE_URL,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT, pool_size: int = DEFAULT_POOL_SIZE, http2: bool = True):
         self.token = moodle_api_token
-        self.moodle_base_url = moodle_base_url
-        self.client = None
-        self.is_authenticated = False
+        # Спільний клієнт Moodle: пул з'єднань, повтори, пакетні виклики і кеш відповідей функцій читання
+        self.client = MoodleClient(moodle_api_token, moodle_base_url, read_timeout, pool_size, http2)
+        self._results_log = None  # Файл JSON Lines, куди результат кожного тесту записується одразу
         self.is_teacher = False
-        self.user_info = None
         
         # Результати тестів
         self.permission_results = {}
@@ -65,74 +80,25 @@ class MoodleTokenPermissionTester:
             "core_course_edit_section": "Редагування розділів курсу",
             "core_role_assign_get_user_roles": "Отримання ролей користувача"
         }
+        self._method_order = {method: index for index, method in enumerate(self.api_methods)}
 
-    async def connect(self):
-        """Підключення до MCP сервера"""
-        print(f"{Colors.HEADER}Підключення до MCP сервера на {self.mcp_url}...{Colors.ENDC}")
-        try:
-            config = MCPClientConfig(base_url=self.mcp_url)
-            self.client = MCPClient(config=config)
-            await self.client.connect()
-            print(f"{Colors.GREEN}З'єднання з MCP сервером встановлено успішно!{Colors.ENDC}")
-            return True
-        except Exception as e:
-            print(f"{Colors.FAIL}Помилка підключення до MCP сервера: {str(e)}{Colors.ENDC}")
-            return False
+    async def aclose(self):
+        """Закриття клієнта Moodle і журналу результатів"""
+        await self.client.aclose()
+        if self._results_log is not None:
+            self._results_log.close()
+            self._results_log = None
 
-    async def authenticate_with_token(self):
-        """Аутентифікація через токен API"""
-        print(f"{Colors.HEADER}Аутентифікація з використанням API токена...{Colors.ENDC}")
-        try:
-            result = await self.client.invoke_tool("set_token", {
-                "token": self.token
-            })
-            
-            if "успішно" in result.lower():
-                self.is_authenticated = True
-                # Отримаємо інформацію про користувача
-                user_info = await self.client.get_resource("user://info")
-                self.user_info = user_info
-                self.is_teacher = "Викладач" in user_info
-                
-                print(f"{Colors.GREEN}Аутентифікація успішна!{Colors.ENDC}")
-                print(f"{Colors.BLUE}Роль користувача: {'Викладач' if self.is_teacher else 'Студент'}{Colors.ENDC}")
-                return True
-            else:
-                print(f"{Colors.FAIL}Помилка аутентифікації: {result}{Colors.ENDC}")
-                return False
-        except Exception as e:
-            print(f"{Colors.FAIL}Помилка при аутентифікації: {str(e)}{Colors.ENDC}")
-            return False
+    def open_results_log(self, filename: str):
+        """Відкриття журналу JSON Lines: результати не втрачаються, якщо запуск перервано, і їх видно через tail -f"""
+        # Построкова буферизація: кожен запис потрапляє у файл одразу
+        self._results_log = open(filename, 'w', encoding='utf-8', buffering=1)
 
-    async def direct_api_test(self, method: str, params: Dict[str, Any] = None) -> Tuple[bool, Any]:
-        """Прямий тест API методу Moodle"""
-        if params is None:
-            params = {}
-            
-        try:
-            url = f"{self.moodle_base_url}/webservice/rest/server.php"
-            request_params = {
-                "wstoken": self.token,
-                "wsfunction": method,
-                "moodlewsrestformat": "json"
-            }
-            
-            request_params.update(params)
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=request_params, timeout=10.0)
-                data = response.json()
-                
-                # Перевірка на помилки у відповіді Moodle
-                if isinstance(data, dict) and "exception" in data:
-                    error_msg = data.get("message", "Помилка Moodle API")
-                    if "access control" in error_msg.lower() or "permission" in error_msg.lower():
-                        return False, "Немає дозволу"
-                    return False, error_msg
-                
-                return True, data
-        except Exception as e:
-            return False, f"Помилка запиту: {str(e)}"
+    def _record_result(self, method: str, result: Dict[str, Any]):
+        """Збереження результату тесту і запис його в журнал JSON Lines"""
+        self.permission_results[method] = result
+        if self._results_log is not None:
+            self._results_log.write(json.dumps({"method": method, **result}, ensure_ascii=False) + "\n")
 
     async def test_api_permission(self, method: str, params: Dict[str, Any] = None) -> bool:
         """Тестування дозволів для конкретного API методу"""
@@ -140,38 +106,49 @@ class MoodleTokenPermissionTester:
             params = {}
             
         description = self.api_methods.get(method, method)
-        print(f"{Colors.HEADER}Тестування методу {method} ({description})...{Colors.ENDC}")
+        parent = self._blocked_by(method)
+        if parent:
+            print(f"{Colors.HEADER}Тестування методу {method} ({description})...{Colors.ENDC}")
+            print(f"{Colors.CYAN}- Пропущено: немає дозволу на {parent}{Colors.ENDC}")
+            self._record_result(method, {
+                "status": "skipped",
+                "description": description,
+                "error": f"Пропущено: немає дозволу на {parent}"
+            })
+            return False
         
-        success, result = await self.direct_api_test(method, params)
+        success, result = await self.client.call(method, params)
+        # Заголовок і результат друкуються разом після відповіді, щоб паралельні тести не перемішували вивід
+        print(f"{Colors.HEADER}Тестування методу {method} ({description})...{Colors.ENDC}")
         if success:
             print(f"{Colors.GREEN}✓ Дозвіл надано{Colors.ENDC}")
-            self.permission_results[method] = {
+            self._record_result(method, {
                 "status": "granted",
                 "description": description
-            }
+            })
             return True
         else:
             error_msg = str(result)
-            if "Немає дозволу" in error_msg or "required capability" in error_msg:
+            if is_permission_denied(error_msg):
                 print(f"{Colors.FAIL}✗ Дозвіл відсутній{Colors.ENDC}")
-                self.permission_results[method] = {
+                self._record_result(method, {
                     "status": "denied",
                     "description": description,
                     "error": error_msg
-                }
+                })
             else:
                 print(f"{Colors.WARNING}? Невідома помилка: {error_msg}{Colors.ENDC}")
-                self.permission_results[method] = {
+                self._record_result(method, {
                     "status": "error",
                     "description": description,
                     "error": error_msg
-                }
+                })
             return False
 
     async def get_course_id_for_testing(self) -> Optional[int]:
         """Отримати ID курсу для тестування"""
         try:
-            success, result = await self.direct_api_test("core_course_get_courses")
+            success, result = await self.client.call("core_course_get_courses")
             if success and isinstance(result, list) and len(result) > 0:
                 return result[0]["id"]
         except Exception:
@@ -179,85 +156,145 @@ class MoodleTokenPermissionTester:
             
         return None
 
+    async def get_user_id_for_testing(self) -> Optional[int]:
+        """Отримати ID поточного користувача для тестування"""
+        success, site_info = await self.client.call("core_webservice_get_site_info")
+        if success and "userid" in site_info:
+            return site_info["userid"]
+        return None
+
+    async def get_assignment_id_for_testing(self, course_id: int) -> Optional[int]:
+        """Отримати ID завдання курсу для тестування"""
+        success, assignments_data = await self.client.call("mod_assign_get_assignments", {"courseids[0]": course_id})
+        if success and "courses" in assignments_data:
+            for course in assignments_data["courses"]:
+                if course["id"] == course_id and "assignments" in course and len(course["assignments"]) > 0:
+                    return course["assignments"][0]["id"]
+        return None
+
+    async def detect_user_role(self, user_id: Optional[int]):
+        """Визначення ролі користувача токена: адміністратор сайту або роль викладача серед ролей користувача"""
+        success, site_info = await self.client.call("core_webservice_get_site_info")
+        if success and site_info.get("userissiteadmin"):
+            self.is_teacher = True
+        elif user_id is not None:
+            success, data = await self.client.call("core_role_assign_get_user_roles", {"userid": user_id})
+            if success:
+                # Відповідь може бути словником з roles або списком таких словників
+                entries = data if isinstance(data, list) else [data]
+                self.is_teacher = any(
+                    role.get("shortname") in self.TEACHER_ROLES
+                    for entry in entries if isinstance(entry, dict)
+                    for role in entry.get("roles", [])
+                )
+        print(f"{Colors.BLUE}Роль користувача: {'Викладач' if self.is_teacher else 'Студент'}{Colors.ENDC}")
+
+    async def get_forum_id_for_testing(self, course_id: int) -> Optional[int]:
+        """Отримати ID форуму оголошень курсу для тестування"""
+        success, course_content = await self.client.call("core_course_get_contents", {"courseid": course_id})
+        if success:
+            for section in course_content:
+                for module in section.get("modules", []):
+                    if module.get("modname") == "forum" and _ANNOUNCEMENT_FORUM_RE.search(module.get("name", "")):
+                        return module.get("instance")
+        return None
+
+    def _blocked_by(self, method: str) -> Optional[str]:
+        """Метод-передумова з DEPENDS, який уже перевірено і дозволу на який немає"""
+        parent = self.DEPENDS.get(method)
+        if parent and parent in self.permission_results and self.permission_results[parent]["status"] != "granted":
+            return parent
+        return None
+
+    async def _run_layer(self, tests: List[Tuple[str, Dict[str, Any]]], lookups: List[Any] = ()) -> List[Any]:
+        """Шар незалежних тестів (метод, параметри) і пошуків ID: функції читання спершу завантажуються
+        одним пакетним запитом, потім усе виконується паралельно (не більше PROBE_CONCURRENCY одночасно)"""
+        await self.client.prefetch([(method, params) for method, params in tests if not self._blocked_by(method)])
+        return await gather_bounded(
+            [self.test_api_permission(method, params) for method, params in tests] + list(lookups),
+            PROBE_CONCURRENCY
+        )
+
     async def run_all_tests(self):
-        """Запуск всіх тестів на перевірку дозволів"""
+        """Запуск всіх тестів на перевірку дозволів
+        
+        Незалежні запити виконуються шарами: базові тести, тести з ID курсу/користувача,
+        тести з ID завдання/форуму.
+        """
         print(f"{Colors.BOLD}Початок тестування дозволів для API токена Moodle...{Colors.ENDC}")
         
-        # Базові тести, які не потребують додаткових параметрів
-        await self.test_api_permission("core_webservice_get_site_info")
-        await self.test_api_permission("core_course_get_courses")
+        # Тест календаря
+        now = time.localtime()
+        timestart, timeend = _month_bounds(now.tm_year, now.tm_mon)
+        calendar_params = {
+            "events": {
+                "timestart": timestart,
+                "timeend": timeend
+            }
+        }
         
-        # Отримаємо ID курсу для подальших тестів
-        course_id = await self.get_course_id_for_testing()
-        if course_id:
+        # Базові тести, які не потребують додаткових параметрів, і пошук ID для подальших тестів
+        *_, course_id, user_id = await self._run_layer([
+            ("core_webservice_get_site_info", {}),
+            ("core_course_get_courses", {}),
+            ("core_calendar_get_calendar_events", calendar_params)
+        ], [self.get_course_id_for_testing(), self.get_user_id_for_testing()])
+        if not isinstance(user_id, int):
+            user_id = None
+        # Від ролі залежить набір тестів наступного шару; відповідь на ролі запам'ятовується і для їх тесту
+        await self.detect_user_role(user_id)
+        
+        tests = []
+        if isinstance(course_id, int):
             print(f"{Colors.BLUE}Знайдено курс для тестування з ID: {course_id}{Colors.ENDC}")
             
             # Тести, які потребують ID курсу
-            await self.test_api_permission("core_course_get_contents", {"courseid": course_id})
-            await self.test_api_permission("core_enrol_get_enrolled_users", {"courseid": course_id})
-            await self.test_api_permission("mod_assign_get_assignments", {"courseids[0]": course_id})
-            
-            # Тести для отримання завдань і потім тестування роботи з завданнями
-            success, assignments_data = await self.direct_api_test("mod_assign_get_assignments", {"courseids[0]": course_id})
-            assignment_id = None
-            if success and "courses" in assignments_data:
-                for course in assignments_data["courses"]:
-                    if course["id"] == course_id and "assignments" in course and len(course["assignments"]) > 0:
-                        assignment_id = course["assignments"][0]["id"]
-                        break
-            
-            if assignment_id:
-                print(f"{Colors.BLUE}Знайдено завдання для тестування з ID: {assignment_id}{Colors.ENDC}")
-                await self.test_api_permission("mod_assign_get_submissions", {"assignmentids[0]": assignment_id})
-                await self.test_api_permission("mod_assign_get_submission_status", {"assignid": assignment_id})
-            
-            # Тест для оцінок
-            await self.test_api_permission("gradereport_user_get_grade_items", {"courseid": course_id})
-            
+            tests += [
+                ("core_course_get_contents", {"courseid": course_id}),
+                ("core_enrol_get_enrolled_users", {"courseid": course_id}),
+                ("mod_assign_get_assignments", {"courseids[0]": course_id}),
+                ("gradereport_user_get_grade_items", {"courseid": course_id})
+            ]
             # Тест для редагування розділів (тільки для викладачів)
             if self.is_teacher:
-                await self.test_api_permission("core_course_edit_section", {"courseid": course_id, "sectionid": 0, "name": "Test Section"})
-                
-                # Пошук ID форуму оголошень для тесту
-                success, course_content = await self.direct_api_test("core_course_get_contents", {"courseid": course_id})
-                forum_id = None
-                if success:
-                    for section in course_content:
-                        for module in section.get("modules", []):
-                            if module.get("modname") == "forum" and (
-                                "announcement" in module.get("name", "").lower() or
-                                "news" in module.get("name", "").lower() or
-                                "оголошення" in module.get("name", "").lower()
-                            ):
-                                forum_id = module.get("instance")
-                                break
-                        if forum_id:
-                            break
-                
-                if forum_id:
-                    print(f"{Colors.BLUE}Знайдено форум оголошень з ID: {forum_id}{Colors.ENDC}")
-                    await self.test_api_permission("mod_forum_add_discussion", {
-                        "forumid": forum_id,
-                        "subject": "Test Subject",
-                        "message": "Test Message"
-                    })
-        
-        # Тест календаря
-        from datetime import datetime
-        now = datetime.now()
-        await self.test_api_permission("core_calendar_get_calendar_events", {
-            "events": {
-                "timestart": int(datetime(now.year, now.month, 1).timestamp()),
-                "timeend": int(datetime(now.year, now.month + 1 if now.month < 12 else 1, 1).timestamp())
-            }
-        })
+                tests.append(("core_course_edit_section", {"courseid": course_id, "sectionid": 0, "name": "Test Section"}))
+        else:
+            course_id = None
         
         # Тест на отримання ролей
-        success, site_info = await self.direct_api_test("core_webservice_get_site_info")
-        if success and "userid" in site_info:
-            user_id = site_info["userid"]
-            await self.test_api_permission("core_role_assign_get_user_roles", {"userid": user_id})
-            await self.test_api_permission("core_user_get_users_by_field", {"field": "id", "values[0]": user_id})
+        if user_id is not None:
+            tests += [
+                ("core_role_assign_get_user_roles", {"userid": user_id}),
+                ("core_user_get_users_by_field", {"field": "id", "values[0]": user_id})
+            ]
+        
+        # ID завдання та форуму шукаються разом з тестами другого шару
+        lookups = []
+        if course_id:
+            lookups.append(self.get_assignment_id_for_testing(course_id))
+            if self.is_teacher:
+                lookups.append(self.get_forum_id_for_testing(course_id))
+        results = await self._run_layer(tests, lookups)
+        found_ids = [result if isinstance(result, int) else None for result in results[len(tests):]]
+        assignment_id = found_ids[0] if found_ids else None
+        forum_id = found_ids[1] if len(found_ids) > 1 else None
+        
+        tests = []
+        if assignment_id:
+            print(f"{Colors.BLUE}Знайдено завдання для тестування з ID: {assignment_id}{Colors.ENDC}")
+            tests += [
+                ("mod_assign_get_submissions", {"assignmentids[0]": assignment_id}),
+                ("mod_assign_get_submission_status", {"assignid": assignment_id})
+            ]
+        if forum_id:
+            print(f"{Colors.BLUE}Знайдено форум оголошень з ID: {forum_id}{Colors.ENDC}")
+            tests.append(("mod_forum_add_discussion", {
+                "forumid": forum_id,
+                "subject": "Test Subject",
+                "message": "Test Message"
+            }))
+        if tests:
+            await self._run_layer(tests)
                 
         self.print_results_summary()
         return self.permission_results
@@ -268,9 +305,12 @@ class MoodleTokenPermissionTester:
         print(f"{Colors.BOLD}ПІДСУМОК ТЕСТУВАННЯ ДОЗВОЛІВ API ТОКЕНА{Colors.ENDC}")
         print("="*80)
         
-        granted = [method for method, result in self.permission_results.items() if result["status"] == "granted"]
-        denied = [method for method, result in self.permission_results.items() if result["status"] == "denied"]
-        errors = [method for method, result in self.permission_results.items() if result["status"] == "error"]
+        # Тести виконуються паралельно, тому результати впорядковуються за переліком методів
+        ordered = sorted(self.permission_results.items(), key=lambda item: self._method_order.get(item[0], len(self._method_order)))
+        buckets = {"granted": [], "denied": [], "error": [], "skipped": []}
+        for method, result in ordered:
+            buckets.setdefault(result["status"], []).append(method)
+        granted, denied, errors, skipped = buckets["granted"], buckets["denied"], buckets["error"], buckets["skipped"]
         
         print(f"\n{Colors.GREEN}Надані дозволи ({len(granted)}):{Colors.ENDC}")
         for method in granted:
@@ -286,8 +326,14 @@ class MoodleTokenPermissionTester:
                 print(f"  ? {method} - {self.permission_results[method]['description']}")
                 print(f"    Помилка: {self.permission_results[method]['error']}")
         
+        if skipped:
+            print(f"\n{Colors.CYAN}Пропущені тести ({len(skipped)}):{Colors.ENDC}")
+            for method in skipped:
+                print(f"  - {method} - {self.permission_results[method]['description']}")
+                print(f"    {self.permission_results[method]['error']}")
+        
         print("\n" + "="*80)
-        print(f"Загальний результат: {len(granted)} надано, {len(denied)} відмовлено, {len(errors)} помилок")
+        print(f"Загальний результат: {len(granted)} надано, {len(denied)} відмовлено, {len(errors)} помилок, {len(skipped)} пропущено")
         print("="*80 + "\n")
         
         if len(granted) == 0:
@@ -301,12 +347,12 @@ class MoodleTokenPermissionTester:
         """Збереження результатів у файл JSON"""
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump({
+                f.write(dumps_json_pretty({
                     "token": self.token[:5] + "*****",  # Маскуємо токен для безпеки
                     "is_teacher": self.is_teacher,
                     "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                     "results": self.permission_results
-                }, f, ensure_ascii=False, indent=2)
+                }))
             print(f"{Colors.GREEN}Результати збережено у файл: {filename}{Colors.ENDC}")
             return True
         except Exception as e:
@@ -314,28 +360,35 @@ class MoodleTokenPermissionTester:
             return False
 
 async def main():
-    parser = argparse.ArgumentParser(description="Тестування дозволів API токена Moodle через MCP сервер")
-    parser.add_argument("--token", required=True, help="API токен Moodle для тестування")
-    parser.add_argument("--mcp-url", default="http://localhost:6277", help="URL MCP сервера (за замовчуванням: http://localhost:6277)")
-    parser.add_argument("--moodle-url", default="http://78.137.2.119:2929", help="Базовий URL Moodle (за замовчуванням: http://78.137.2.119:2929)")
+    parser = argparse.ArgumentParser(description="Тестування дозволів API токена Moodle, потрібних MCP серверу")
+    parser.add_argument("--token", help="API токен Moodle для тестування (за замовчуванням: API_MOODLE_TOKEN з .env)")
+    parser.add_argument("--moodle-url", default=DEFAULT_MOODLE_URL, help=f"Базовий URL Moodle (за замовчуванням: {DEFAULT_MOODLE_URL})")
     parser.add_argument("--output", default="moodle_token_permissions.json", help="Файл для збереження результатів (за замовчуванням: moodle_token_permissions.json)")
+    parser.add_argument("--read-timeout", type=float, default=DEFAULT_READ_TIMEOUT, help=f"Тайм-аут читання відповіді Moodle, с (за замовчуванням: {DEFAULT_READ_TIMEOUT:g})")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help=f"Максимум з'єднань з Moodle (за замовчуванням: {DEFAULT_POOL_SIZE})")
+    parser.add_argument("--http1-only", action="store_true", help="Не використовувати HTTP/2 (для серверів Moodle без підтримки h2)")
     
     args = parser.parse_args()
+    token = args.token or load_token()
+    if not token:
+        print("Помилка: API_MOODLE_TOKEN не знайдено в .env файлі")
+        sys.exit(1)
     
     tester = MoodleTokenPermissionTester(
-        mcp_url=args.mcp_url,
-        moodle_api_token=args.token,
-        moodle_base_url=args.moodle_url
+        moodle_api_token=token,
+        moodle_base_url=args.moodle_url,
+        read_timeout=args.read_timeout,
+        pool_size=args.pool_size,
+        http2=not args.http1_only
     )
     
-    if await tester.connect():
-        if await tester.authenticate_with_token():
-            await tester.run_all_tests()
-            tester.save_results_to_file(args.output)
-        else:
-            print(f"{Colors.FAIL}Не вдалося автентифікуватися з наданим токеном.{Colors.ENDC}")
-    else:
-        print(f"{Colors.FAIL}Не вдалося підключитися до MCP сервера.{Colors.ENDC}")
+    try:
+        # Поточні результати пишуться поруч із підсумковим файлом: <output без розширення>.jsonl
+        tester.open_results_log(os.path.splitext(args.output)[0] + ".jsonl")
+        await tester.run_all_tests()
+        tester.save_results_to_file(args.output)
+    finally:
+        await tester.aclose()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(main())
\ No newline at end of file